@@ -24,7 +24,7 @@ if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
 # Import SQLAlchemy Base and the default DATABASE_URL from our app
-from database import Base, DATABASE_URL  # type: ignore
+from database import Base, SYNC_DATABASE_URL, to_sync_url  # type: ignore
 
 # Alembic autogenerate needs this metadata
 target_metadata = Base.metadata
@@ -38,7 +38,8 @@ def _get_sqlalchemy_url() -> str:
     """Resolve the SQLAlchemy URL from alembic config or environment/app settings."""
     url = config.get_main_option("sqlalchemy.url")
     if not url:
-        url = os.getenv("DATABASE_URL") or DATABASE_URL
+        # Migrations run on the sync driver even when the app is configured for aiosqlite/asyncpg
+        url = to_sync_url(os.getenv("DATABASE_URL") or SYNC_DATABASE_URL)
         if url:
             config.set_main_option("sqlalchemy.url", url)
     return url
@@ -0,0 +1,37 @@
+"""coven member_count
+
+Revision ID: 4d2f8a61c7e3
+Revises: 9b600c1905d3
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d2f8a61c7e3'
+down_revision: Union[str, Sequence[str], None] = '9b600c1905d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('covens', sa.Column('member_count', sa.Integer(), server_default='0', nullable=False))
+    # Backfill from the current memberships; the membership routes keep it in step from here on
+    op.execute(
+        "UPDATE covens SET member_count = "
+        "(SELECT COUNT(*) FROM players WHERE players.coven_id = covens.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('covens', schema=None) as batch_op:
+            batch_op.drop_column('member_count')
+    else:
+        op.drop_column('covens', 'member_count')
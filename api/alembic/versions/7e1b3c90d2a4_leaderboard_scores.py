@@ -0,0 +1,415 @@
+"""leaderboard score tables
+
+Revision ID: 7e1b3c90d2a4
+Revises: 4d2f8a61c7e3
+Create Date: 2026-10-17 13:05:12.406118
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e1b3c90d2a4'
+down_revision: Union[str, Sequence[str], None] = '4d2f8a61c7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The trigger DDL and backfill as they stood at this revision. Copied rather than imported from
+# score_triggers so later changes to the app module cannot change what this migration does.
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_insert AFTER INSERT ON inventory_items
+    BEGIN
+        INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+        ON CONFLICT (player_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_update AFTER UPDATE OF quantity, player_id ON inventory_items
+    WHEN OLD.quantity != NEW.quantity OR OLD.player_id != NEW.player_id
+    BEGIN
+        UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+        ON CONFLICT (player_id) DO UPDATE SET score = score + excluded.score;
+        DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_delete AFTER DELETE ON inventory_items
+    BEGIN
+        UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_insert AFTER INSERT ON player_scores
+    BEGIN
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT coven_id, NEW.score FROM players WHERE id = NEW.player_id AND coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_update AFTER UPDATE OF score ON player_scores
+    WHEN OLD.score != NEW.score
+    BEGIN
+        UPDATE coven_scores SET score = score + NEW.score - OLD.score
+        WHERE coven_id = (SELECT coven_id FROM players WHERE id = NEW.player_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_delete AFTER DELETE ON player_scores
+    BEGIN
+        UPDATE coven_scores SET score = score - OLD.score
+        WHERE coven_id = (SELECT coven_id FROM players WHERE id = OLD.player_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_coven_score AFTER UPDATE OF coven_id ON players
+    WHEN OLD.coven_id IS NOT NEW.coven_id
+    BEGIN
+        UPDATE coven_scores SET score = score - COALESCE((SELECT score FROM player_scores WHERE player_id = OLD.id), 0)
+        WHERE coven_id = OLD.coven_id;
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT NEW.coven_id, score FROM player_scores WHERE player_id = NEW.id AND NEW.coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_cleanup BEFORE DELETE ON players
+    BEGIN
+        DELETE FROM player_scores WHERE player_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_coven_score_cleanup AFTER DELETE ON covens
+    BEGIN
+        DELETE FROM coven_scores WHERE coven_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_insert AFTER INSERT ON player_scores
+    BEGIN
+        INSERT INTO player_score_buckets (bucket, shard, players)
+        VALUES (NEW.score >> 3, NEW.player_id % 8, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET players = players + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_update AFTER UPDATE OF score ON player_scores
+    WHEN OLD.score >> 3 != NEW.score >> 3
+    BEGIN
+        UPDATE player_score_buckets SET players = players - 1
+        WHERE bucket = OLD.score >> 3 AND shard = OLD.player_id % 8;
+        INSERT INTO player_score_buckets (bucket, shard, players)
+        VALUES (NEW.score >> 3, NEW.player_id % 8, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET players = players + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_delete AFTER DELETE ON player_scores
+    BEGIN
+        UPDATE player_score_buckets SET players = players - 1
+        WHERE bucket = OLD.score >> 3 AND shard = OLD.player_id % 8;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_insert AFTER INSERT ON coven_scores
+    BEGIN
+        INSERT INTO coven_score_buckets (bucket, shard, covens)
+        VALUES (NEW.score >> 8, NEW.coven_id % 8, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET covens = covens + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_update AFTER UPDATE OF score ON coven_scores
+    WHEN OLD.score >> 8 != NEW.score >> 8
+    BEGIN
+        UPDATE coven_score_buckets SET covens = covens - 1
+        WHERE bucket = OLD.score >> 8 AND shard = OLD.coven_id % 8;
+        INSERT INTO coven_score_buckets (bucket, shard, covens)
+        VALUES (NEW.score >> 8, NEW.coven_id % 8, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET covens = covens + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_delete AFTER DELETE ON coven_scores
+    BEGIN
+        UPDATE coven_score_buckets SET covens = covens - 1
+        WHERE bucket = OLD.score >> 8 AND shard = OLD.coven_id % 8;
+    END
+    """,
+]
+
+POSTGRESQL_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION inventory_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.quantity = NEW.quantity AND OLD.player_id = NEW.player_id THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+            ON CONFLICT (player_id) DO UPDATE SET score = player_scores.score + EXCLUDED.score;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION player_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.score = NEW.score THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE coven_scores SET score = coven_scores.score - OLD.score
+            FROM players WHERE players.id = OLD.player_id AND coven_scores.coven_id = players.coven_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO coven_scores (coven_id, score)
+            SELECT coven_id, NEW.score FROM players WHERE id = NEW.player_id AND coven_id IS NOT NULL
+            ON CONFLICT (coven_id) DO UPDATE SET score = coven_scores.score + EXCLUDED.score;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION player_coven_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM player_scores WHERE player_id = OLD.id;
+            RETURN OLD;
+        END IF;
+        IF OLD.coven_id IS NOT DISTINCT FROM NEW.coven_id THEN
+            RETURN NULL;
+        END IF;
+        -- Lock both covens' rows in id order before touching either
+        PERFORM 1 FROM coven_scores WHERE coven_id IN (OLD.coven_id, NEW.coven_id) ORDER BY coven_id FOR UPDATE;
+        UPDATE coven_scores SET score = coven_scores.score - player_scores.score
+        FROM player_scores WHERE player_scores.player_id = OLD.id AND coven_scores.coven_id = OLD.coven_id;
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT NEW.coven_id, score FROM player_scores WHERE player_id = NEW.id AND NEW.coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = coven_scores.score + EXCLUDED.score;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION coven_score_cleanup_trigger() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM coven_scores WHERE coven_id = OLD.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION player_bucket_trigger() RETURNS trigger AS $$
+    DECLARE
+        old_bucket integer;
+        new_bucket integer;
+        row_shard integer;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            old_bucket := OLD.score >> 3;
+            row_shard := OLD.player_id % 8;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            new_bucket := NEW.score >> 3;
+            row_shard := NEW.player_id % 8;
+        END IF;
+        IF old_bucket IS NOT DISTINCT FROM new_bucket THEN
+            RETURN NULL;
+        END IF;
+        PERFORM 1 FROM player_score_buckets
+        WHERE shard = row_shard AND bucket IN (old_bucket, new_bucket) ORDER BY bucket FOR UPDATE;
+        IF old_bucket IS NOT NULL THEN
+            UPDATE player_score_buckets SET players = players - 1 WHERE bucket = old_bucket AND shard = row_shard;
+        END IF;
+        IF new_bucket IS NOT NULL THEN
+            INSERT INTO player_score_buckets (bucket, shard, players) VALUES (new_bucket, row_shard, 1)
+            ON CONFLICT (bucket, shard) DO UPDATE SET players = player_score_buckets.players + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION coven_bucket_trigger() RETURNS trigger AS $$
+    DECLARE
+        old_bucket integer;
+        new_bucket integer;
+        row_shard integer;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            old_bucket := OLD.score >> 8;
+            row_shard := OLD.coven_id % 8;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            new_bucket := NEW.score >> 8;
+            row_shard := NEW.coven_id % 8;
+        END IF;
+        IF old_bucket IS NOT DISTINCT FROM new_bucket THEN
+            RETURN NULL;
+        END IF;
+        PERFORM 1 FROM coven_score_buckets
+        WHERE shard = row_shard AND bucket IN (old_bucket, new_bucket) ORDER BY bucket FOR UPDATE;
+        IF old_bucket IS NOT NULL THEN
+            UPDATE coven_score_buckets SET covens = covens - 1 WHERE bucket = old_bucket AND shard = row_shard;
+        END IF;
+        IF new_bucket IS NOT NULL THEN
+            INSERT INTO coven_score_buckets (bucket, shard, covens) VALUES (new_bucket, row_shard, 1)
+            ON CONFLICT (bucket, shard) DO UPDATE SET covens = coven_score_buckets.covens + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_inventory_score ON inventory_items",
+    """
+    CREATE TRIGGER trg_inventory_score AFTER INSERT OR UPDATE OF quantity, player_id OR DELETE ON inventory_items
+    FOR EACH ROW EXECUTE FUNCTION inventory_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_score ON player_scores",
+    """
+    CREATE TRIGGER trg_player_score AFTER INSERT OR UPDATE OF score OR DELETE ON player_scores
+    FOR EACH ROW EXECUTE FUNCTION player_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_coven_score ON players",
+    """
+    CREATE TRIGGER trg_player_coven_score AFTER UPDATE OF coven_id ON players
+    FOR EACH ROW EXECUTE FUNCTION player_coven_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_score_cleanup ON players",
+    """
+    CREATE TRIGGER trg_player_score_cleanup BEFORE DELETE ON players
+    FOR EACH ROW EXECUTE FUNCTION player_coven_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_coven_score_cleanup ON covens",
+    """
+    CREATE TRIGGER trg_coven_score_cleanup AFTER DELETE ON covens
+    FOR EACH ROW EXECUTE FUNCTION coven_score_cleanup_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_bucket ON player_scores",
+    """
+    CREATE TRIGGER trg_player_bucket AFTER INSERT OR UPDATE OF score OR DELETE ON player_scores
+    FOR EACH ROW EXECUTE FUNCTION player_bucket_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_coven_bucket ON coven_scores",
+    """
+    CREATE TRIGGER trg_coven_bucket AFTER INSERT OR UPDATE OF score OR DELETE ON coven_scores
+    FOR EACH ROW EXECUTE FUNCTION coven_bucket_trigger()
+    """,
+]
+
+SCORE_TRIGGERS = {"sqlite": SQLITE_TRIGGERS, "postgresql": POSTGRESQL_TRIGGERS}
+
+BACKFILL = [
+    "DELETE FROM coven_score_buckets",
+    "DELETE FROM player_score_buckets",
+    "DELETE FROM coven_scores",
+    "DELETE FROM player_scores",
+    """
+    INSERT INTO player_scores (player_id, score)
+    SELECT player_id, SUM(quantity) FROM inventory_items GROUP BY player_id HAVING SUM(quantity) != 0
+    """,
+    """
+    INSERT INTO coven_scores (coven_id, score)
+    SELECT players.coven_id, SUM(player_scores.score) FROM player_scores
+    JOIN players ON players.id = player_scores.player_id
+    WHERE players.coven_id IS NOT NULL GROUP BY players.coven_id
+    """,
+    """
+    INSERT INTO player_score_buckets (bucket, shard, players)
+    SELECT score >> 3, player_id % 8, COUNT(*) FROM player_scores GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO coven_score_buckets (bucket, shard, covens)
+    SELECT score >> 8, coven_id % 8, COUNT(*) FROM coven_scores GROUP BY 1, 2
+    """,
+]
+
+
+def _install_triggers(connection: Connection) -> None:
+    for statement in SCORE_TRIGGERS.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+
+
+def _drop_triggers(connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        for name in re.findall(r"CREATE TRIGGER IF NOT EXISTS (\w+)", "".join(SQLITE_TRIGGERS)):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    elif connection.dialect.name == "postgresql":
+        for statement in POSTGRESQL_TRIGGERS:
+            if statement.startswith("DROP TRIGGER"):
+                connection.exec_driver_sql(statement)
+        for function in (
+            "inventory_score_trigger", "player_score_trigger", "player_coven_score_trigger", "coven_score_cleanup_trigger",
+            "player_bucket_trigger", "coven_bucket_trigger",
+        ):
+            connection.exec_driver_sql(f"DROP FUNCTION IF EXISTS {function}()")
+
+
+def _backfill(connection: Connection) -> None:
+    # Triggers fire on the inserts, so drop them around the rebuild
+    _drop_triggers(connection)
+    for statement in BACKFILL:
+        connection.exec_driver_sql(statement)
+    _install_triggers(connection)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('player_scores',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.PrimaryKeyConstraint('player_id')
+    )
+    op.create_index('ix_player_scores_rank', 'player_scores', [sa.text('score DESC'), 'player_id'], unique=False)
+    op.create_table('player_score_buckets',
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('players', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'shard')
+    )
+    op.create_table('coven_scores',
+    sa.Column('coven_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['coven_id'], ['covens.id'], ),
+    sa.PrimaryKeyConstraint('coven_id')
+    )
+    op.create_index('ix_coven_scores_rank', 'coven_scores', [sa.text('score DESC'), 'coven_id'], unique=False)
+    op.create_table('coven_score_buckets',
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('shard', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('covens', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'shard')
+    )
+    # Fill the tables from the current inventory, then leave them to the triggers
+    _backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_triggers(op.get_bind())
+    op.drop_table('coven_score_buckets')
+    op.drop_index('ix_coven_scores_rank', table_name='coven_scores')
+    op.drop_table('coven_scores')
+    op.drop_table('player_score_buckets')
+    op.drop_index('ix_player_scores_rank', table_name='player_scores')
+    op.drop_table('player_scores')
@@ -0,0 +1,34 @@
+"""ritual cooldowns
+
+Revision ID: b52e94d1f0c6
+Revises: 7e1b3c90d2a4
+Create Date: 2026-10-17 14:21:37.552903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e94d1f0c6'
+down_revision: Union[str, Sequence[str], None] = '7e1b3c90d2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ritual_cooldowns',
+    sa.Column('player_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ritual', sa.String(), nullable=False),
+    sa.Column('performed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('player_id', 'ritual')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ritual_cooldowns')
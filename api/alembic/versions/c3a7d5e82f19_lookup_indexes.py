@@ -0,0 +1,62 @@
+"""lookup indexes
+
+Revision ID: c3a7d5e82f19
+Revises: b52e94d1f0c6
+Create Date: 2026-10-17 15:02:48.913550
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7d5e82f19'
+down_revision: Union[str, Sequence[str], None] = 'b52e94d1f0c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger("alembic.runtime.migration")
+
+
+def _drop_duplicate_unlocks() -> None:
+    """Keep the first unlock of each piece of knowledge so the unique constraint can be created.
+
+    Every removed entry is logged, since the rows cannot be brought back.
+    """
+    bind = op.get_bind()
+    duplicates = bind.exec_driver_sql(
+        "SELECT player_id, knowledge_key, MIN(id), COUNT(*) FROM book_of_shadows_entries "
+        "GROUP BY player_id, knowledge_key HAVING COUNT(*) > 1 ORDER BY player_id, knowledge_key"
+    ).all()
+    if not duplicates:
+        return
+    for player_id, knowledge_key, kept_id, count in duplicates:
+        log.warning("Player %s unlocked %r %d times; keeping entry %s, removing the rest", player_id, knowledge_key, count, kept_id)
+    removed = bind.exec_driver_sql(
+        "DELETE FROM book_of_shadows_entries WHERE id NOT IN "
+        "(SELECT MIN(id) FROM book_of_shadows_entries GROUP BY player_id, knowledge_key)"
+    ).rowcount
+    log.warning("Removed %d duplicate book_of_shadows_entries rows for %d players", removed, len({row[0] for row in duplicates}))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _drop_duplicate_unlocks()
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('book_of_shadows_entries', schema=None) as batch_op:
+            batch_op.create_unique_constraint('uq_book_of_shadows_player_knowledge', ['player_id', 'knowledge_key'])
+    else:
+        op.create_unique_constraint('uq_book_of_shadows_player_knowledge', 'book_of_shadows_entries', ['player_id', 'knowledge_key'])
+    op.create_index('ix_players_coven_id_id', 'players', ['coven_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_players_coven_id_id', table_name='players')
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('book_of_shadows_entries', schema=None) as batch_op:
+            batch_op.drop_constraint('uq_book_of_shadows_player_knowledge', type_='unique')
+    else:
+        op.drop_constraint('uq_book_of_shadows_player_knowledge', 'book_of_shadows_entries', type_='unique')
@@ -1,43 +1,62 @@
 import asyncio
 from contextlib import asynccontextmanager
-from pathlib import Path
 import logging
+import os
+import time
 
 import uvicorn
-from alembic import command as alembic_command
-from alembic.config import Config as AlembicConfig
 from fastapi import FastAPI
 
-from database import DATABASE_URL
+from database import SYNC_DATABASE_URL, engine
+from migrations import current_revisions, head_revisions, upgrade as upgrade_database
 
 from routers.core import router as core_router
 from routers.players import router as players_router
 from routers.covens import router as covens_router
 from routers.inventory import router as inventory_router
+from routers.moon import router as moon_router
+from routers.leaderboard import router as leaderboard_router
+from routers.rituals import router as rituals_router
+from routers.familiars import router as familiars_router
+from routers.book_of_shadows import router as book_of_shadows_router
+from metrics import MetricsMiddleware, router as metrics_router
 
+# Deployments migrate once with `python src/migrations.py upgrade` before starting workers and set this to 0.
+# Left on, a worker that finds the database behind migrates it itself, under the lock so only one of them does.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes", "on")
 
-def _build_alembic_config() -> AlembicConfig:
-    cfg = AlembicConfig()
-    api_dir = Path(__file__).resolve().parents[1]
+logger = logging.getLogger("moonlit.api")
 
-    cfg.set_main_option("script_location", str(api_dir / "alembic"))
-    cfg.set_main_option("sqlalchemy.url", DATABASE_URL)
 
-    return cfg
-
-
-async def _apply_db_migrations():
-    cfg = _build_alembic_config()
+async def _check_db_migrations(app: FastAPI):
+    # Workers only compare the stamped revision with the version files; Alembic is never imported here
+    app.state.migration_error = None
+    app.state.migrated_on_startup = False
     try:
-        await asyncio.to_thread(alembic_command.upgrade, cfg, "head")
+        async with engine.connect() as conn:
+            current = await current_revisions(conn)
+        heads = head_revisions()
+        if current == heads:
+            return
+        if not MIGRATE_ON_STARTUP:
+            app.state.migration_error = (
+                f"Database is at {', '.join(sorted(current)) or 'no revision'}, head is {', '.join(sorted(heads))}; "
+                "run `python src/migrations.py upgrade`"
+            )
+            return
+        app.state.migrated_on_startup = await asyncio.to_thread(upgrade_database, SYNC_DATABASE_URL)
     except Exception as exc:
-        # Proceed with startup even if migrations fail; log for visibility
-        logging.getLogger("moonlit.api").exception("Alembic migration failed")
+        # Proceed with startup even if migrations fail, but stay out of rotation: /readyz reports the error
+        logger.exception("Alembic migration failed")
+        app.state.migration_error = f"{type(exc).__name__}: {exc}"
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await _apply_db_migrations()
+    started = time.perf_counter()
+    await _check_db_migrations(app)
+    app.state.startup_seconds = time.perf_counter() - started
+    logger.info("Startup checks took %.1f ms (migrated: %s)", app.state.startup_seconds * 1000, app.state.migrated_on_startup)
     yield
 
 
@@ -47,6 +66,13 @@ app.include_router(core_router)
 app.include_router(players_router)
 app.include_router(covens_router)
 app.include_router(inventory_router)
+app.include_router(moon_router)
+app.include_router(leaderboard_router)
+app.include_router(rituals_router)
+app.include_router(familiars_router)
+app.include_router(book_of_shadows_router)
+app.include_router(metrics_router)
+app.add_middleware(MetricsMiddleware)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8123)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Coven, Player
+from schemas import CovenRead, PlayerRead
+
+# Read-through cache for the records nearly every bot interaction starts with. Entries hold the JSON of the
+# read schema, so any backend only has to store strings; the in-process LRU is the default, and a shared
+# backend (e.g. Redis) can be installed with configure_cache() when the API runs with several workers.
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+# Keys queued on a session with invalidate_on_commit() are dropped once its transaction commits
+PENDING_INVALIDATIONS = "cache_invalidations"
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with a TTL; entries past max_entries are evicted least recently used first."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class ReadThroughCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation of a key, so a read that started before it can tell not to store its row
+        self._generations: dict[str, int] = {}
+
+    def generation(self, key: str) -> int:
+        return self._generations.get(key, 0)
+
+    async def get(self, key: str, model: type[ModelT]) -> ModelT | None:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return model.model_validate_json(value)
+
+    async def set(self, key: str, value: BaseModel, generation: int | None = None) -> None:
+        """Store value, unless key was invalidated since generation was taken: the row may predate that write."""
+        if generation is not None and generation != self.generation(key):
+            return
+        await self.backend.set(key, value.model_dump_json())
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        if keys:
+            await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self._generations.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+cache = ReadThroughCache(MemoryCache())
+
+
+def configure_cache(backend: CacheBackend) -> None:
+    cache.backend = backend
+
+
+def player_key(player_id: int) -> str:
+    return f"player:{player_id}"
+
+
+def coven_key(coven_id: int) -> str:
+    return f"coven:{coven_id}"
+
+
+def invalidate_on_commit(db: AsyncSession, keys: Iterable[str]) -> None:
+    # Entries are dropped only after the commit, once the new row is visible. A reader that fetched the old row
+    # before that sees the key's generation move and doesn't store it (see ReadThroughCache.set); generations
+    # are per process, so with a shared backend a reader in another worker can still re-cache the old row, and
+    # that entry is then stale for at most the backend's TTL.
+    db.info.setdefault(PENDING_INVALIDATIONS, set()).update(keys)
+
+
+# For read-only endpoints. Another worker's delete only drops its own process's entry, so a deleted player or
+# coven can still be cached here; write paths check existence with db.get() instead.
+
+async def get_cached_player(db: AsyncSession, player_id: int) -> PlayerRead | None:
+    generation = cache.generation(player_key(player_id))
+    player = await cache.get(player_key(player_id), PlayerRead)
+    if player is None:
+        db_player = await db.get(Player, player_id)
+        if db_player is None:
+            return None
+        player = PlayerRead.model_validate(db_player)
+        await cache.set(player_key(player_id), player, generation)
+    return player
+
+
+async def get_cached_coven(db: AsyncSession, coven_id: int) -> CovenRead | None:
+    generation = cache.generation(coven_key(coven_id))
+    coven = await cache.get(coven_key(coven_id), CovenRead)
+    if coven is None:
+        db_coven = await db.get(Coven, coven_id)
+        if db_coven is None:
+            return None
+        coven = CovenRead.model_validate(db_coven)
+        await cache.set(coven_key(coven_id), coven, generation)
+    return coven
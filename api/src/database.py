@@ -1,15 +1,244 @@
 import os
+import time
 import datetime
-from sqlalchemy import create_engine, String, Integer, DateTime, ForeignKey, MetaData, UniqueConstraint
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship, Mapped, mapped_column
+import logging
+from contextvars import ContextVar
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index, MetaData, UniqueConstraint, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.orm import declarative_base, relationship, Mapped, mapped_column
+
+from score_triggers import install_score_triggers
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///test.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+# The API talks to the database through an async driver so queries never block the event loop.
+# Plain URLs are upgraded to the async driver of their backend, explicit async URLs are used as-is.
+# Alembic keeps running on the matching sync driver.
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql"}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() not in ASYNC_DRIVERS or parsed.get_driver_name() in ("aiosqlite", "asyncpg"):
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def to_sync_url(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_driver_name() not in ("aiosqlite", "asyncpg"):
+        return url
+    return parsed.set(drivername=SYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+SYNC_DATABASE_URL = to_sync_url(DATABASE_URL)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the single writer, NORMAL sync is
+# durable across application crashes in WAL mode, and busy_timeout makes a writer wait for the lock instead
+# of failing with "database is locked". Set a variable to an empty string to leave that pragma at SQLite's default.
+def sqlite_pragmas() -> dict[str, str]:
+    pragmas = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+        "cache_size": os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024)),  # negative means KiB: 64 MiB per connection
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+# Pool settings for server databases; SQLite file databases keep SQLAlchemy's smaller defaults unless overridden
+def pool_options(backend: str) -> dict:
+    server = backend != "sqlite"
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10" if server else "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20" if server else "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", server),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800" if server else "-1")),
+    }
+
+
+class PoolStats:
+    """How long requests waited to check a connection out of the pool, shared by every TimedAsyncQueuePool."""
+
+    # Upper bounds in seconds of the wait histogram; the last bucket catches everything slower
+    BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+
+    def record(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+        for index, bound in enumerate(self.BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(self.BUCKETS)
+        self.buckets[index] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "wait_histogram": dict(zip([*map(str, self.BUCKETS), "+Inf"], self.buckets)),
+        }
+
+
+POOL_STATS = PoolStats()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records the checkout wait: time spent waiting for a free connection or opening a new one."""
+
+    stats = POOL_STATS
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - started)
+
+
+def _apply_pragmas(engine: AsyncEngine, pragmas: dict[str, str]) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def build_engine(url: str = ASYNC_DATABASE_URL, pragmas: dict[str, str] | None = None, **overrides) -> AsyncEngine:
+    """Engine for the API. SQLite connections get ``sqlite_pragmas()`` (or ``pragmas``), file and server
+    databases get a TimedAsyncQueuePool sized by ``pool_options()``. Keyword arguments override either."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    options = {}
+    # In-memory SQLite lives in a single connection, so it keeps SQLAlchemy's static pool
+    if backend != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options = {"poolclass": TimedAsyncQueuePool, **pool_options(backend)}
+    options.update(overrides)
+    engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False} if backend == "sqlite" else {},
+        **options,
+    )
+    if backend == "sqlite":
+        _apply_pragmas(engine, sqlite_pragmas() if pragmas is None else pragmas)
+    return engine
+
+
+def pool_metrics(engine: AsyncEngine) -> dict:
+    """Checkout wait statistics plus the current occupancy of the engine's pool."""
+    pool = engine.pool
+    metrics = POOL_STATS.snapshot()
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        # A negative max_overflow means the pool may grow without limit
+        capacity = pool.size() + pool._max_overflow if pool._max_overflow >= 0 else None
+        metrics.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(), capacity=capacity)
+    return metrics
+
+
+# Statements slower than this are logged with their route and the shape of their parameters; empty disables
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS") or "inf")
+# Raise instead of warn when a request runs more statements than its route's query_budget; the tests turn this on
+QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "").lower() in ("1", "true", "yes", "on")
+
+sql_logger = logging.getLogger("moonlit.sql")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryStats:
+    """Statements executed and time spent in the database while serving one request."""
+
+    __slots__ = ("count", "seconds", "budget", "scope")
+
+    def __init__(self, scope: dict | None = None):
+        self.count = 0
+        self.seconds = 0.0
+        # Maximum statements for the request, set by the route's query_budget dependency
+        self.budget: int | None = None
+        self.scope = scope
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "-"
+        # The matched route is only in the scope once routing is done; until then fall back to the raw path
+        route = self.scope.get("route")
+        return f"{self.scope.get('method')} {getattr(route, 'path', self.scope.get('path'))}"
+
+
+# Set by the metrics middleware for the duration of a request; statements outside a request are not counted
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+def parameters_shape(parameters, executemany: bool = False) -> str:
+    """Types of a statement's parameters without their values, e.g. ``(int, str)`` or ``100 x (int, str)``."""
+    if executemany:
+        return f"{len(parameters)} x {parameters_shape(parameters[0])}" if parameters else "0 x ()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in parameters or ()) + ")"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = current_query_stats.get()
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        sql_logger.warning(
+            "Slow query (%.1f ms) in %s: %s params=%s",
+            elapsed * 1000, stats.route if stats else "-", " ".join(statement.split()), parameters_shape(parameters, executemany),
+        )
+    if stats is None:
+        return
+    stats.count += 1
+    stats.seconds += elapsed
+    if stats.budget is not None and stats.count == stats.budget + 1:
+        message = f"{stats.route} exceeded its budget of {stats.budget} statements with: {' '.join(statement.split())}"
+        if QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(message)
+        sql_logger.warning(message)
+
+
+engine = build_engine()
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # Discord users have a player record, and the player record is associated with a coven of players.
@@ -19,6 +248,7 @@ class Coven(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
     description: Mapped[str | None] = mapped_column(String, nullable=True)
+    member_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False) # kept in step by the membership routes
     players: Mapped[list["Player"]] = relationship("Player", back_populates="coven")
 
     def __repr__(self):
@@ -26,6 +256,10 @@ class Coven(Base):
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        # Coven member lists and coven-wide grants filter on coven_id and page by id
+        Index("ix_players_coven_id_id", "coven_id", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True, index=True, unique=True, autoincrement=False) # this is the discord user id.
     name: Mapped[str | None] = mapped_column(String, nullable=True) # not discord username; actual 'witch' name
     coven_id: Mapped[int | None] = mapped_column(ForeignKey("covens.id"), nullable=True)
@@ -33,6 +267,7 @@ class Player(Base):
     inventory: Mapped[list["InventoryItem"]] = relationship("InventoryItem", back_populates="player", cascade="all, delete-orphan")
     familiars: Mapped[list["Familiar"]] = relationship("Familiar", back_populates="player", cascade="all, delete-orphan")
     book_of_shadows: Mapped[list["BookOfShadowsEntry"]] = relationship("BookOfShadowsEntry", back_populates="player", cascade="all, delete-orphan")
+    ritual_cooldowns: Mapped[list["RitualCooldown"]] = relationship("RitualCooldown", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Player {self.name}, {self.id}>"
@@ -61,6 +296,10 @@ class Familiar(Base):
 
 class BookOfShadowsEntry(Base):
     __tablename__ = "book_of_shadows_entries"
+    __table_args__ = (
+        # Knowledge is unlocked once per player; also the index for looking up a player's entries
+        UniqueConstraint("player_id", "knowledge_key", name="uq_book_of_shadows_player_knowledge"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     player_id: Mapped[int] = mapped_column(ForeignKey("players.id"), nullable=False)
     knowledge_key: Mapped[str] = mapped_column(String, nullable=False) # Corresponds to a knowledge file in the knowledge directory
@@ -69,4 +308,50 @@ class BookOfShadowsEntry(Base):
 
     def __repr__(self):
         return f"<BookOfShadowsEntry {self.knowledge_key}, {self.id}>"
-    
\ No newline at end of file
+    
+class RitualCooldown(Base):
+    __tablename__ = "ritual_cooldowns"
+    # The composite primary key is the (player_id, ritual) index every cooldown check goes through
+    player_id: Mapped[int] = mapped_column(ForeignKey("players.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    ritual: Mapped[str] = mapped_column(String, primary_key=True)
+    performed_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False) # UTC
+
+    def __repr__(self):
+        return f"<RitualCooldown {self.player_id}, {self.ritual}>"
+
+
+# Leaderboard tables. Nothing in the app writes them: database triggers (score_triggers.py) keep them in step
+# with inventory_items, players and covens, so top-N and rank queries never aggregate the inventory.
+
+class PlayerScore(Base):
+    __tablename__ = "player_scores"
+    player_id: Mapped[int] = mapped_column(ForeignKey("players.id"), primary_key=True, autoincrement=False)
+    score: Mapped[int] = mapped_column(Integer, default=0, nullable=False) # total quantity of the player's items
+
+# Top-N walks these indexes from the start, ties going to the lower id; a rank counts the entries above a score
+# within its bucket here and takes the rest from the bucket tables
+Index("ix_player_scores_rank", PlayerScore.score.desc(), PlayerScore.player_id)
+
+class PlayerScoreBucket(Base):
+    __tablename__ = "player_score_buckets"
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False) # score >> PLAYER_BUCKET_BITS
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False) # player_id % SCORE_SHARDS
+    players: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class CovenScore(Base):
+    __tablename__ = "coven_scores"
+    coven_id: Mapped[int] = mapped_column(ForeignKey("covens.id"), primary_key=True, autoincrement=False)
+    score: Mapped[int] = mapped_column(Integer, default=0, nullable=False) # sum of the members' scores
+
+Index("ix_coven_scores_rank", CovenScore.score.desc(), CovenScore.coven_id)
+
+class CovenScoreBucket(Base):
+    __tablename__ = "coven_score_buckets"
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False) # score >> COVEN_BUCKET_BITS
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False) # coven_id % SCORE_SHARDS
+    covens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_score_triggers(target, connection, **kw):
+    install_score_triggers(connection)
@@ -1,19 +1,31 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Callable
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import SessionLocal
+from cache import PENDING_INVALIDATIONS, cache
+from database import SessionLocal, current_query_stats
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with SessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await cache.invalidate(*db.info.pop(PENDING_INVALIDATIONS, ()))
 
 
+def query_budget(statements: int) -> Callable[[], None]:
+    """Route dependency capping how many statements one request may run.
+
+    Going over logs a warning, or raises QueryBudgetExceeded with QUERY_BUDGET_ENFORCE set, so an N+1 fails
+    the test that exercises it. Counting needs the metrics middleware; without it the budget is not checked.
+    """
+    async def set_budget() -> None:
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.budget = statements
+
+    return set_budget
@@ -0,0 +1,139 @@
+from collections.abc import Mapping, Sequence
+
+from sqlalchemy import ColumnElement, Row, Table, case, delete, literal, select, true, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import InventoryItem, Player
+
+# Quantities are only ever changed inside a single SQL statement, never read into Python, adjusted and
+# written back. Two loot drops landing at once then both apply instead of one of them tripping over
+# uq_inventory_player_item.
+
+inventory_items = InventoryItem.__table__
+ITEM_COLUMNS = (inventory_items.c.id, inventory_items.c.player_id, inventory_items.c.item_name, inventory_items.c.quantity)
+
+# ON CONFLICT ... DO UPDATE lives in the dialect-specific insert constructs
+DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class InsufficientQuantity(Exception):
+    def __init__(self, item_names: list[str]):
+        super().__init__(f"Not enough of: {', '.join(item_names)}")
+        self.item_names = item_names
+
+
+def dialect_insert(db: AsyncSession, table: Table):
+    """INSERT into table in the construct of the session's dialect, so it can take ON CONFLICT clauses."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in DIALECT_INSERTS:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return DIALECT_INSERTS[dialect](table)
+
+
+def _add_on_conflict(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[inventory_items.c.player_id, inventory_items.c.item_name],
+        set_={"quantity": inventory_items.c.quantity + stmt.excluded.quantity},
+    )
+
+
+async def grant_item(db: AsyncSession, player_id: int, item_name: str, quantity: int) -> Row | None:
+    """Add ``quantity`` of an item to a player's inventory.
+
+    INSERT ... SELECT FROM players ... ON CONFLICT DO UPDATE ... RETURNING, so the player check, the insert
+    and the increment are one statement. Returns None when the player does not exist.
+    """
+    stmt = dialect_insert(db, inventory_items).from_select(
+        ["player_id", "item_name", "quantity"],
+        select(Player.id, literal(item_name), literal(quantity)).where(Player.id == player_id),
+    )
+    return (await db.execute(_add_on_conflict(stmt).returning(*ITEM_COLUMNS))).first()
+
+
+async def consume_item(db: AsyncSession, player_id: int, item_name: str, quantity: int) -> Row | None:
+    """Take ``quantity`` of an item out of a player's inventory.
+
+    The guarded UPDATE ... WHERE quantity >= :n only matches when there is enough of the item, so it cannot
+    go negative under concurrent consumers. Returns None when nothing was taken. An item used up entirely is
+    removed, like setting its quantity to 0 through the update endpoint.
+    """
+    row = (await db.execute(
+        update(inventory_items)
+        .where(
+            inventory_items.c.player_id == player_id,
+            inventory_items.c.item_name == item_name,
+            inventory_items.c.quantity >= quantity,
+        )
+        .values(quantity=inventory_items.c.quantity - quantity)
+        .returning(*ITEM_COLUMNS)
+    )).first()
+    if row is not None and row.quantity == 0:
+        await db.execute(delete(inventory_items).where(inventory_items.c.id == row.id, inventory_items.c.quantity == 0))
+    return row
+
+
+async def apply_deltas(db: AsyncSession, player_id: int, deltas: Mapping[str, int]) -> Sequence[Row]:
+    """Apply net quantity changes per item name to a player's inventory.
+
+    All consumes run as one guarded UPDATE with a CASE over the item names, all grants as one multi-row
+    upsert, so the whole batch costs a fixed number of statements however many items it touches. Raises
+    InsufficientQuantity if any consume cannot be covered; the caller's transaction must then be rolled back.
+    Items used up entirely come back with quantity 0 and are removed.
+    """
+    grants = {item_name: delta for item_name, delta in deltas.items() if delta > 0}
+    consumes = {item_name: -delta for item_name, delta in deltas.items() if delta < 0}
+    rows: list[Row] = []
+    if consumes:
+        amount = case(consumes, value=inventory_items.c.item_name)
+        consumed = (await db.execute(
+            update(inventory_items)
+            .where(
+                inventory_items.c.player_id == player_id,
+                inventory_items.c.item_name.in_(consumes),
+                inventory_items.c.quantity >= amount,
+            )
+            .values(quantity=inventory_items.c.quantity - amount)
+            .returning(*ITEM_COLUMNS)
+        )).all()
+        if len(consumed) != len(consumes):
+            covered = {row.item_name for row in consumed}
+            raise InsufficientQuantity(sorted(item_name for item_name in consumes if item_name not in covered))
+        used_up = [row.item_name for row in consumed if row.quantity == 0]
+        if used_up:
+            await db.execute(delete(inventory_items).where(
+                inventory_items.c.player_id == player_id,
+                inventory_items.c.item_name.in_(used_up),
+                inventory_items.c.quantity == 0,
+            ))
+        rows.extend(consumed)
+    if grants:
+        stmt = dialect_insert(db, inventory_items).values([
+            {"player_id": player_id, "item_name": item_name, "quantity": quantity} for item_name, quantity in grants.items()
+        ])
+        rows.extend((await db.execute(_add_on_conflict(stmt).returning(*ITEM_COLUMNS))).all())
+    return sorted(rows, key=lambda row: row.item_name)
+
+
+async def grant_to_players(db: AsyncSession, player_filter: ColumnElement[bool], items: Mapping[str, int], returning: bool = False) -> tuple[int, Sequence[Row]]:
+    """Grant every item to every player matching ``player_filter``.
+
+    One INSERT ... SELECT FROM players CROSS JOIN (items) ... ON CONFLICT DO UPDATE covers the whole event,
+    so a coven-wide reward costs a single statement whatever the member count. Returns the number of
+    players that received the items and, if ``returning`` is set, the resulting rows.
+    """
+    granted = [select(literal(item_name).label("item_name"), literal(quantity).label("quantity")) for item_name, quantity in items.items()]
+    granted_items = (union_all(*granted) if len(granted) > 1 else granted[0]).subquery("granted_items")
+    stmt = dialect_insert(db, inventory_items).from_select(
+        ["player_id", "item_name", "quantity"],
+        select(Player.id, granted_items.c.item_name, granted_items.c.quantity)
+        .select_from(Player)
+        .join(granted_items, true())
+        .where(player_filter),
+    )
+    stmt = _add_on_conflict(stmt)
+    if returning:
+        rows = (await db.execute(stmt.returning(*ITEM_COLUMNS))).all()
+        return len(rows) // len(items), rows
+    result = await db.execute(stmt)
+    return result.rowcount // len(items), []
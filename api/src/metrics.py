@@ -0,0 +1,174 @@
+import time
+from bisect import bisect_left
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from cache import cache
+from database import POOL_STATS, PoolStats, QueryStats, current_query_stats, engine, pool_metrics
+
+# Request metrics in the Prometheus text format. Everything is plain counters updated in place by a pure ASGI
+# middleware: recording a request costs two clock reads, a context variable and a few dict lookups, and all
+# formatting is deferred to whoever scrapes /metrics. Routes are labelled by their path template, so
+# /players/1 and /players/2 share a series and unmatched paths collapse into one.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bound plus +Inf; kept per bucket and made cumulative when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_seconds", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram(LATENCY_BUCKETS)
+        self.statuses: dict[int, int] = {}
+
+
+class Metrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        # (method, route template) -> metrics
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+
+    def record(self, method: str, route: str, status: int, seconds: float, queries: QueryStats) -> None:
+        key = (method, route)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.queries.observe(queries.count)
+        metrics.db_seconds.observe(queries.seconds)
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: Metrics = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        queries = QueryStats(scope)
+        token = current_query_stats.set(queries)
+        registry = self.registry
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.in_flight -= 1
+            current_query_stats.reset(token)
+            # The router stores the matched route in the scope on its way in
+            route = scope.get("route")
+            registry.record(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status, elapsed, queries)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, labels: dict, bounds: tuple, counts: list[int], total: float, count: int) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, bucket in zip([*bounds, "+Inf"], counts):
+        cumulative += bucket
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {total}")
+    lines.append(f"{name}_count{_labels(**labels) if labels else ''} {count}")
+    return lines
+
+
+def _header(name: str, kind: str, help_text: str) -> list[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def render_metrics(registry: Metrics = metrics, pool_stats: PoolStats = POOL_STATS) -> str:
+    routes = sorted(registry.routes.items())
+    lines = _header("moonlit_http_requests_in_flight", "gauge", "Requests currently being served.")
+    lines.append(f"moonlit_http_requests_in_flight {registry.in_flight}")
+
+    lines += _header("moonlit_http_responses_total", "counter", "Responses by route and status code.")
+    for (method, route), route_metrics in routes:
+        for status, count in sorted(route_metrics.statuses.items()):
+            lines.append(f"moonlit_http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+
+    for name, attribute, help_text in (
+        ("moonlit_http_request_duration_seconds", "latency", "Time to serve a request, by route."),
+        ("moonlit_db_queries_per_request", "queries", "Database statements executed per request, by route."),
+        ("moonlit_db_time_per_request_seconds", "db_seconds", "Time spent executing statements per request, by route."),
+    ):
+        lines += _header(name, "histogram", help_text)
+        for (method, route), route_metrics in routes:
+            histogram = getattr(route_metrics, attribute)
+            lines += _histogram_lines(name, {"method": method, "route": route}, histogram.bounds, histogram.counts, histogram.total, histogram.count)
+
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    lines += _header("moonlit_cache_hits_total", "counter", "Read-through cache hits.")
+    lines.append(f"moonlit_cache_hits_total {stats['hits']}")
+    lines += _header("moonlit_cache_misses_total", "counter", "Read-through cache misses.")
+    lines.append(f"moonlit_cache_misses_total {stats['misses']}")
+    lines += _header("moonlit_cache_hit_ratio", "gauge", "Share of cache lookups that hit.")
+    lines.append(f"moonlit_cache_hit_ratio {stats['hits'] / lookups if lookups else 0.0}")
+
+    lines += _header("moonlit_db_pool_checkout_wait_seconds", "histogram", "Time spent checking a connection out of the pool.")
+    lines += _histogram_lines(
+        "moonlit_db_pool_checkout_wait_seconds", {}, pool_stats.BUCKETS, pool_stats.buckets, pool_stats.wait_total, pool_stats.checkouts
+    )
+    lines += _header("moonlit_db_pool_checkout_timeouts_total", "counter", "Checkouts that gave up waiting for a connection.")
+    lines.append(f"moonlit_db_pool_checkout_timeouts_total {pool_stats.timeouts}")
+    pool = pool_metrics(engine)
+    for key, help_text in (("size", "Connections the pool keeps open."), ("checked_out", "Connections in use."), ("overflow", "Connections open beyond the pool size.")):
+        if key in pool:
+            lines += _header(f"moonlit_db_pool_{key}", "gauge", help_text)
+            lines.append(f"moonlit_db_pool_{key} {pool[key]}")
+    return "\n".join(lines) + "\n"
+
+
+router = APIRouter(tags=["core"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
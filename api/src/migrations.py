@@ -0,0 +1,152 @@
+import argparse
+import re
+import sys
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.pool import NullPool
+
+try:
+    import fcntl
+except ImportError:  # Windows; SQLite migrations there run unguarded
+    fcntl = None
+
+# Revision bookkeeping without importing Alembic: the head is read straight from the version files and the
+# database revision from alembic_version, so API workers can tell whether the schema is current cheaply.
+# Alembic itself is only imported by upgrade(), which the deploy step runs through this module's CLI:
+#
+#     python src/migrations.py upgrade    # migrate under the lock, a no-op when already at head
+#     python src/migrations.py check      # exit status 1 when the database is behind
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+_REVISION = re.compile(r"^revision(?:\s*:[^=]*)?\s*=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision(?:\s*:[^=]*)?\s*=\s*(.+)$", re.MULTILINE)
+
+
+@lru_cache(maxsize=1)
+def head_revisions(versions_dir: Path = VERSIONS_DIR) -> frozenset[str]:
+    """Revisions no other revision builds on. One, unless the history has unmerged branches."""
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        source = path.read_text()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision is not None:
+            # None, a single id or a tuple of ids for merge revisions
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return frozenset(revisions - parents)
+
+
+CURRENT_REVISIONS = text("SELECT version_num FROM alembic_version")
+
+# Key of the Postgres advisory lock held while migrating ("moon")
+MIGRATION_LOCK_ID = 0x6D6F6F6E
+
+
+async def current_revisions(conn: AsyncConnection) -> frozenset[str]:
+    """Revisions the database is stamped with; empty when Alembic never ran against it."""
+    try:
+        return frozenset((await conn.scalars(CURRENT_REVISIONS)).all())
+    except DBAPIError:
+        return frozenset()
+
+
+def database_revisions(url: str) -> frozenset[str]:
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            return frozenset(conn.scalars(CURRENT_REVISIONS).all())
+    except DBAPIError:
+        return frozenset()
+    finally:
+        engine.dispose()
+
+
+@contextmanager
+def migration_lock(url: str):
+    """Held by whoever migrates, so concurrently starting processes never run the same migration twice.
+
+    Postgres uses a session-level advisory lock; SQLite file databases lock a file next to the database.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        engine = create_engine(url, poolclass=NullPool)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+                try:
+                    yield
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+        finally:
+            engine.dispose()
+    elif backend == "sqlite" and parsed.database not in (None, "", ":memory:") and fcntl is not None:
+        with open(f"{parsed.database}.migrate.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def alembic_config(url: str):
+    from alembic.config import Config as AlembicConfig
+
+    cfg = AlembicConfig()
+    cfg.set_main_option("script_location", str(VERSIONS_DIR.parent))
+    cfg.set_main_option("sqlalchemy.url", url)
+    return cfg
+
+
+def upgrade(url: str) -> bool:
+    """Bring the database to head under the migration lock. Returns whether any migration ran.
+
+    Processes that waited on the lock find the database already current and return without touching Alembic.
+    """
+    with migration_lock(url):
+        if database_revisions(url) == head_revisions():
+            return False
+        from alembic import command as alembic_command
+
+        alembic_command.upgrade(alembic_config(url), "head")
+        return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Moonlit database migrations")
+    parser.add_argument("action", nargs="?", choices=("upgrade", "check", "current"), default="upgrade")
+    parser.add_argument("--url", help="database URL (default: DATABASE_URL)")
+    args = parser.parse_args(argv)
+    if args.url is None:
+        from database import SYNC_DATABASE_URL
+
+        args.url = SYNC_DATABASE_URL
+
+    heads = head_revisions()
+    if args.action == "upgrade":
+        started = time.perf_counter()
+        migrated = upgrade(args.url)
+        print(f"{'Migrated to' if migrated else 'Already at'} {', '.join(sorted(heads))} ({time.perf_counter() - started:.2f}s)")
+        return 0
+    current = database_revisions(args.url)
+    print(f"current: {', '.join(sorted(current)) or '(none)'}  head: {', '.join(sorted(heads))}")
+    if args.action == "check":
+        return 0 if current == heads else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import datetime as dt
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import ephem
+
+
+PRINCIPAL_PHASES = ("new", "first_quarter", "full", "third_quarter")
+# The phase between each principal phase and the one after it
+INTERMEDIATE_PHASES = ("waxing_crescent", "waxing_gibbous", "waning_gibbous", "waning_crescent")
+PHASE_SEARCHES = (ephem.next_new_moon, ephem.next_first_quarter_moon, ephem.next_full_moon, ephem.next_last_quarter_moon)
+
+SNAP_TOLERANCE_DAYS = 0.75  # ~18 hours
+# A lunation is ~29.5 days, so a month either side of a year holds the phases surrounding every instant in it
+_MARGIN_DAYS = 31.0
+
+
+class PrincipalPhase(NamedTuple):
+    phase: str
+    at: dt.datetime
+
+
+class MoonDay(NamedTuple):
+    date: dt.date
+    phase: str
+    illumination: float
+    principal_phase: Optional[PrincipalPhase]
+
+
+def _to_ephem(moment: dt.datetime) -> float:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return float(ephem.Date(moment))
+
+
+def _to_datetime(instant: float) -> dt.datetime:
+    return ephem.Date(instant).datetime().replace(microsecond=0, tzinfo=dt.timezone.utc)
+
+
+@lru_cache(maxsize=16)
+def _year_instants(year: int) -> tuple[tuple[float, ...], tuple[int, ...]]:
+    """Sorted principal phase instants (ephem dates) covering ``year`` plus a month either side."""
+    start = _to_ephem(dt.datetime(year, 1, 1)) - _MARGIN_DAYS
+    end = _to_ephem(dt.datetime(year + 1, 1, 1)) + _MARGIN_DAYS
+    instants = []
+    for index, search in enumerate(PHASE_SEARCHES):
+        instant = float(search(start))
+        while instant <= end:
+            instants.append((instant, index))
+            instant = float(search(instant + 1.0))
+    instants.sort()
+    return tuple(instant for instant, _ in instants), tuple(index for _, index in instants)
+
+
+def classify_phase(now: float, previous: dict[str, float], upcoming: dict[str, float]) -> str:
+    """Map the surrounding principal phase instants to one of the 8 phase keys.
+
+    The same rule as the bot's phase_calendar.classify_phase, which picks the avatar and bot.moon_phase; the two
+    run in separate images, and test_phase_calendar.py checks they agree over a whole year.
+    """
+    # If we are close to a principal phase, snap to it
+    distances = {key: min(now - previous[key], upcoming[key] - now) for key in PRINCIPAL_PHASES}
+    nearest_key = min(distances, key=distances.get)
+    if distances[nearest_key] <= SNAP_TOLERANCE_DAYS:
+        return nearest_key
+
+    # Otherwise we are between the most recent principal phase and the one after it
+    latest_key = max(previous, key=previous.get)
+    return INTERMEDIATE_PHASES[PRINCIPAL_PHASES.index(latest_key)]
+
+
+def _phase_key(instant: float, year: int) -> str:
+    times, phases = _year_instants(year)
+    position = bisect_right(times, instant)
+    # Phases strictly alternate, so the four instants on each side hold one of every kind
+    previous = {PRINCIPAL_PHASES[phases[i]]: times[i] for i in range(position - 4, position)}
+    upcoming = {PRINCIPAL_PHASES[phases[i]]: times[i] for i in range(position, position + 4)}
+    return classify_phase(instant, previous, upcoming)
+
+
+def phase_at(moment: dt.datetime) -> tuple[str, float]:
+    """Phase key and percent illumination at ``moment`` (naive datetimes are UTC)."""
+    instant = _to_ephem(moment)
+    year = ephem.Date(instant).tuple()[0]
+    return _phase_key(instant, year), round(float(ephem.Moon(instant).phase), 2)
+
+
+def upcoming_phases(moment: dt.datetime, count: int = 4) -> list[PrincipalPhase]:
+    """The next ``count`` principal phases after ``moment``."""
+    instant = _to_ephem(moment)
+    year = ephem.Date(instant).tuple()[0]
+    upcoming = []
+    while len(upcoming) < count:
+        times, phases = _year_instants(year)
+        start = bisect_right(times, instant)
+        for i in range(start, len(times)):
+            upcoming.append(PrincipalPhase(PRINCIPAL_PHASES[phases[i]], _to_datetime(times[i])))
+            if len(upcoming) == count:
+                break
+        if upcoming:
+            instant = _to_ephem(upcoming[-1].at) + 1e-6
+        year += 1
+    return upcoming
+
+
+@lru_cache(maxsize=4096)
+def moon_day(day: dt.date) -> MoonDay:
+    """Phase and illumination at noon UTC on ``day``, plus the principal phase falling on it, if any.
+
+    Memoized, so a festival calendar spanning a year is computed once and then served from the table.
+    """
+    noon = _to_ephem(dt.datetime(day.year, day.month, day.day, 12))
+    times, phases = _year_instants(day.year)
+    start = bisect_right(times, noon - 0.5)
+    principal = None
+    if times[start] < noon + 0.5:
+        principal = PrincipalPhase(PRINCIPAL_PHASES[phases[start]], _to_datetime(times[start]))
+    return MoonDay(day, _phase_key(noon, day.year), round(float(ephem.Moon(noon).phase), 2), principal)
+
+
+def moon_days(start: dt.date, end: dt.date) -> list[MoonDay]:
+    """One entry per day from ``start`` to ``end`` inclusive."""
+    return [moon_day(start + dt.timedelta(days=offset)) for offset in range((end - start).days + 1)]
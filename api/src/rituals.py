@@ -0,0 +1,94 @@
+import datetime as dt
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from sqlalchemy import Row, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Player, RitualCooldown
+from inventory_ops import apply_deltas, dialect_insert
+from moon import phase_at
+
+# Daily rituals reset at midnight UTC. Nothing is written at the reset: a ritual is available again once
+# its last performance is older than the most recent reset boundary.
+
+ritual_cooldowns = RitualCooldown.__table__
+
+
+class RitualDefinition(NamedTuple):
+    key: str
+    name: str
+    description: str
+    rewards: tuple[tuple[str, int], ...]
+    # Rewards are doubled while the moon is in one of these phases
+    bonus_phases: tuple[str, ...] = ()
+
+
+RITUALS = {
+    ritual.key: ritual
+    for ritual in (
+        RitualDefinition("gather", "Gather Herbs", "Forage the hedgerows for the day's herbs.",
+                         (("Dried Sage", 2), ("Mugwort", 1)), ("waxing_crescent", "first_quarter")),
+        RitualDefinition("brew", "Brew a Potion", "Simmer the cauldron and bottle what it gives.",
+                         (("Moonlit Dew", 1),), ("full",)),
+        RitualDefinition("divine", "Divination", "Read the signs for what the day may bring.",
+                         (("Omen Shard", 1),), ("new", "waning_crescent")),
+    )
+}
+
+
+def reset_boundary(now: dt.datetime) -> dt.datetime:
+    """The most recent daily reset at or before ``now`` (naive UTC)."""
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_reset(now: dt.datetime) -> dt.datetime:
+    return reset_boundary(now) + dt.timedelta(days=1)
+
+
+def utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+
+
+def is_available(performed_at: dt.datetime | None, now: dt.datetime) -> bool:
+    return performed_at is None or performed_at < reset_boundary(now)
+
+
+def ritual_rewards(ritual: RitualDefinition, now: dt.datetime) -> tuple[dict[str, int], bool]:
+    """Rewards for performing ``ritual`` at ``now``, and whether the moon phase bonus applied."""
+    bonus = phase_at(now)[0] in ritual.bonus_phases
+    return {item_name: quantity * (2 if bonus else 1) for item_name, quantity in ritual.rewards}, bonus
+
+
+async def stamp_ritual(db: AsyncSession, player_id: int, ritual: str, now: dt.datetime) -> bool:
+    """Record that the player performs ``ritual`` now, if it is off cooldown.
+
+    One INSERT ... SELECT FROM players ... ON CONFLICT DO UPDATE ... WHERE performed_at < boundary, so the
+    check and the stamp cannot be split by a concurrent request: of two racing performances exactly one
+    updates the row. Returns False when the player does not exist or the ritual is on cooldown.
+    """
+    stmt = dialect_insert(db, ritual_cooldowns).from_select(
+        ["player_id", "ritual", "performed_at"],
+        select(Player.id, literal(ritual), literal(now, RitualCooldown.performed_at.type)).where(Player.id == player_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ritual_cooldowns.c.player_id, ritual_cooldowns.c.ritual],
+        set_={"performed_at": stmt.excluded.performed_at},
+        where=ritual_cooldowns.c.performed_at < reset_boundary(now),
+    )
+    return (await db.execute(stmt.returning(ritual_cooldowns.c.performed_at))).first() is not None
+
+
+async def perform_ritual(db: AsyncSession, player_id: int, ritual: RitualDefinition, now: dt.datetime) -> tuple[Sequence[Row], bool] | None:
+    """Stamp the cooldown and grant the rewards in the caller's transaction. None if it cannot be performed."""
+    if not await stamp_ritual(db, player_id, ritual.key, now):
+        return None
+    rewards, bonus = ritual_rewards(ritual, now)
+    return await apply_deltas(db, player_id, rewards), bonus
+
+
+async def player_cooldowns(db: AsyncSession, player_id: int) -> dict[str, dt.datetime]:
+    rows = await db.execute(
+        select(RitualCooldown.ritual, RitualCooldown.performed_at).where(RitualCooldown.player_id == player_id)
+    )
+    return {row.ritual: row.performed_at for row in rows}
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from cache import get_cached_player
+from database import BookOfShadowsEntry, Player
+from dependencies import get_db
+from schemas import BookOfShadowsEntryCreate, BookOfShadowsEntryRead, BookOfShadowsEntryUpdate
+
+
+router = APIRouter(prefix="/book-of-shadows", tags=["book of shadows"])
+
+
+async def _unlocked(db: AsyncSession, player_id: int, knowledge_key: str) -> BookOfShadowsEntry | None:
+    return await db.scalar(
+        select(BookOfShadowsEntry).where(BookOfShadowsEntry.player_id == player_id, BookOfShadowsEntry.knowledge_key == knowledge_key)
+    )
+
+
+@router.post("", response_model=BookOfShadowsEntryRead, status_code=201)
+async def unlock_entry(new_entry: BookOfShadowsEntryCreate, db: AsyncSession = Depends(get_db)) -> BookOfShadowsEntryRead:
+    if await db.get(Player, new_entry.player_id) is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    # Each piece of knowledge is unlocked once per player
+    if await _unlocked(db, new_entry.player_id, new_entry.knowledge_key):
+        raise HTTPException(status_code=409, detail="Knowledge already unlocked")
+    db_entry = BookOfShadowsEntry(**new_entry.model_dump(exclude_none=True))
+    try:
+        db.add(db_entry)
+        await db.flush()
+    except IntegrityError:
+        # Lost a race with a concurrent unlock; uq_book_of_shadows_player_knowledge caught it
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Knowledge already unlocked")
+    await db.refresh(db_entry)
+    return BookOfShadowsEntryRead.model_validate(db_entry)
+
+
+@router.get("", response_model=list[BookOfShadowsEntryRead])
+async def get_entries(player_id: int, db: AsyncSession = Depends(get_db)) -> list[BookOfShadowsEntryRead]:
+    if not await get_cached_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    entries = (await db.scalars(
+        select(BookOfShadowsEntry).where(BookOfShadowsEntry.player_id == player_id).order_by(BookOfShadowsEntry.unlocked_at, BookOfShadowsEntry.id)
+    )).all()
+    return [BookOfShadowsEntryRead.model_validate(entry) for entry in entries]
+
+
+@router.get("/{entry_id}", response_model=BookOfShadowsEntryRead)
+async def get_entry(entry_id: int, db: AsyncSession = Depends(get_db)) -> BookOfShadowsEntryRead:
+    entry = await db.get(BookOfShadowsEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return BookOfShadowsEntryRead.model_validate(entry)
+
+
+@router.put("/{entry_id}", response_model=BookOfShadowsEntryRead)
+async def update_entry(entry_id: int, entry: BookOfShadowsEntryUpdate, db: AsyncSession = Depends(get_db)) -> BookOfShadowsEntryRead:
+    db_entry = await db.get(BookOfShadowsEntry, entry_id)
+    if not db_entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    if entry.knowledge_key is not None and entry.knowledge_key != db_entry.knowledge_key:
+        if await _unlocked(db, db_entry.player_id, entry.knowledge_key):
+            raise HTTPException(status_code=409, detail="Knowledge already unlocked")
+        db_entry.knowledge_key = entry.knowledge_key
+    if entry.unlocked_at is not None:
+        db_entry.unlocked_at = entry.unlocked_at
+    await db.flush()
+    await db.refresh(db_entry)
+    return BookOfShadowsEntryRead.model_validate(db_entry)
+
+
+@router.delete("/{entry_id}", status_code=204)
+async def delete_entry(entry_id: int, db: AsyncSession = Depends(get_db)):
+    entry = await db.get(BookOfShadowsEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    await db.delete(entry)
+    return Response(status_code=204)
@@ -1,10 +1,23 @@
+import asyncio
+import os
 import time
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from database import engine, pool_metrics
+from migrations import current_revisions, head_revisions
 
 
 router = APIRouter(tags=["core"])
 
+# Readiness probes hit every instance every few seconds; one check per interval is shared by all of them
+READYZ_CACHE_SECONDS = float(os.getenv("READYZ_CACHE_SECONDS", "2"))
+READYZ_DB_TIMEOUT_SECONDS = float(os.getenv("READYZ_DB_TIMEOUT_SECONDS", "1"))
+READYZ_MAX_DB_LATENCY_MS = float(os.getenv("READYZ_MAX_DB_LATENCY_MS", "250"))
+READYZ_MAX_POOL_SATURATION = float(os.getenv("READYZ_MAX_POOL_SATURATION", "0.9"))
+
 
 @router.get("/")
 async def root():
@@ -12,7 +25,85 @@ async def root():
 
 
 @router.get("/health")
-async def health_check():
-    return {"status": "healthy", "time": time.time()}
+async def health_check(request: Request):
+    return {
+        "status": "healthy",
+        "time": time.time(),
+        "startup_seconds": getattr(request.app.state, "startup_seconds", None),
+        "pool": pool_metrics(engine),
+    }
+
+
+@router.get("/livez")
+async def liveness():
+    # The process is up and serving; dependencies are /readyz's concern, so a database outage never restarts us
+    return {"status": "alive"}
+
+
+async def _probe_database() -> tuple[float, frozenset[str]]:
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        latency_ms = (time.perf_counter() - started) * 1000
+        return latency_ms, await current_revisions(conn)
+
+
+async def _check_database() -> tuple[dict, frozenset[str] | None]:
+    # The timeout covers the checkout too: an exhausted pool must fail the probe, not hold it for DB_POOL_TIMEOUT
+    try:
+        latency_ms, revisions = await asyncio.wait_for(_probe_database(), READYZ_DB_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"no answer within {READYZ_DB_TIMEOUT_SECONDS:g}s"}, None
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}, None
+    return {"ok": latency_ms <= READYZ_MAX_DB_LATENCY_MS, "latency_ms": round(latency_ms, 2)}, revisions
+
+
+def _check_pool() -> dict:
+    pool = pool_metrics(engine)
+    capacity = pool.get("capacity")
+    if not capacity:
+        return {"ok": True}
+    saturation = pool["checked_out"] / capacity
+    return {"ok": saturation < READYZ_MAX_POOL_SATURATION, "saturation": round(saturation, 3), "checked_out": pool["checked_out"], "capacity": capacity}
+
+
+def _check_migrations(app, current: frozenset[str] | None) -> dict:
+    error = getattr(app.state, "migration_error", None)
+    if error:
+        return {"ok": False, "error": error}
+    heads = head_revisions()
+    if current is None:
+        return {"ok": False, "head": sorted(heads), "error": "database not checked"}
+    return {"ok": current == heads, "head": sorted(heads), "current": sorted(current)}
+
+
+async def _evaluate_readiness(app) -> tuple[dict, int]:
+    # Sample the pool before the probe takes a connection of its own, and don't queue behind a saturated one
+    pool = _check_pool()
+    if pool["ok"]:
+        database, current = await _check_database()
+    else:
+        database, current = {"ok": False, "error": "skipped, pool saturated"}, None
+    checks = {"database": database, "pool": pool, "migrations": _check_migrations(app, current)}
+    ready = all(check["ok"] for check in checks.values())
+    body = {"status": "ready" if ready else "degraded", "checks": checks, "time": time.time()}
+    status_code = 200 if ready else 503
+    app.state.readiness = (time.monotonic() + READYZ_CACHE_SECONDS, body, status_code)
+    return body, status_code
+
 
+@router.get("/readyz")
+async def readiness(request: Request):
+    state = request.app.state
+    cached = getattr(state, "readiness", None)
+    if cached is not None and cached[0] > time.monotonic():
+        return JSONResponse(cached[1], status_code=cached[2])
 
+    # Probes arriving while a check runs wait for that check instead of starting their own
+    check = getattr(state, "readiness_check", None)
+    if check is None or check.done():
+        check = state.readiness_check = asyncio.create_task(_evaluate_readiness(request.app))
+    # A probe that gives up must not cancel the check the others are waiting on
+    body, status_code = await asyncio.shield(check)
+    return JSONResponse(body, status_code=status_code)
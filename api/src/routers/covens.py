@@ -1,68 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from collections.abc import AsyncIterator
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from database import Coven, Player
+from cache import coven_key, get_cached_coven, invalidate_on_commit
+from database import Coven, Player, SessionLocal
 from dependencies import get_db
 from schemas import CovenCreate, CovenRead, CovenUpdate, PlayerRead
 
 
 router = APIRouter(prefix="/covens", tags=["covens"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
 
 @router.post("", response_model=CovenRead, status_code=201)
-async def create_coven(new_coven: CovenCreate, db: Session = Depends(get_db)) -> CovenRead:
+async def create_coven(new_coven: CovenCreate, db: AsyncSession = Depends(get_db)) -> CovenRead:
     db_coven = Coven(**new_coven.model_dump())
     try:
         db.add(db_coven)
-        db.flush()
+        await db.flush()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Coven name already exists")
-    db.refresh(db_coven)
+    await db.refresh(db_coven)
     return CovenRead.model_validate(db_coven)
 
 
 @router.get("/{coven_id}", response_model=CovenRead)
-async def get_coven(coven_id: int, db: Session = Depends(get_db)) -> CovenRead:
-    coven = db.get(Coven, coven_id)
+async def get_coven(coven_id: int, db: AsyncSession = Depends(get_db)) -> CovenRead:
+    coven = await get_cached_coven(db, coven_id)
     if not coven:
         raise HTTPException(status_code=404, detail="Coven not found")
-    return CovenRead.model_validate(coven)
+    return coven
 
 
 @router.put("/{coven_id}", response_model=CovenRead)
-async def update_coven(coven_id: int, coven: CovenUpdate, db: Session = Depends(get_db)) -> CovenRead:
-    db_coven = db.get(Coven, coven_id)
+async def update_coven(coven_id: int, coven: CovenUpdate, db: AsyncSession = Depends(get_db)) -> CovenRead:
+    db_coven = await db.get(Coven, coven_id)
     if not db_coven:
         raise HTTPException(status_code=404, detail="Coven not found")
     if coven.name is not None:
         db_coven.name = coven.name
     if coven.description is not None:
         db_coven.description = coven.description
-    db.flush()
-    db.refresh(db_coven)
+    invalidate_on_commit(db, [coven_key(coven_id)])
+    await db.flush()
+    await db.refresh(db_coven)
     return CovenRead.model_validate(db_coven)
 
 
 @router.delete("/{coven_id}", status_code=204)
-async def delete_coven(coven_id: int, db: Session = Depends(get_db)):
-    coven = db.get(Coven, coven_id)
+async def delete_coven(coven_id: int, db: AsyncSession = Depends(get_db)):
+    coven = await db.get(Coven, coven_id)
     if not coven:
         raise HTTPException(status_code=404, detail="Coven not found")
-    has_players = db.scalar(select(Player.id).where(Player.coven_id == coven_id).limit(1)) is not None
-    if has_players:
+    if coven.member_count > 0:
         raise HTTPException(status_code=409, detail="Coven has players; remove players first")
-    db.delete(coven)
+    invalidate_on_commit(db, [coven_key(coven_id)])
+    await db.delete(coven)
     return Response(status_code=204)
 
 
-@router.get("/{coven_id}/players", response_model=list[PlayerRead])
-async def get_players_in_coven(coven_id: int, db: Session = Depends(get_db)) -> list[PlayerRead]:
-    if not db.get(Coven, coven_id):
+@router.get("/{coven_id}/players", response_model=list[PlayerRead], responses={200: {"content": {"application/x-ndjson": {}}}})
+async def get_players_in_coven(
+    coven_id: int,
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db),
+) -> list[PlayerRead]:
+    # Keyset pagination on the primary key: pass the last id of a page as after_id to get the next one.
+    # With stream=true the members are written as NDJSON straight from a server-side cursor instead.
+    if not await get_cached_coven(db, coven_id):
         raise HTTPException(status_code=404, detail="Coven not found")
-    players = db.scalars(select(Player).where(Player.coven_id == coven_id)).all()
+    stmt = select(Player.id, Player.name, Player.coven_id).where(Player.coven_id == coven_id).order_by(Player.id)
+    if after_id is not None:
+        stmt = stmt.where(Player.id > after_id)
+    if stream:
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(_stream_players(stmt), media_type="application/x-ndjson")
+    limit = limit or DEFAULT_PAGE_SIZE
+    players = (await db.execute(stmt.limit(limit))).all()
+    if len(players) == limit:
+        response.headers["X-Next-After-Id"] = str(players[-1].id)
     return [PlayerRead.model_validate(player) for player in players]
 
 
+async def _stream_players(stmt) -> AsyncIterator[str]:
+    # The request session is closed before a streamed body is sent, so the cursor gets its own session.
+    # Plain rows rather than ORM objects keep the identity map, and memory, flat however big the coven is.
+    async with SessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield "".join(PlayerRead.model_validate(row).model_dump_json() + "\n" for row in rows)
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from cache import get_cached_player
+from database import Familiar, Player
+from dependencies import get_db
+from schemas import FamiliarCreate, FamiliarRead, FamiliarUpdate
+
+
+router = APIRouter(prefix="/familiars", tags=["familiars"])
+
+
+@router.post("", response_model=FamiliarRead, status_code=201)
+async def create_familiar(new_familiar: FamiliarCreate, db: AsyncSession = Depends(get_db)) -> FamiliarRead:
+    if await db.get(Player, new_familiar.player_id) is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    db_familiar = Familiar(**new_familiar.model_dump())
+    db.add(db_familiar)
+    await db.flush()
+    await db.refresh(db_familiar)
+    return FamiliarRead.model_validate(db_familiar)
+
+
+@router.get("", response_model=list[FamiliarRead])
+async def get_familiars(player_id: int, db: AsyncSession = Depends(get_db)) -> list[FamiliarRead]:
+    if not await get_cached_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    familiars = (await db.scalars(select(Familiar).where(Familiar.player_id == player_id).order_by(Familiar.id))).all()
+    return [FamiliarRead.model_validate(familiar) for familiar in familiars]
+
+
+@router.get("/{familiar_id}", response_model=FamiliarRead)
+async def get_familiar(familiar_id: int, db: AsyncSession = Depends(get_db)) -> FamiliarRead:
+    familiar = await db.get(Familiar, familiar_id)
+    if not familiar:
+        raise HTTPException(status_code=404, detail="Familiar not found")
+    return FamiliarRead.model_validate(familiar)
+
+
+@router.put("/{familiar_id}", response_model=FamiliarRead)
+async def update_familiar(familiar_id: int, familiar: FamiliarUpdate, db: AsyncSession = Depends(get_db)) -> FamiliarRead:
+    db_familiar = await db.get(Familiar, familiar_id)
+    if not db_familiar:
+        raise HTTPException(status_code=404, detail="Familiar not found")
+    if familiar.name is not None:
+        db_familiar.name = familiar.name
+    if familiar.type is not None:
+        db_familiar.type = familiar.type
+    await db.flush()
+    await db.refresh(db_familiar)
+    return FamiliarRead.model_validate(db_familiar)
+
+
+@router.delete("/{familiar_id}", status_code=204)
+async def delete_familiar(familiar_id: int, db: AsyncSession = Depends(get_db)):
+    familiar = await db.get(Familiar, familiar_id)
+    if not familiar:
+        raise HTTPException(status_code=404, detail="Familiar not found")
+    await db.delete(familiar)
+    return Response(status_code=204)
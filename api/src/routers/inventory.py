@@ -1,78 +1,119 @@
 from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from database import Player, InventoryItem
-from dependencies import get_db
-from schemas import InventoryItemCreate, InventoryItemUpdate, InventoryItemRead, InventoryItemDelete
+from cache import get_cached_player
+from database import Coven, Player, InventoryItem
+from dependencies import get_db, query_budget
+from inventory_ops import InsufficientQuantity, apply_deltas, consume_item, grant_item, grant_to_players
+from schemas import InventoryBatch, InventoryGrant, InventoryGrantSummary, InventoryItemCreate, InventoryItemConsume, InventoryItemUpdate, InventoryItemRead, InventoryItemDelete
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 # Inventory endpoints are slightly different from other endpoints:
 # - They must be associated with a player
-# - We need to grab the player, and then check if the item already exists and increment the quantity if it does, or create a new item if it doesn't.
+# - Granting an item increments the quantity if the player already has it, or creates a new item if they don't.
+#   Grants and consumes go through inventory_ops, which does this atomically in a single statement.
 
-@router.post("/{player_id}", response_model=InventoryItemRead, status_code=201)
-async def create_inventory_item(player_id: int, new_inventory_item: InventoryItemCreate, db: Session = Depends(get_db)) -> InventoryItemRead:
-    db_player = db.get(Player, player_id)
-    if not db_player:
-        raise HTTPException(status_code=404, detail="Player not found")
-    # Does the player already have this item?
-    db_inventory_item = db.scalar(select(InventoryItem).where(InventoryItem.item_name == new_inventory_item.item_name, InventoryItem.player_id == player_id))
-    if db_inventory_item:
-        db_inventory_item.quantity += new_inventory_item.quantity
+# Declared before the /{player_id} routes so "grant" is not parsed as a player id
+@router.post("/grant", response_model=InventoryGrantSummary, dependencies=[Depends(query_budget(2))])
+async def grant_inventory_items(grant: InventoryGrant, detail: bool = False, db: AsyncSession = Depends(get_db)) -> InventoryGrantSummary:
+    # Coven and festival rewards: one statement grants every item to every targeted player.
+    # Unknown player ids are skipped; player_count reports how many players were actually granted to.
+    if grant.coven_id is not None:
+        if await db.get(Coven, grant.coven_id) is None:
+            raise HTTPException(status_code=404, detail="Coven not found")
+        player_filter = Player.coven_id == grant.coven_id
     else:
-        db_inventory_item = InventoryItem(**new_inventory_item.model_dump(), player=db_player)
-        db.add(db_inventory_item)
-    db.flush()
-    db.refresh(db_inventory_item)
+        player_filter = Player.id.in_(grant.player_ids)
+    items: dict[str, int] = {}
+    for item in grant.items:
+        items[item.item_name] = items.get(item.item_name, 0) + item.quantity
+    player_count, rows = await grant_to_players(db, player_filter, items, returning=detail)
+    return InventoryGrantSummary(
+        player_count=player_count,
+        items=grant.items,
+        results=[InventoryItemRead.model_validate(row) for row in rows] if detail else None,
+    )
+
+@router.post("/{player_id}", response_model=InventoryItemRead, status_code=201, dependencies=[Depends(query_budget(2))])
+async def create_inventory_item(player_id: int, new_inventory_item: InventoryItemCreate, db: AsyncSession = Depends(get_db)) -> InventoryItemRead:
+    db_inventory_item = await grant_item(db, player_id, new_inventory_item.item_name, new_inventory_item.quantity)
+    if db_inventory_item is None:
+        raise HTTPException(status_code=404, detail="Player not found")
     return InventoryItemRead.model_validate(db_inventory_item)
 
-@router.get("/{player_id}", response_model=list[InventoryItemRead])
-async def get_inventory_items(player_id: int, db: Session = Depends(get_db)) -> list[InventoryItemRead]:
-    db_player = db.get(Player, player_id)
-    if not db_player:
+@router.post("/{player_id}/consume", response_model=InventoryItemRead, responses={204: {"description": "Last of the item consumed"}}, dependencies=[Depends(query_budget(3))])
+async def consume_inventory_item(player_id: int, inventory_item: InventoryItemConsume, db: AsyncSession = Depends(get_db)) -> InventoryItemRead:
+    db_inventory_item = await consume_item(db, player_id, inventory_item.item_name, inventory_item.quantity)
+    if db_inventory_item is None:
+        # Only the failure path pays for working out why nothing was consumed
+        if await db.get(Player, player_id) is None:
+            raise HTTPException(status_code=404, detail="Player not found")
+        if await db.scalar(select(InventoryItem.id).where(InventoryItem.item_name == inventory_item.item_name, InventoryItem.player_id == player_id)) is None:
+            raise HTTPException(status_code=404, detail="Inventory item not found")
+        raise HTTPException(status_code=409, detail="Not enough of this item")
+    if db_inventory_item.quantity == 0:
+        return Response(status_code=204)
+    return InventoryItemRead.model_validate(db_inventory_item)
+
+@router.post("/{player_id}/batch", response_model=list[InventoryItemRead])
+async def apply_inventory_batch(player_id: int, batch: InventoryBatch, db: AsyncSession = Depends(get_db)) -> list[InventoryItemRead]:
+    # Crafting and rituals touch many items at once; the batch is netted per item and applied all-or-nothing.
+    # Items whose last unit was consumed are returned with quantity 0 and no longer exist afterwards.
+    if await db.scalar(select(Player.id).where(Player.id == player_id)) is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    deltas: dict[str, int] = {}
+    for item in batch.deltas:
+        deltas[item.item_name] = deltas.get(item.item_name, 0) + item.delta
+    try:
+        db_inventory_items = await apply_deltas(db, player_id, deltas)
+    except InsufficientQuantity as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return [InventoryItemRead.model_validate(inventory_item) for inventory_item in db_inventory_items]
+
+@router.get("/{player_id}", response_model=list[InventoryItemRead], dependencies=[Depends(query_budget(2))])
+async def get_inventory_items(player_id: int, db: AsyncSession = Depends(get_db)) -> list[InventoryItemRead]:
+    if not await get_cached_player(db, player_id):
         raise HTTPException(status_code=404, detail="Player not found")
-    inventory_items = db.scalars(select(InventoryItem).where(InventoryItem.player_id == player_id)).all()
+    inventory_items = (await db.scalars(select(InventoryItem).where(InventoryItem.player_id == player_id))).all()
     return [InventoryItemRead.model_validate(inventory_item) for inventory_item in inventory_items]
 
 
 @router.put("/{player_id}", response_model=InventoryItemRead, responses={204: {"description": "Item deleted"}})
-async def update_inventory_item(player_id: int, inventory_item: InventoryItemUpdate, db: Session = Depends(get_db)) -> InventoryItemRead:
-    db_player = db.get(Player, player_id)
-    if not db_player:
+async def update_inventory_item(player_id: int, inventory_item: InventoryItemUpdate, db: AsyncSession = Depends(get_db)) -> InventoryItemRead:
+    if await db.get(Player, player_id) is None:
         raise HTTPException(status_code=404, detail="Player not found")
-    db_inventory_item = db.scalar(select(InventoryItem).where(InventoryItem.item_name == inventory_item.item_name, InventoryItem.player_id == player_id))
+    db_inventory_item = await db.scalar(select(InventoryItem).where(InventoryItem.item_name == inventory_item.item_name, InventoryItem.player_id == player_id))
     if not db_inventory_item:
         raise HTTPException(status_code=404, detail="Inventory item not found")
     if inventory_item.quantity is not None:
         if inventory_item.quantity == 0:
-            db.delete(db_inventory_item)
-            db.flush()
+            await db.delete(db_inventory_item)
+            await db.flush()
             return Response(status_code=204)
         db_inventory_item.quantity = inventory_item.quantity
     if inventory_item.item_name is not None and inventory_item.item_name != db_inventory_item.item_name:
         # Prevent duplicate names per player by merging quantities if target exists
-        existing = db.scalar(select(InventoryItem).where(InventoryItem.item_name == inventory_item.item_name, InventoryItem.player_id == player_id))
+        existing = await db.scalar(select(InventoryItem).where(InventoryItem.item_name == inventory_item.item_name, InventoryItem.player_id == player_id))
         if existing:
             existing.quantity += db_inventory_item.quantity
-            db.delete(db_inventory_item)
-            db.flush()
-            db.refresh(existing)
+            await db.delete(db_inventory_item)
+            await db.flush()
+            await db.refresh(existing)
             return InventoryItemRead.model_validate(existing)
         db_inventory_item.item_name = inventory_item.item_name
-    db.flush()
-    db.refresh(db_inventory_item)
+    await db.flush()
+    await db.refresh(db_inventory_item)
     return InventoryItemRead.model_validate(db_inventory_item)
 
 @router.delete("/{player_id}/{item_name}", status_code=204)
-async def delete_inventory_item(player_id: int, item_name: str, db: Session = Depends(get_db)):
-    db_player = db.get(Player, player_id)
-    if not db_player:
+async def delete_inventory_item(player_id: int, item_name: str, db: AsyncSession = Depends(get_db)):
+    if await db.get(Player, player_id) is None:
         raise HTTPException(status_code=404, detail="Player not found")
-    db_inventory_item = db.scalar(select(InventoryItem).where(InventoryItem.item_name == item_name, InventoryItem.player_id == player_id))
+    db_inventory_item = await db.scalar(select(InventoryItem).where(InventoryItem.item_name == item_name, InventoryItem.player_id == player_id))
     if not db_inventory_item:
         raise HTTPException(status_code=404, detail="Inventory item not found")
-    db.delete(db_inventory_item)
-    db.flush()
+    await db.delete(db_inventory_item)
+    await db.flush()
     return Response(status_code=204)
\ No newline at end of file
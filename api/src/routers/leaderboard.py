@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Coven, CovenScore, CovenScoreBucket, Player, PlayerScore, PlayerScoreBucket
+from dependencies import get_db
+from schemas import CovenScoreRead, PlayerScoreRead
+from score_triggers import COVEN_BUCKET_BITS, PLAYER_BUCKET_BITS
+
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+DEFAULT_TOP = 100
+MAX_TOP = 1000
+
+
+def _ranked(rows) -> list[tuple[int, tuple]]:
+    # Rows arrive best first; equal scores share a rank and the next score skips past them (1, 2, 2, 4)
+    ranked, rank, previous = [], 0, None
+    for position, row in enumerate(rows, start=1):
+        if row.score != previous:
+            rank, previous = position, row.score
+        ranked.append((rank, row))
+    return ranked
+
+
+def _count_above(score: int, bits: int, buckets, bucket_counts, scores):
+    """Rows scoring above score: the counts of every higher bucket plus the rows above it within its own bucket."""
+    bucket = score >> bits
+    higher_buckets = select(func.coalesce(func.sum(bucket_counts), 0)).where(buckets > bucket)
+    same_bucket = select(func.count()).where(scores > score, scores < (bucket + 1) << bits)
+    return select(higher_buckets.scalar_subquery() + same_bucket.scalar_subquery())
+
+
+@router.get("/players", response_model=list[PlayerScoreRead])
+async def top_players(limit: int = Query(default=DEFAULT_TOP, ge=1, le=MAX_TOP), db: AsyncSession = Depends(get_db)) -> list[PlayerScoreRead]:
+    rows = (await db.execute(
+        select(PlayerScore.player_id, PlayerScore.score, Player.name)
+        .join(Player, Player.id == PlayerScore.player_id)
+        .order_by(PlayerScore.score.desc(), PlayerScore.player_id)
+        .limit(limit)
+    )).all()
+    return [PlayerScoreRead(rank=rank, player_id=row.player_id, name=row.name, score=row.score) for rank, row in _ranked(rows)]
+
+
+@router.get("/players/{player_id}", response_model=PlayerScoreRead)
+async def player_rank(player_id: int, db: AsyncSession = Depends(get_db)) -> PlayerScoreRead:
+    row = (await db.execute(
+        select(Player.name, func.coalesce(PlayerScore.score, 0).label("score"))
+        .outerjoin(PlayerScore, PlayerScore.player_id == Player.id)
+        .where(Player.id == player_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    above = await db.scalar(_count_above(row.score, PLAYER_BUCKET_BITS, PlayerScoreBucket.bucket, PlayerScoreBucket.players, PlayerScore.score))
+    return PlayerScoreRead(rank=above + 1, player_id=player_id, name=row.name, score=row.score)
+
+
+@router.get("/covens", response_model=list[CovenScoreRead])
+async def top_covens(limit: int = Query(default=DEFAULT_TOP, ge=1, le=MAX_TOP), db: AsyncSession = Depends(get_db)) -> list[CovenScoreRead]:
+    rows = (await db.execute(
+        select(CovenScore.coven_id, CovenScore.score, Coven.name)
+        .join(Coven, Coven.id == CovenScore.coven_id)
+        .order_by(CovenScore.score.desc(), CovenScore.coven_id)
+        .limit(limit)
+    )).all()
+    return [CovenScoreRead(rank=rank, coven_id=row.coven_id, name=row.name, score=row.score) for rank, row in _ranked(rows)]
+
+
+@router.get("/covens/{coven_id}", response_model=CovenScoreRead)
+async def coven_rank(coven_id: int, db: AsyncSession = Depends(get_db)) -> CovenScoreRead:
+    row = (await db.execute(
+        select(Coven.name, func.coalesce(CovenScore.score, 0).label("score"))
+        .outerjoin(CovenScore, CovenScore.coven_id == Coven.id)
+        .where(Coven.id == coven_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Coven not found")
+    above = await db.scalar(_count_above(row.score, COVEN_BUCKET_BITS, CovenScoreBucket.bucket, CovenScoreBucket.covens, CovenScore.score))
+    return CovenScoreRead(rank=above + 1, coven_id=coven_id, name=row.name, score=row.score)
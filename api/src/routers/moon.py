@@ -0,0 +1,39 @@
+import datetime as dt
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from moon import moon_days, phase_at, upcoming_phases
+from schemas import MoonDayRead, MoonNowRead, PrincipalPhaseRead
+
+
+router = APIRouter(prefix="/moon", tags=["moon"])
+
+DEFAULT_UPCOMING = 4
+MAX_UPCOMING = 16
+MAX_RANGE_DAYS = 731
+
+
+@router.get("/now", response_model=MoonNowRead)
+async def get_moon_now(upcoming: int = Query(default=DEFAULT_UPCOMING, ge=0, le=MAX_UPCOMING)) -> MoonNowRead:
+    now = dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+    phase, illumination = phase_at(now)
+    return MoonNowRead(
+        at=now,
+        phase=phase,
+        illumination=illumination,
+        upcoming=[PrincipalPhaseRead.model_validate(p) for p in upcoming_phases(now, upcoming)],
+    )
+
+
+@router.get("/range", response_model=list[MoonDayRead])
+async def get_moon_range(
+    start: dt.date = Query(alias="from"),
+    end: Optional[dt.date] = Query(default=None, alias="to"),
+) -> list[MoonDayRead]:
+    end = start if end is None else end
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+    return [MoonDayRead.model_validate(day) for day in moon_days(start, end)]
@@ -1,89 +1,131 @@
 from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload, selectinload
 
+from cache import coven_key, get_cached_player, invalidate_on_commit, player_key
 from database import Player, Coven
-from dependencies import get_db
-from schemas import PlayerCreate, PlayerUpdate, PlayerRead
+from dependencies import get_db, query_budget
+from schemas import PlayerCreate, PlayerProfile, PlayerUpdate, PlayerRead
 
 
 router = APIRouter(prefix="/players", tags=["players"])
 
 
-@router.post("", response_model=PlayerRead, status_code=201)
-async def create_player(new_player: PlayerCreate, db: Session = Depends(get_db)) -> PlayerRead:
+@router.post("", response_model=PlayerRead, status_code=201, dependencies=[Depends(query_budget(2))])
+async def create_player(new_player: PlayerCreate, db: AsyncSession = Depends(get_db)) -> PlayerRead:
     db_player = Player(**new_player.model_dump())
     try:
         db.add(db_player)
-        db.flush()
+        await db.flush()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Player already exists")
-    db.refresh(db_player)
+    await db.refresh(db_player)
     return PlayerRead.model_validate(db_player)
 
 
-@router.get("/{player_id}", response_model=PlayerRead)
-async def get_player(player_id: int, db: Session = Depends(get_db)) -> PlayerRead:
-    player = db.get(Player, player_id)
+@router.get("/{player_id}", response_model=PlayerRead, dependencies=[Depends(query_budget(1))])
+async def get_player(player_id: int, db: AsyncSession = Depends(get_db)) -> PlayerRead:
+    player = await get_cached_player(db, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
-    return PlayerRead.model_validate(player)
+    return player
+
+
+@router.get("/{player_id}/profile", response_model=PlayerProfile, dependencies=[Depends(query_budget(4))])
+async def get_player_profile(player_id: int, db: AsyncSession = Depends(get_db)) -> PlayerProfile:
+    # The coven is joined onto the player row and each collection is one SELECT ... WHERE player_id IN (...),
+    # so a profile is four queries however much the player owns.
+    player = await db.scalar(
+        select(Player)
+        .where(Player.id == player_id)
+        .options(
+            joinedload(Player.coven),
+            selectinload(Player.inventory),
+            selectinload(Player.familiars),
+            selectinload(Player.book_of_shadows),
+        )
+    )
+    if not player:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return PlayerProfile.model_validate(player)
 
 
 @router.put("/{player_id}", response_model=PlayerRead)
-async def update_player(player_id: int, player: PlayerUpdate, db: Session = Depends(get_db)) -> PlayerRead:
-    db_player = db.get(Player, player_id)
+async def update_player(player_id: int, player: PlayerUpdate, db: AsyncSession = Depends(get_db)) -> PlayerRead:
+    db_player = await db.get(Player, player_id)
     if not db_player:
         raise HTTPException(status_code=404, detail="Player not found")
     if player.name is not None:
         db_player.name = player.name
-    db.flush()
-    db.refresh(db_player)
+    invalidate_on_commit(db, [player_key(player_id)])
+    await db.flush()
+    await db.refresh(db_player)
     return PlayerRead.model_validate(db_player)
 
 
-@router.delete("/{player_id}", status_code=204)
-async def delete_player(player_id: int, db: Session = Depends(get_db)):
-    player = db.get(Player, player_id)
+# Lookup, coven and member count, then per child table one cascade load and one (executemany) delete
+@router.delete("/{player_id}", status_code=204, dependencies=[Depends(query_budget(13))])
+async def delete_player(player_id: int, db: AsyncSession = Depends(get_db)):
+    player = await db.get(Player, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
+    invalidate_on_commit(db, [player_key(player_id)])
     # If the player is the last player in a coven, delete the coven.
     if player.coven_id:
-        coven = db.get(Coven, player.coven_id)
+        invalidate_on_commit(db, [coven_key(player.coven_id)])
+        coven = await db.get(Coven, player.coven_id)
         if not coven:
             raise HTTPException(status_code=500, detail="Player is in a coven, but the coven does not exist")
-        if len(coven.players) == 1:
-            db.delete(coven)
-    db.delete(player)
+        if await _adjust_member_count(db, coven.id, -1) == 0:
+            await db.delete(coven)
+    await db.delete(player)
     return Response(status_code=204)
 
 
+async def _adjust_member_count(db: AsyncSession, coven_id: int, delta: int) -> int | None:
+    # Covens.member_count is denormalized so nothing has to count or load members; it is only ever changed
+    # in SQL so concurrent joins and leaves cannot lose updates.
+    return await db.scalar(
+        update(Coven).where(Coven.id == coven_id).values(member_count=Coven.member_count + delta).returning(Coven.member_count)
+    )
+
+
 @router.post("/{player_id}/covens/{coven_id}", response_model=PlayerRead)
-async def add_player_to_coven(player_id: int, coven_id: int, db: Session = Depends(get_db)) -> PlayerRead:
-    player = db.get(Player, player_id)
+async def add_player_to_coven(player_id: int, coven_id: int, db: AsyncSession = Depends(get_db)) -> PlayerRead:
+    player = await db.get(Player, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
-    coven = db.get(Coven, coven_id)
+    coven = await db.get(Coven, coven_id)
     if not coven:
         raise HTTPException(status_code=404, detail="Coven not found")
-    player.coven_id = coven_id
-    db.flush()
-    db.refresh(player)
+    if player.coven_id != coven_id:
+        invalidate_on_commit(db, [player_key(player_id), coven_key(coven_id)])
+        if player.coven_id is not None:
+            invalidate_on_commit(db, [coven_key(player.coven_id)])
+            await _adjust_member_count(db, player.coven_id, -1)
+        await _adjust_member_count(db, coven_id, 1)
+        player.coven_id = coven_id
+    await db.flush()
+    await db.refresh(player)
     return PlayerRead.model_validate(player)
 
 
 @router.delete("/{player_id}/covens/{coven_id}", response_model=PlayerRead)
-async def remove_player_from_coven(player_id: int, coven_id: int, db: Session = Depends(get_db)) -> PlayerRead:
-    player = db.get(Player, player_id)
+async def remove_player_from_coven(player_id: int, coven_id: int, db: AsyncSession = Depends(get_db)) -> PlayerRead:
+    player = await db.get(Player, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
     if player.coven_id != coven_id:
         raise HTTPException(status_code=400, detail="Player not in specified coven")
+    invalidate_on_commit(db, [player_key(player_id), coven_key(coven_id)])
+    await _adjust_member_count(db, coven_id, -1)
     player.coven_id = None
-    db.flush()
-    db.refresh(player)
+    await db.flush()
+    await db.refresh(player)
     return PlayerRead.model_validate(player)
 
 
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import get_cached_player
+from database import Player
+from dependencies import get_db, query_budget
+from rituals import RITUALS, is_available, next_reset, perform_ritual, player_cooldowns, utcnow
+from schemas import InventoryItemCreate, InventoryItemRead, RitualPerformed, RitualRead, RitualStatusRead
+
+
+router = APIRouter(prefix="/rituals", tags=["rituals"])
+
+
+@router.get("", response_model=list[RitualRead])
+async def list_rituals() -> list[RitualRead]:
+    return [
+        RitualRead(
+            key=ritual.key,
+            name=ritual.name,
+            description=ritual.description,
+            rewards=[InventoryItemCreate(item_name=item_name, quantity=quantity) for item_name, quantity in ritual.rewards],
+            bonus_phases=list(ritual.bonus_phases),
+        )
+        for ritual in RITUALS.values()
+    ]
+
+
+@router.get("/{player_id}", response_model=list[RitualStatusRead])
+async def get_ritual_status(player_id: int, db: AsyncSession = Depends(get_db)) -> list[RitualStatusRead]:
+    if not await get_cached_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    now = utcnow()
+    cooldowns = await player_cooldowns(db, player_id)
+    statuses = []
+    for key in RITUALS:
+        performed_at = cooldowns.get(key)
+        available = is_available(performed_at, now)
+        statuses.append(RitualStatusRead(
+            ritual=key,
+            available=available,
+            last_performed_at=performed_at,
+            next_available_at=None if available else next_reset(now),
+        ))
+    return statuses
+
+
+@router.post("/{player_id}/{ritual_key}", response_model=RitualPerformed, dependencies=[Depends(query_budget(2))])
+async def perform(player_id: int, ritual_key: str, db: AsyncSession = Depends(get_db)) -> RitualPerformed:
+    ritual = RITUALS.get(ritual_key)
+    if ritual is None:
+        raise HTTPException(status_code=404, detail="Ritual not found")
+    now = utcnow()
+    result = await perform_ritual(db, player_id, ritual, now)
+    if result is None:
+        if await db.get(Player, player_id) is None:
+            raise HTTPException(status_code=404, detail="Player not found")
+        retry_after = int((next_reset(now) - now).total_seconds()) + 1
+        raise HTTPException(
+            status_code=409,
+            detail="Ritual already performed since the last reset",
+            headers={"Retry-After": str(retry_after)},
+        )
+    rows, bonus = result
+    return RitualPerformed(
+        ritual=ritual.key,
+        performed_at=now,
+        moon_bonus=bonus,
+        next_available_at=next_reset(now),
+        inventory=[InventoryItemRead.model_validate(row) for row in rows],
+    )
@@ -1,7 +1,7 @@
 import datetime as dt
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 # Coven Schemas
@@ -24,6 +24,7 @@ class CovenRead(BaseModel):
     id: int
     name: str
     description: Optional[str] = Field(default=None)
+    member_count: int = 0
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -62,6 +63,10 @@ class InventoryItemCreate(InventoryItemBase):
     quantity: int = Field(default=1, ge=1)
 
 
+class InventoryItemConsume(InventoryItemBase):
+    quantity: int = Field(default=1, ge=1)
+
+
 class InventoryItemUpdate(BaseModel):
     item_name: Optional[str] = Field(default=None, min_length=1)
     quantity: Optional[int] = Field(default=None, ge=0)
@@ -79,6 +84,34 @@ class InventoryItemDelete(BaseModel):
     item_name: str = Field(min_length=1)
 
 
+class InventoryItemDelta(InventoryItemBase):
+    # Positive grants, negative consumes
+    delta: int
+
+
+class InventoryBatch(BaseModel):
+    deltas: list[InventoryItemDelta] = Field(min_length=1, max_length=1000)
+
+
+class InventoryGrant(BaseModel):
+    # Exactly one target: every member of a coven, or an explicit list of players
+    coven_id: Optional[int] = None
+    player_ids: Optional[list[int]] = Field(default=None, min_length=1, max_length=10000)
+    items: list[InventoryItemCreate] = Field(min_length=1, max_length=50)
+
+    @model_validator(mode="after")
+    def check_target(self) -> "InventoryGrant":
+        if (self.coven_id is None) == (self.player_ids is None):
+            raise ValueError("Provide exactly one of coven_id or player_ids")
+        return self
+
+
+class InventoryGrantSummary(BaseModel):
+    player_count: int
+    items: list[InventoryItemCreate]
+    results: Optional[list[InventoryItemRead]] = None
+
+
 # Familiar Schemas
 
 class FamiliarBase(BaseModel):
@@ -129,3 +162,76 @@ class BookOfShadowsEntryRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Moon Schemas
+
+class PrincipalPhaseRead(BaseModel):
+    phase: str
+    at: dt.datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MoonNowRead(BaseModel):
+    at: dt.datetime
+    phase: str
+    illumination: float
+    upcoming: list[PrincipalPhaseRead]
+
+
+class MoonDayRead(BaseModel):
+    date: dt.date
+    phase: str
+    illumination: float
+    principal_phase: Optional[PrincipalPhaseRead] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Leaderboard Schemas
+
+class PlayerScoreRead(BaseModel):
+    rank: int
+    player_id: int
+    name: Optional[str] = None
+    score: int
+
+
+class CovenScoreRead(BaseModel):
+    rank: int
+    coven_id: int
+    name: str
+    score: int
+
+
+# Ritual Schemas
+
+class RitualRead(BaseModel):
+    key: str
+    name: str
+    description: str
+    rewards: list[InventoryItemCreate]
+    bonus_phases: list[str]
+
+
+class RitualStatusRead(BaseModel):
+    ritual: str
+    available: bool
+    last_performed_at: Optional[dt.datetime] = None
+    next_available_at: Optional[dt.datetime] = None
+
+
+class RitualPerformed(BaseModel):
+    ritual: str
+    performed_at: dt.datetime
+    moon_bonus: bool
+    next_available_at: dt.datetime
+    inventory: list[InventoryItemRead]
+
+
+# Profile Schemas
+
+class PlayerProfile(PlayerRead):
+    coven: Optional[CovenRead] = None
+    inventory: list[InventoryItemRead]
+    familiars: list[FamiliarRead]
+    book_of_shadows: list[BookOfShadowsEntryRead]
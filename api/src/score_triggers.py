@@ -0,0 +1,375 @@
+import re
+
+from sqlalchemy.engine import Connection
+
+
+# Leaderboard tables kept in step by the database itself, so every write path (single grants, batches, bulk
+# grants, ORM cascades, manual SQL) updates them in the same transaction as the inventory change:
+#
+#   inventory_items --> player_scores.score = SUM(quantity) of the player's items; players at 0 have no row
+#   player_scores   --> coven_scores.score = SUM(score) of the coven's members
+#   players.coven_id moves a member's score between covens; deleting a player or coven drops its rows.
+#   player_scores, coven_scores --> *_score_buckets: how many rows fall in each score range
+#
+# A rank adds up the bucket counts above the row's bucket, then counts the rows above it within its own bucket
+# on the rank index, so the work depends on how many buckets are occupied and how full one bucket is, never
+# on how far down the row sits. Each bucket is split into shards by id, so players with the same score update
+# different rows rather than queueing on one. Emptied bucket rows are kept rather than deleted and re-created.
+#
+# A write only ever touches its own player's score row, that player's coven row and one or two bucket rows in
+# its shard. On Postgres, rows that one write changes together are locked in a fixed order first (coven rows by
+# id, bucket rows by bucket), so two opposite moves cannot deadlock.
+
+# Buckets are score >> bits wide: 2**bits scores each. Coven scores sum their members' and spread far wider.
+PLAYER_BUCKET_BITS = 3
+COVEN_BUCKET_BITS = 8
+SCORE_SHARDS = 8
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_insert AFTER INSERT ON inventory_items
+    BEGIN
+        INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+        ON CONFLICT (player_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_update AFTER UPDATE OF quantity, player_id ON inventory_items
+    WHEN OLD.quantity != NEW.quantity OR OLD.player_id != NEW.player_id
+    BEGIN
+        UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+        ON CONFLICT (player_id) DO UPDATE SET score = score + excluded.score;
+        DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_score_delete AFTER DELETE ON inventory_items
+    BEGIN
+        UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_insert AFTER INSERT ON player_scores
+    BEGIN
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT coven_id, NEW.score FROM players WHERE id = NEW.player_id AND coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_update AFTER UPDATE OF score ON player_scores
+    WHEN OLD.score != NEW.score
+    BEGIN
+        UPDATE coven_scores SET score = score + NEW.score - OLD.score
+        WHERE coven_id = (SELECT coven_id FROM players WHERE id = NEW.player_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_delete AFTER DELETE ON player_scores
+    BEGIN
+        UPDATE coven_scores SET score = score - OLD.score
+        WHERE coven_id = (SELECT coven_id FROM players WHERE id = OLD.player_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_coven_score AFTER UPDATE OF coven_id ON players
+    WHEN OLD.coven_id IS NOT NEW.coven_id
+    BEGIN
+        UPDATE coven_scores SET score = score - COALESCE((SELECT score FROM player_scores WHERE player_id = OLD.id), 0)
+        WHERE coven_id = OLD.coven_id;
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT NEW.coven_id, score FROM player_scores WHERE player_id = NEW.id AND NEW.coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = score + excluded.score;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_player_score_cleanup BEFORE DELETE ON players
+    BEGIN
+        DELETE FROM player_scores WHERE player_id = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_coven_score_cleanup AFTER DELETE ON covens
+    BEGIN
+        DELETE FROM coven_scores WHERE coven_id = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_insert AFTER INSERT ON player_scores
+    BEGIN
+        INSERT INTO player_score_buckets (bucket, shard, players)
+        VALUES (NEW.score >> {PLAYER_BUCKET_BITS}, NEW.player_id % {SCORE_SHARDS}, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET players = players + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_update AFTER UPDATE OF score ON player_scores
+    WHEN OLD.score >> {PLAYER_BUCKET_BITS} != NEW.score >> {PLAYER_BUCKET_BITS}
+    BEGIN
+        UPDATE player_score_buckets SET players = players - 1
+        WHERE bucket = OLD.score >> {PLAYER_BUCKET_BITS} AND shard = OLD.player_id % {SCORE_SHARDS};
+        INSERT INTO player_score_buckets (bucket, shard, players)
+        VALUES (NEW.score >> {PLAYER_BUCKET_BITS}, NEW.player_id % {SCORE_SHARDS}, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET players = players + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_player_bucket_delete AFTER DELETE ON player_scores
+    BEGIN
+        UPDATE player_score_buckets SET players = players - 1
+        WHERE bucket = OLD.score >> {PLAYER_BUCKET_BITS} AND shard = OLD.player_id % {SCORE_SHARDS};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_insert AFTER INSERT ON coven_scores
+    BEGIN
+        INSERT INTO coven_score_buckets (bucket, shard, covens)
+        VALUES (NEW.score >> {COVEN_BUCKET_BITS}, NEW.coven_id % {SCORE_SHARDS}, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET covens = covens + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_update AFTER UPDATE OF score ON coven_scores
+    WHEN OLD.score >> {COVEN_BUCKET_BITS} != NEW.score >> {COVEN_BUCKET_BITS}
+    BEGIN
+        UPDATE coven_score_buckets SET covens = covens - 1
+        WHERE bucket = OLD.score >> {COVEN_BUCKET_BITS} AND shard = OLD.coven_id % {SCORE_SHARDS};
+        INSERT INTO coven_score_buckets (bucket, shard, covens)
+        VALUES (NEW.score >> {COVEN_BUCKET_BITS}, NEW.coven_id % {SCORE_SHARDS}, 1)
+        ON CONFLICT (bucket, shard) DO UPDATE SET covens = covens + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_coven_bucket_delete AFTER DELETE ON coven_scores
+    BEGIN
+        UPDATE coven_score_buckets SET covens = covens - 1
+        WHERE bucket = OLD.score >> {COVEN_BUCKET_BITS} AND shard = OLD.coven_id % {SCORE_SHARDS};
+    END
+    """,
+]
+
+POSTGRESQL_TRIGGERS = [
+    """
+    CREATE OR REPLACE FUNCTION inventory_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.quantity = NEW.quantity AND OLD.player_id = NEW.player_id THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE player_scores SET score = score - OLD.quantity WHERE player_id = OLD.player_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO player_scores (player_id, score) VALUES (NEW.player_id, NEW.quantity)
+            ON CONFLICT (player_id) DO UPDATE SET score = player_scores.score + EXCLUDED.score;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM player_scores WHERE player_id = OLD.player_id AND score = 0;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION player_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.score = NEW.score THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE coven_scores SET score = coven_scores.score - OLD.score
+            FROM players WHERE players.id = OLD.player_id AND coven_scores.coven_id = players.coven_id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO coven_scores (coven_id, score)
+            SELECT coven_id, NEW.score FROM players WHERE id = NEW.player_id AND coven_id IS NOT NULL
+            ON CONFLICT (coven_id) DO UPDATE SET score = coven_scores.score + EXCLUDED.score;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION player_coven_score_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM player_scores WHERE player_id = OLD.id;
+            RETURN OLD;
+        END IF;
+        IF OLD.coven_id IS NOT DISTINCT FROM NEW.coven_id THEN
+            RETURN NULL;
+        END IF;
+        -- Lock both covens' rows in id order before touching either
+        PERFORM 1 FROM coven_scores WHERE coven_id IN (OLD.coven_id, NEW.coven_id) ORDER BY coven_id FOR UPDATE;
+        UPDATE coven_scores SET score = coven_scores.score - player_scores.score
+        FROM player_scores WHERE player_scores.player_id = OLD.id AND coven_scores.coven_id = OLD.coven_id;
+        INSERT INTO coven_scores (coven_id, score)
+        SELECT NEW.coven_id, score FROM player_scores WHERE player_id = NEW.id AND NEW.coven_id IS NOT NULL
+        ON CONFLICT (coven_id) DO UPDATE SET score = coven_scores.score + EXCLUDED.score;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION coven_score_cleanup_trigger() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM coven_scores WHERE coven_id = OLD.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION player_bucket_trigger() RETURNS trigger AS $$
+    DECLARE
+        old_bucket integer;
+        new_bucket integer;
+        row_shard integer;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            old_bucket := OLD.score >> {PLAYER_BUCKET_BITS};
+            row_shard := OLD.player_id % {SCORE_SHARDS};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            new_bucket := NEW.score >> {PLAYER_BUCKET_BITS};
+            row_shard := NEW.player_id % {SCORE_SHARDS};
+        END IF;
+        IF old_bucket IS NOT DISTINCT FROM new_bucket THEN
+            RETURN NULL;
+        END IF;
+        PERFORM 1 FROM player_score_buckets
+        WHERE shard = row_shard AND bucket IN (old_bucket, new_bucket) ORDER BY bucket FOR UPDATE;
+        IF old_bucket IS NOT NULL THEN
+            UPDATE player_score_buckets SET players = players - 1 WHERE bucket = old_bucket AND shard = row_shard;
+        END IF;
+        IF new_bucket IS NOT NULL THEN
+            INSERT INTO player_score_buckets (bucket, shard, players) VALUES (new_bucket, row_shard, 1)
+            ON CONFLICT (bucket, shard) DO UPDATE SET players = player_score_buckets.players + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION coven_bucket_trigger() RETURNS trigger AS $$
+    DECLARE
+        old_bucket integer;
+        new_bucket integer;
+        row_shard integer;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            old_bucket := OLD.score >> {COVEN_BUCKET_BITS};
+            row_shard := OLD.coven_id % {SCORE_SHARDS};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            new_bucket := NEW.score >> {COVEN_BUCKET_BITS};
+            row_shard := NEW.coven_id % {SCORE_SHARDS};
+        END IF;
+        IF old_bucket IS NOT DISTINCT FROM new_bucket THEN
+            RETURN NULL;
+        END IF;
+        PERFORM 1 FROM coven_score_buckets
+        WHERE shard = row_shard AND bucket IN (old_bucket, new_bucket) ORDER BY bucket FOR UPDATE;
+        IF old_bucket IS NOT NULL THEN
+            UPDATE coven_score_buckets SET covens = covens - 1 WHERE bucket = old_bucket AND shard = row_shard;
+        END IF;
+        IF new_bucket IS NOT NULL THEN
+            INSERT INTO coven_score_buckets (bucket, shard, covens) VALUES (new_bucket, row_shard, 1)
+            ON CONFLICT (bucket, shard) DO UPDATE SET covens = coven_score_buckets.covens + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_inventory_score ON inventory_items",
+    """
+    CREATE TRIGGER trg_inventory_score AFTER INSERT OR UPDATE OF quantity, player_id OR DELETE ON inventory_items
+    FOR EACH ROW EXECUTE FUNCTION inventory_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_score ON player_scores",
+    """
+    CREATE TRIGGER trg_player_score AFTER INSERT OR UPDATE OF score OR DELETE ON player_scores
+    FOR EACH ROW EXECUTE FUNCTION player_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_coven_score ON players",
+    """
+    CREATE TRIGGER trg_player_coven_score AFTER UPDATE OF coven_id ON players
+    FOR EACH ROW EXECUTE FUNCTION player_coven_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_score_cleanup ON players",
+    """
+    CREATE TRIGGER trg_player_score_cleanup BEFORE DELETE ON players
+    FOR EACH ROW EXECUTE FUNCTION player_coven_score_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_coven_score_cleanup ON covens",
+    """
+    CREATE TRIGGER trg_coven_score_cleanup AFTER DELETE ON covens
+    FOR EACH ROW EXECUTE FUNCTION coven_score_cleanup_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_player_bucket ON player_scores",
+    """
+    CREATE TRIGGER trg_player_bucket AFTER INSERT OR UPDATE OF score OR DELETE ON player_scores
+    FOR EACH ROW EXECUTE FUNCTION player_bucket_trigger()
+    """,
+    "DROP TRIGGER IF EXISTS trg_coven_bucket ON coven_scores",
+    """
+    CREATE TRIGGER trg_coven_bucket AFTER INSERT OR UPDATE OF score OR DELETE ON coven_scores
+    FOR EACH ROW EXECUTE FUNCTION coven_bucket_trigger()
+    """,
+]
+
+SCORE_TRIGGERS = {"sqlite": SQLITE_TRIGGERS, "postgresql": POSTGRESQL_TRIGGERS}
+
+# Rebuild every score table from the inventory, for the migration and for repairs
+BACKFILL = [
+    "DELETE FROM coven_score_buckets",
+    "DELETE FROM player_score_buckets",
+    "DELETE FROM coven_scores",
+    "DELETE FROM player_scores",
+    """
+    INSERT INTO player_scores (player_id, score)
+    SELECT player_id, SUM(quantity) FROM inventory_items GROUP BY player_id HAVING SUM(quantity) != 0
+    """,
+    """
+    INSERT INTO coven_scores (coven_id, score)
+    SELECT players.coven_id, SUM(player_scores.score) FROM player_scores
+    JOIN players ON players.id = player_scores.player_id
+    WHERE players.coven_id IS NOT NULL GROUP BY players.coven_id
+    """,
+    f"""
+    INSERT INTO player_score_buckets (bucket, shard, players)
+    SELECT score >> {PLAYER_BUCKET_BITS}, player_id % {SCORE_SHARDS}, COUNT(*) FROM player_scores GROUP BY 1, 2
+    """,
+    f"""
+    INSERT INTO coven_score_buckets (bucket, shard, covens)
+    SELECT score >> {COVEN_BUCKET_BITS}, coven_id % {SCORE_SHARDS}, COUNT(*) FROM coven_scores GROUP BY 1, 2
+    """,
+]
+
+
+def install_score_triggers(connection: Connection) -> None:
+    for statement in SCORE_TRIGGERS.get(connection.dialect.name, ()):
+        connection.exec_driver_sql(statement)
+
+
+def drop_score_triggers(connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        for name in re.findall(r"CREATE TRIGGER IF NOT EXISTS (\w+)", "".join(SQLITE_TRIGGERS)):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    elif connection.dialect.name == "postgresql":
+        for statement in POSTGRESQL_TRIGGERS:
+            if statement.startswith("DROP TRIGGER"):
+                connection.exec_driver_sql(statement)
+        for function in (
+            "inventory_score_trigger", "player_score_trigger", "player_coven_score_trigger", "coven_score_cleanup_trigger",
+            "player_bucket_trigger", "coven_bucket_trigger",
+        ):
+            connection.exec_driver_sql(f"DROP FUNCTION IF EXISTS {function}()")
+
+
+def backfill_scores(connection: Connection) -> None:
+    """Recompute the score tables from scratch. Triggers fire on the inserts, so drop them around it."""
+    drop_score_triggers(connection)
+    for statement in BACKFILL:
+        connection.exec_driver_sql(statement)
+    install_score_triggers(connection)
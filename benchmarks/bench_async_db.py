@@ -0,0 +1,121 @@
+"""Concurrent request throughput of the API with blocking vs. async database sessions.
+
+Serves ``GET /covens/{id}/players`` through an in-process ASGI transport, once with the old pattern
+(``async def`` handler calling a synchronous ``Session``) and once with the real router on ``AsyncSession``.
+Alongside throughput it samples event-loop lag, which is what a slow query costs every other request.
+
+    python benchmarks/bench_async_db.py --members 200 --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+import database
+from database import Base, Coven, Player, SYNC_DATABASE_URL
+from routers.covens import router as covens_router
+from schemas import PlayerRead
+
+
+def seed(members: int) -> None:
+    engine = create_engine(SYNC_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Coven), [{"id": 1, "name": "Bench"}])
+        conn.execute(insert(Player), [{"id": i, "name": f"witch-{i}", "coven_id": 1} for i in range(1, members + 1)])
+    engine.dispose()
+
+
+def blocking_app() -> FastAPI:
+    """The pre-async handler: a sync Session used from inside ``async def``.
+
+    This side runs without a pool on purpose. With a bounded pool, a handler blocking the loop in a checkout
+    waits for connections that only the loop itself can hand back, and the run deadlocks until the pool
+    timeout fires.
+    """
+    engine = create_engine(SYNC_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=NullPool)
+    sessions = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    def get_sync_db():
+        db = sessions()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/covens/{coven_id}/players")
+    async def get_players_in_coven(coven_id: int, db: Session = Depends(get_sync_db)) -> list[PlayerRead]:
+        db.get(Coven, coven_id)
+        players = db.scalars(select(Player).where(Player.coven_id == coven_id)).all()
+        return [PlayerRead.model_validate(player) for player in players]
+
+    return app
+
+
+def async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(covens_router)
+    return app
+
+
+async def run(app: FastAPI, requests: int, concurrency: int) -> tuple[float, float]:
+    lag = 0.0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal lag
+        while not stop.is_set():
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lag = max(lag, time.perf_counter() - expected)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                r = await client.get("/covens/1/players")
+                r.raise_for_status()
+
+        await one()  # warm up pools and caches
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await tick
+    return requests / elapsed, lag
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    seed(args.members)
+    for label, app in (("blocking Session", blocking_app()), ("AsyncSession", async_app())):
+        throughput, lag = await run(app, args.requests, args.concurrency)
+        print(f"{label:>16}: {throughput:8.1f} req/s, max event-loop lag {lag * 1000:7.1f} ms")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Coven-wide reward through POST /inventory/grant against one request per member.
+
+Seeds a coven of ``--members`` players, half of whom already hold the item so the grant exercises both the
+insert and the ON CONFLICT increment, then times a single bulk grant and, for a sample of members, the
+per-player POST /inventory/{player_id} it replaces.
+
+    python benchmarks/bench_bulk_grant.py --members 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+
+import database
+from database import Base, Coven, InventoryItem, Player, SYNC_DATABASE_URL
+from routers.inventory import router as inventory_router
+
+
+def seed(members: int) -> None:
+    engine = create_engine(SYNC_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Coven), [{"id": 1, "name": "Bench"}])
+        conn.execute(insert(Player), [{"id": i, "coven_id": 1} for i in range(1, members + 1)])
+        conn.execute(insert(InventoryItem), [{"player_id": i, "item_name": "Mooncake", "quantity": 1} for i in range(1, members + 1, 2)])
+    engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=500, help="members timed for the per-request baseline")
+    args = parser.parse_args()
+
+    seed(args.members)
+    app = FastAPI()
+    app.include_router(inventory_router)
+    items = [{"item_name": "Mooncake", "quantity": 1}, {"item_name": "Festival Lantern", "quantity": 1}]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        start = time.perf_counter()
+        r = await client.post("/inventory/grant", json={"coven_id": 1, "items": items})
+        bulk = time.perf_counter() - start
+        r.raise_for_status()
+        print(f"bulk grant: {r.json()['player_count']} players x {len(items)} items in {bulk * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        for player_id in range(1, args.sample + 1):
+            for item in items:
+                (await client.post(f"/inventory/{player_id}", json=item)).raise_for_status()
+        per_request = (time.perf_counter() - start) / args.sample
+        print(f"per-player requests: {per_request * 1000:.2f} ms per member, ~{per_request * args.members:.1f} s for {args.members}")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""Replay chat traffic through the chant matcher and report messages per second.
+
+    python benchmarks/bench_chant_engine.py --messages 200000 --channels 500 --active 50
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bot" / "src"))
+
+from chant_engine import CHANTS, ChantEngine
+
+
+CHATTER = [
+    "anyone up for a raid later?",
+    "lol",
+    "Silver lantern rise and climb",  # right words, wrong moment in most channels
+    "brb grabbing tea",
+    "has anyone found dried sage yet",
+]
+
+
+def build_traffic(count: int, channels: int, active: int, seed: int) -> list[tuple[int, int, str]]:
+    rng = random.Random(seed)
+    chant = CHANTS["hearth"]
+    positions = {channel: 0 for channel in range(active)}
+    traffic = []
+    for _ in range(count):
+        channel = rng.randrange(channels)
+        member = rng.randrange(10000)
+        if channel in positions and rng.random() < 0.3:
+            line = chant.lines[positions[channel]]
+            positions[channel] = (positions[channel] + 1) % len(chant.lines)
+            traffic.append((channel, member, line))
+        else:
+            traffic.append((channel, member, rng.choice(CHATTER)))
+    return traffic
+
+
+async def run(args) -> None:
+    engine = ChantEngine()
+    traffic = build_traffic(args.messages, args.channels, args.active, args.seed)
+    for channel in range(args.active):
+        engine.start(channel, "hearth")
+
+    outcomes = {"advanced": 0, "completed": 0, "wrong_turn": 0}
+    t = time.perf_counter()
+    for channel, member, content in traffic:
+        outcome = engine.handle(channel, member, content)
+        if outcome is not None:
+            outcomes[outcome.kind] += 1
+            if outcome.kind == "completed":
+                engine.start(channel, "hearth")
+    elapsed = time.perf_counter() - t
+
+    print(f"{args.messages} messages over {args.channels} channels ({args.active} with a ritual) in {elapsed * 1000:.1f} ms")
+    print(f"{args.messages / elapsed:,.0f} messages/s, {elapsed / args.messages * 1e6:.2f} us per message")
+    print(" ".join(f"{kind}={count}" for kind, count in outcomes.items()))
+    for channel in list(engine.rituals):
+        engine.cancel(channel)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--active", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
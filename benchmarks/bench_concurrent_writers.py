@@ -0,0 +1,103 @@
+"""Concurrent writers and readers against SQLite with the default vs. tuned engine profile.
+
+Drives ``POST /inventory/{id}`` from ``--writers`` tasks and ``GET /inventory/{id}`` from ``--readers`` tasks
+through an in-process ASGI transport, once with SQLite's defaults (rollback journal, FULL sync) and once with
+``sqlite_pragmas()`` (WAL, NORMAL sync, busy timeout, mmap, larger cache). Each profile gets its own database
+file, since the journal mode sticks to the file. Reports throughput, failed requests and pool checkout wait.
+
+    python benchmarks/bench_concurrent_writers.py --writers 16 --readers 16 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+BENCH_DIR = Path(tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DIR / 'bench.db'}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+
+import database
+from cache import cache
+from database import Base, Player, POOL_STATS, build_engine, sqlite_pragmas
+from routers.inventory import router as inventory_router
+
+ITEMS = ["Sage", "Moonlit Dew", "Hearth Ash", "Mandrake", "Candle"]
+
+
+def seed(path: Path, players: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Player), [{"id": i, "name": f"witch-{i}"} for i in range(1, players + 1)])
+    engine.dispose()
+
+
+async def run(label: str, pragmas: dict[str, str], args) -> None:
+    path = BENCH_DIR / f"{label}.db"
+    seed(path, args.players)
+    engine = build_engine(f"sqlite+aiosqlite:///{path}", pragmas=pragmas)
+    database.SessionLocal.configure(bind=engine)
+    await cache.clear()
+    POOL_STATS.reset()
+
+    app = FastAPI()
+    app.include_router(inventory_router)
+    rng = random.Random(args.seed)
+    failures = 0
+    latencies = {"write": [], "read": []}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+        async def worker(kind: str):
+            nonlocal failures
+            for _ in range(args.requests):
+                player_id = rng.randint(1, args.players)
+                started = time.perf_counter()
+                if kind == "write":
+                    r = await client.post(f"/inventory/{player_id}", json={"item_name": rng.choice(ITEMS), "quantity": 1})
+                else:
+                    r = await client.get(f"/inventory/{player_id}")
+                latencies[kind].append(time.perf_counter() - started)
+                if r.status_code >= 500:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker("write") for _ in range(args.writers)), *(worker("read") for _ in range(args.readers)))
+        elapsed = time.perf_counter() - start
+
+    pool = database.pool_metrics(engine)
+    await engine.dispose()
+    total = (args.writers + args.readers) * args.requests
+    p99 = {kind: statistics.quantiles(values, n=100)[98] * 1000 for kind, values in latencies.items() if len(values) > 1}
+    print(
+        f"{label:>8}: {total / elapsed:8.1f} req/s, {failures:4d} failed, "
+        f"p99 write {p99.get('write', 0):7.1f} ms, p99 read {p99.get('read', 0):7.1f} ms, "
+        f"checkout wait avg {pool['wait_avg_ms']:.2f} ms / max {pool['wait_max_ms']:.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per task")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    await run("default", {}, args)
+    await run("tuned", sqlite_pragmas(), args)
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
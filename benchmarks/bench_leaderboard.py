@@ -0,0 +1,108 @@
+"""Leaderboard reads against the score tables with a million players.
+
+Seeds ``--players`` players spread over ``--covens`` covens with a random inventory, builds the score tables
+with the same backfill the migration runs, then times top-100 and rank lookups through the HTTP routes, the
+aggregate query they replace, and the write overhead the triggers add to a bulk grant.
+
+    python benchmarks/bench_leaderboard.py --players 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert, text
+
+import database
+from database import Base, Coven, InventoryItem, Player, SYNC_DATABASE_URL
+from routers.inventory import router as inventory_router
+from routers.leaderboard import router as leaderboard_router
+from score_triggers import backfill_scores, drop_score_triggers
+
+ITEMS = ["Sage", "Moonlit Dew", "Hearth Ash", "Mandrake", "Candle"]
+CHUNK = 100000
+
+
+def seed(players: int, covens: int, seed: int) -> None:
+    rng = random.Random(seed)
+    engine = create_engine(SYNC_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Bulk load without the triggers, then build the score tables in one pass like the migration does
+        drop_score_triggers(conn)
+        conn.execute(insert(Coven), [{"id": i, "name": f"Coven {i}"} for i in range(1, covens + 1)])
+        for start in range(1, players + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, players + 1))
+            conn.execute(insert(Player), [{"id": i, "coven_id": rng.randint(1, covens)} for i in ids])
+            conn.execute(insert(InventoryItem), [
+                {"player_id": i, "item_name": item, "quantity": rng.randint(1, 200)}
+                for i in ids for item in rng.sample(ITEMS, rng.randint(1, 3))
+            ])
+        backfill_scores(conn)
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+
+async def timed(client: httpx.AsyncClient, url: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        (await client.get(url)).raise_for_status()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000000)
+    parser.add_argument("--covens", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed(args.players, args.covens, args.seed)
+    print(f"seeded {args.players} players in {time.perf_counter() - start:.1f} s")
+
+    app = FastAPI()
+    app.include_router(leaderboard_router)
+    app.include_router(inventory_router)
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/leaderboard/players?limit=1")
+        print(f"top 100 players:  {await timed(client, '/leaderboard/players?limit=100', args.repeat) * 1000:.2f} ms")
+        ranks = [await timed(client, f"/leaderboard/players/{rng.randint(1, args.players)}", 1) for _ in range(args.repeat)]
+        print(f"rank of a player: {statistics.median(ranks) * 1000:.2f} ms (max {max(ranks) * 1000:.2f} ms)")
+        print(f"top 100 covens:   {await timed(client, '/leaderboard/covens?limit=100', args.repeat) * 1000:.2f} ms")
+        print(f"rank of a coven:  {await timed(client, f'/leaderboard/covens/{args.covens // 2}', args.repeat) * 1000:.2f} ms")
+
+        # The same answers without score tables: aggregate the whole inventory per request
+        engine = create_engine(SYNC_DATABASE_URL)
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            conn.execute(text(
+                "SELECT player_id, SUM(quantity) AS score FROM inventory_items GROUP BY player_id ORDER BY score DESC LIMIT 100"
+            )).all()
+            print(f"top 100 by aggregating inventory: {(time.perf_counter() - start) * 1000:.0f} ms")
+        engine.dispose()
+
+        start = time.perf_counter()
+        r = await client.post("/inventory/grant", json={"coven_id": 1, "items": [{"item_name": "Sage", "quantity": 1}]})
+        r.raise_for_status()
+        print(f"bulk grant to {r.json()['player_count']} members with triggers: {(time.perf_counter() - start) * 1000:.1f} ms")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
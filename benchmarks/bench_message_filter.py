@@ -0,0 +1,70 @@
+"""Per-message cost of the gateway message pre-filter, checked against a budget.
+
+    python benchmarks/bench_message_filter.py --messages 500000 --budget-us 1.5
+
+Exits non-zero when the mean cost per message exceeds the budget, so it can gate CI.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bot" / "src"))
+
+from chant_engine import CHANTS, Ritual, normalize
+from message_filter import MessageFilter
+
+
+CHATTER = ["lol", "anyone up for a raid later?", "brb", "has anyone found dried sage yet", "gm"]
+
+
+def build_messages(count: int, channels: int, seed: int) -> list[SimpleNamespace]:
+    rng = random.Random(seed)
+    authors = [SimpleNamespace(bot=False) for _ in range(50)] + [SimpleNamespace(bot=True)]
+    lines = list(CHANTS["hearth"].lines)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        content = "!inventory" if roll < 0.02 else rng.choice(lines) if roll < 0.05 else rng.choice(CHATTER)
+        messages.append(SimpleNamespace(content=content, author=rng.choice(authors), channel=SimpleNamespace(id=rng.randrange(channels))))
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--active", type=int, default=20)
+    parser.add_argument("--budget-us", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rituals = {channel: Ritual(channel, CHANTS["hearth"]) for channel in range(args.active)}
+    message_filter = MessageFilter(("!",))
+    message_filter.rituals = rituals
+    messages = build_messages(args.messages, args.channels, args.seed)
+
+    should_dispatch = message_filter.should_dispatch
+    t = time.perf_counter()
+    passed = sum(1 for message in messages if should_dispatch(message))
+    filtered = (time.perf_counter() - t) / args.messages
+
+    # What every message cost before: normalizing it for the chant matcher
+    sample = messages[: min(args.messages, 100000)]
+    t = time.perf_counter()
+    for message in sample:
+        normalize(message.content)
+    unfiltered = (time.perf_counter() - t) / len(sample)
+
+    print(f"pre-filter: {filtered * 1e6:.3f} us per message, {passed} of {args.messages} dispatched")
+    print(f"normalize alone: {unfiltered * 1e6:.3f} us per message")
+    print(" ".join(f"{reason}={count}" for reason, count in sorted(message_filter.counts.items())))
+    if filtered * 1e6 > args.budget_us:
+        print(f"over budget: {filtered * 1e6:.3f} us > {args.budget_us} us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
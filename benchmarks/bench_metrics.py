@@ -0,0 +1,84 @@
+"""Per-request cost of the metrics middleware.
+
+Serves ``GET /`` (no database) and ``GET /players/{id}`` (one cached lookup) through an in-process ASGI
+transport with and without ``MetricsMiddleware`` and reports the difference in time per request.
+
+    python benchmarks/bench_metrics.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+
+import database
+from database import Base, Player, SYNC_DATABASE_URL
+from metrics import MetricsMiddleware, render_metrics
+from routers.core import router as core_router
+from routers.players import router as players_router
+
+
+def seed() -> None:
+    engine = create_engine(SYNC_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Player), [{"id": 1, "name": "witch-1"}])
+    engine.dispose()
+
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    app.include_router(core_router)
+    app.include_router(players_router)
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def per_request(app: FastAPI, path: str, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return (time.perf_counter() - start) / requests
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    seed()
+    plain, instrumented = build_app(False), build_app(True)
+    for path in ("/", "/players/1"):
+        # Alternate the two apps and keep the best round of each to damp scheduler noise
+        best = {False: float("inf"), True: float("inf")}
+        for _ in range(args.rounds):
+            for flag, app in ((False, plain), (True, instrumented)):
+                best[flag] = min(best[flag], await per_request(app, path, args.requests))
+        overhead = best[True] - best[False]
+        print(
+            f"{path:>12}: {best[False] * 1e6:7.1f} us plain, {best[True] * 1e6:7.1f} us instrumented, "
+            f"overhead {overhead * 1e6:+5.1f} us ({overhead / best[False]:+.1%})"
+        )
+    start = time.perf_counter()
+    render_metrics()
+    print(f"render /metrics: {(time.perf_counter() - start) * 1000:.2f} ms")
+    await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
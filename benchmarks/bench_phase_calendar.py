@@ -0,0 +1,56 @@
+"""Moon phase lookups: eight ephem searches per call against the precomputed PhaseCalendar.
+
+    python benchmarks/bench_phase_calendar.py --lookups 200000
+    python benchmarks/bench_phase_calendar.py --verify-years 3   # every hour checked against ephem (slow)
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bot" / "src"))
+
+import ephem
+
+from phase_calendar import PhaseCalendar, compute_phase_key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--reference-lookups", type=int, default=500)
+    parser.add_argument("--verify-years", type=float, default=0)
+    parser.add_argument("--start", default="2025/1/1")
+    args = parser.parse_args()
+    start = ephem.Date(args.start)
+
+    t = time.perf_counter()
+    for i in range(args.reference_lookups):
+        compute_phase_key(start + i / 24)
+    reference = (time.perf_counter() - t) / args.reference_lookups
+
+    calendar = PhaseCalendar()
+    t = time.perf_counter()
+    calendar.phase_key(start)
+    build = time.perf_counter() - t
+    t = time.perf_counter()
+    for i in range(args.lookups):
+        calendar.phase_key(start + i / 240)
+    lookup = (time.perf_counter() - t) / args.lookups
+
+    print(f"ephem searches: {reference * 1e6:9.1f} us per lookup")
+    print(f"calendar build: {build * 1e3:9.1f} ms ({len(calendar)} instants)")
+    print(f"calendar:       {lookup * 1e6:9.2f} us per lookup ({reference / lookup:.0f}x)")
+
+    if args.verify_years:
+        hours = int(args.verify_years * 365.25 * 24)
+        mismatches = [start + h / 24 for h in range(hours) if calendar.phase_key(start + h / 24) != compute_phase_key(start + h / 24)]
+        print(f"verified {hours} hourly lookups: {len(mismatches)} mismatches")
+        for now in mismatches[:10]:
+            print(f"  {ephem.Date(now)}: calendar={calendar.phase_key(now)} ephem={compute_phase_key(now)}")
+        if mismatches:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Worker cold start with Alembic on every boot vs. the revision check.
+
+Migrates a throwaway SQLite database once, then starts ``--runs`` fresh interpreters per mode. Each one imports
+the API and runs its migration step against the already-current database. Reported are the median wall time of
+the whole process, of importing the app, and of the migration step alone (including importing Alembic where used).
+
+    python benchmarks/bench_startup.py --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_SRC = Path(__file__).resolve().parents[1] / "api" / "src"
+sys.path.insert(0, str(API_SRC))
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+
+import migrations
+from database import SYNC_DATABASE_URL
+
+# The pre-change startup: Alembic imported with the app and `upgrade head` run by every worker
+ALEMBIC_EVERY_BOOT = """
+import time
+started = time.perf_counter()
+import api
+step = time.perf_counter()
+from alembic import command
+from migrations import alembic_config
+command.upgrade(alembic_config(api.SYNC_DATABASE_URL), "head")
+"""
+
+REVISION_CHECK = """
+import asyncio, time
+started = time.perf_counter()
+import api
+step = time.perf_counter()
+
+async def startup():
+    async with api.lifespan(api.app):
+        pass
+    await api.engine.dispose()
+
+asyncio.run(startup())
+assert api.app.state.migration_error is None
+"""
+
+REPORT = """
+import json, sys
+print(json.dumps({"imports": step - started, "step": time.perf_counter() - step, "alembic": "alembic" in sys.modules}))
+"""
+
+
+def run(code: str) -> tuple[float, dict]:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code + REPORT], cwd=API_SRC, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    migrations.upgrade(SYNC_DATABASE_URL)
+    for label, code in (("alembic every boot", ALEMBIC_EVERY_BOOT), ("revision check", REVISION_CHECK)):
+        runs = [run(code) for _ in range(args.runs)]
+        wall = statistics.median(elapsed for elapsed, _ in runs)
+        imports = statistics.median(report["imports"] for _, report in runs)
+        step = statistics.median(report["step"] for _, report in runs)
+        print(
+            f"{label:>18}: process {wall * 1000:6.0f} ms, app imports {imports * 1000:5.0f} ms, "
+            f"migration step {step * 1000:6.1f} ms, alembic imported: {runs[0][1]['alembic']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
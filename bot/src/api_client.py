@@ -0,0 +1,251 @@
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from typing import Any, Optional, TypedDict
+
+import httpx
+
+
+API_BASE_URL = os.getenv("API_BASE_URL", "http://api:8123")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "5.0"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "20"))
+API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("API_MAX_KEEPALIVE_CONNECTIONS", "10"))
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.2"))
+# How long a GET response is reused; chant rituals ask for the same records many times a second
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "2.0"))
+
+# Statuses worth another attempt: the API or something in front of it is briefly unavailable
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+class PlayerData(TypedDict):
+    id: int
+    name: Optional[str]
+    coven_id: Optional[int]
+
+
+class CovenData(TypedDict):
+    id: int
+    name: str
+    description: Optional[str]
+    member_count: int
+
+
+class InventoryItemData(TypedDict):
+    id: int
+    player_id: int
+    item_name: str
+    quantity: int
+
+
+class ItemGrant(TypedDict):
+    item_name: str
+    quantity: int
+
+
+class GrantSummaryData(TypedDict):
+    player_count: int
+    items: list[ItemGrant]
+    results: Optional[list[InventoryItemData]]
+
+
+class MoonlitAPI:
+    """Bot-wide client for the Moonlit API.
+
+    One pooled httpx.AsyncClient is shared by every cog, so interactions reuse keep-alive (and HTTP/2, when
+    the h2 package is installed) connections instead of paying for a new client each time. Created in the
+    bot's setup_hook and closed when the bot shuts down.
+
+    Identical GETs that are already in flight are coalesced into one request (singleflight), and successful
+    GETs are reused for cache_ttl seconds. Writes drop the cached routes they touch. Callers share the
+    returned objects and must not mutate them.
+    """
+
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        timeout: float = API_TIMEOUT,
+        max_connections: int = API_MAX_CONNECTIONS,
+        max_keepalive_connections: int = API_MAX_KEEPALIVE_CONNECTIONS,
+        retries: int = API_RETRIES,
+        backoff: float = API_RETRY_BACKOFF,
+        transport: httpx.AsyncBaseTransport | None = None,
+        cache_ttl: float = API_CACHE_TTL,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self._cache: dict[str, tuple[float, Any]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+            http2=transport is None and importlib.util.find_spec("h2") is not None,
+            transport=transport,
+        )
+
+    @property
+    def base_url(self) -> str:
+        return str(self.client.base_url).rstrip("/")
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send a request, retrying with exponential backoff and jitter.
+
+        Idempotent methods are retried on transport errors and 502/503/504. Anything else is only retried
+        when the connection could not be opened, since the API never saw the request.
+        """
+        method = method.upper()
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.retries:
+                    raise
+            except httpx.TransportError:
+                if method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "cached": len(self._cache)}
+
+    def invalidate(self, url: str) -> None:
+        """Drop cached GETs under every resource a write to ``url`` can change.
+
+        /players/1/covens/2 touches /players/1... and /covens/2...; a route without an id such as
+        /inventory/grant can touch anything under /inventory.
+        """
+        parts = url.split("?", 1)[0].strip("/").split("/")
+        if len(parts) < 2 or not parts[1].isdigit():
+            prefixes = ("/" + parts[0],)
+        else:
+            prefixes = tuple("/" + "/".join(parts[i:i + 2]) for i in range(0, len(parts) - 1, 2))
+        for key in [key for key in self._cache if key.startswith(prefixes)]:
+            del self._cache[key]
+
+    async def _json(self, method: str, url: str, **kwargs: Any) -> Any:
+        if method != "GET":
+            self.invalidate(url)
+            return await self._fetch(method, url, **kwargs)
+
+        key = str(httpx.URL(url, params=kwargs.get("params")))
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The fetch runs in a task of its own, so cancelling whichever caller started it leaves it running
+            # for everyone else waiting on the same GET
+            task = asyncio.create_task(self._fetch(method, url, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._fetch_done(key, done))
+        return await asyncio.shield(task)
+
+    def _fetch_done(self, key: str, task: asyncio.Task) -> None:
+        # Runs before the waiters resume, so they already find the response cached
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # exception() also marks an error retrieved, so asyncio doesn't warn when every waiter was cancelled
+        if not task.cancelled() and task.exception() is None and self.cache_ttl > 0:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, task.result())
+
+    async def _fetch(self, method: str, url: str, **kwargs: Any) -> Any:
+        response = await self.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.status_code != 204 else None
+
+    # Core
+
+    async def root(self) -> dict[str, Any]:
+        return await self._json("GET", "/")
+
+    async def health(self) -> dict[str, Any]:
+        return await self._json("GET", "/health")
+
+    # Players
+
+    async def create_player(self, player_id: int, name: str | None = None) -> PlayerData:
+        return await self._json("POST", "/players", json={"id": player_id, "name": name})
+
+    async def get_player(self, player_id: int) -> PlayerData:
+        return await self._json("GET", f"/players/{player_id}")
+
+    async def update_player(self, player_id: int, name: str | None = None) -> PlayerData:
+        return await self._json("PUT", f"/players/{player_id}", json={"name": name})
+
+    async def delete_player(self, player_id: int) -> None:
+        await self._json("DELETE", f"/players/{player_id}")
+
+    async def join_coven(self, player_id: int, coven_id: int) -> PlayerData:
+        return await self._json("POST", f"/players/{player_id}/covens/{coven_id}")
+
+    async def leave_coven(self, player_id: int, coven_id: int) -> PlayerData:
+        return await self._json("DELETE", f"/players/{player_id}/covens/{coven_id}")
+
+    # Covens
+
+    async def create_coven(self, name: str, description: str | None = None) -> CovenData:
+        return await self._json("POST", "/covens", json={"name": name, "description": description})
+
+    async def get_coven(self, coven_id: int) -> CovenData:
+        return await self._json("GET", f"/covens/{coven_id}")
+
+    async def update_coven(self, coven_id: int, name: str | None = None, description: str | None = None) -> CovenData:
+        return await self._json("PUT", f"/covens/{coven_id}", json={"name": name, "description": description})
+
+    async def delete_coven(self, coven_id: int) -> None:
+        await self._json("DELETE", f"/covens/{coven_id}")
+
+    async def get_coven_players(self, coven_id: int, after_id: int | None = None, limit: int | None = None) -> list[PlayerData]:
+        params = {key: value for key, value in (("after_id", after_id), ("limit", limit)) if value is not None}
+        return await self._json("GET", f"/covens/{coven_id}/players", params=params)
+
+    # Inventory
+
+    async def get_inventory(self, player_id: int) -> list[InventoryItemData]:
+        return await self._json("GET", f"/inventory/{player_id}")
+
+    async def grant_item(self, player_id: int, item_name: str, quantity: int = 1) -> InventoryItemData:
+        return await self._json("POST", f"/inventory/{player_id}", json={"item_name": item_name, "quantity": quantity})
+
+    async def consume_item(self, player_id: int, item_name: str, quantity: int = 1) -> InventoryItemData | None:
+        return await self._json("POST", f"/inventory/{player_id}/consume", json={"item_name": item_name, "quantity": quantity})
+
+    async def apply_inventory_batch(self, player_id: int, deltas: dict[str, int]) -> list[InventoryItemData]:
+        body = {"deltas": [{"item_name": item_name, "delta": delta} for item_name, delta in deltas.items()]}
+        return await self._json("POST", f"/inventory/{player_id}/batch", json=body)
+
+    async def grant_items(
+        self,
+        items: list[ItemGrant],
+        coven_id: int | None = None,
+        player_ids: list[int] | None = None,
+        detail: bool = False,
+    ) -> GrantSummaryData:
+        body = {"items": items, "coven_id": coven_id, "player_ids": player_ids}
+        return await self._json("POST", "/inventory/grant", params={"detail": detail}, json=body)
+
+    async def set_item_quantity(self, player_id: int, item_name: str, quantity: int) -> InventoryItemData | None:
+        return await self._json("PUT", f"/inventory/{player_id}", json={"item_name": item_name, "quantity": quantity})
+
+    async def delete_item(self, player_id: int, item_name: str) -> None:
+        await self._json("DELETE", f"/inventory/{player_id}/{item_name}")
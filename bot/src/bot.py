@@ -3,8 +3,14 @@ from discord.ext import commands
 from discord.app_commands import AppCommandContext
 from dotenv import load_dotenv
 import os
-import pkgutil
-import importlib
+import time
+
+from api_client import MoonlitAPI
+from cog_registry import CogRegistry
+from message_filter import MessageFilter
+from shard_stats import ShardStats, shard_for_event
+
+STARTED_AT = time.perf_counter()
 
 load_dotenv()
 
@@ -14,32 +20,84 @@ intents.message_content = True
 
 owner = os.getenv('OWNER')
 
-bot = commands.Bot(command_prefix='!', intents=intents, allowed_contexts=AppCommandContext(guild=True, dm_channel=False, private_channel=False), owner_id=int(owner))
 
-bot.moon_phase: str = ""
+class MoonlitBotMixin:
+    """Behaviour shared by the single-connection and the sharded bot."""
+
+    api: MoonlitAPI
+    cog_registry: CogRegistry
+    # The phase is computed from the clock, so every shard and every process agrees on it
+    moon_phase: str = ""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shard_stats = ShardStats()
+        self.message_filter = MessageFilter.for_bot(self)
+
+    @property
+    def is_primary_shard(self) -> bool:
+        """Whether this process runs shard 0, which owns bot-wide side effects such as avatar uploads."""
+        shard_ids = getattr(self, 'shard_ids', None)
+        if shard_ids is not None:
+            return 0 in shard_ids
+        return not self.shard_id
+
+    def dispatch(self, event_name, /, *args, **kwargs):
+        self.shard_stats.record(shard_for_event(args, self.shard_count or 1))
+        # Most chat is irrelevant to the bot; drop it before any listener or the prefix parser runs
+        if event_name == 'message' and not self.message_filter.should_dispatch(args[0]):
+            return
+        super().dispatch(event_name, *args, **kwargs)
+
+    async def setup_hook(self):
+        # One pooled API client for every cog, for the whole life of the bot
+        self.api = MoonlitAPI()
+        # Runs once per process, not on every gateway reconnect like on_ready
+        self.cog_registry = CogRegistry(self, skip_tests=self.production)
+        await self.cog_registry.load_all()
+        # Application commands are global; one process is enough to sync them
+        if self.is_primary_shard:
+            await self.cog_registry.sync_tree()
+        print(f'Setup finished in {time.perf_counter() - STARTED_AT:.2f}s')
+
+    async def close(self):
+        if hasattr(self, 'api'):
+            await self.api.aclose()
+        await super().close()
+
+
+class MoonlitBot(MoonlitBotMixin, commands.Bot):
+    pass
 
-bot.production = os.getenv('PRODUCTION') == 'True'
 
-async def load_cogs():
-    try:
-        cogs_pkg = importlib.import_module('cogs')
-    except ModuleNotFoundError:
-        print('No cogs package found')
-        return
-    for module_info in pkgutil.iter_modules(cogs_pkg.__path__):
-        name = module_info.name
-        # Skip test files in production mode
-        if bot.production and name.startswith('test_'):
-            continue
-        await bot.load_extension(f'cogs.{name}')
-        print(f'Loaded cog: {name}')
+class MoonlitShardedBot(MoonlitBotMixin, commands.AutoShardedBot):
+    pass
+
+
+def build_bot(**options) -> commands.Bot:
+    """Plain bot by default; SHARD_COUNT (a number or 'auto') opts into sharding, SHARD_IDS picks this process's shards."""
+    shard_count = os.getenv('SHARD_COUNT')
+    if not shard_count:
+        return MoonlitBot(**options)
+    shard_ids = os.getenv('SHARD_IDS')
+    if shard_count != 'auto':
+        options['shard_count'] = int(shard_count)
+        if shard_ids:
+            options['shard_ids'] = [int(shard_id) for shard_id in shard_ids.split(',')]
+    return MoonlitShardedBot(**options)
+
+
+bot = build_bot(command_prefix='!', intents=intents, allowed_contexts=AppCommandContext(guild=True, dm_channel=False, private_channel=False), owner_id=int(owner))
+
+bot.production = os.getenv('PRODUCTION') == 'True'
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
     print(f'Bot is in {len(bot.guilds)} guilds')
-    await load_cogs()
-    await bot.tree.sync()
+    if not getattr(bot, 'ready_logged', False):
+        bot.ready_logged = True
+        print(f'Ready {time.perf_counter() - STARTED_AT:.2f}s after start')
 
 @bot.command(name='ping')
 async def ping(ctx):
@@ -50,15 +108,35 @@ async def ping(ctx):
 @commands.is_owner()
 async def sync(ctx):
     """Sync the bot's commands"""
-    await bot.tree.sync()
+    await bot.cog_registry.sync_tree(force=True)
     await ctx.send('Commands synced!')
 
+@bot.command(name='api_stats')
+@commands.is_owner()
+async def api_stats(ctx):
+    """Show the API client's cache and coalescing counters"""
+    stats = bot.api.stats()
+    await ctx.send(' '.join(f'{key}={value}' for key, value in stats.items()))
+
+@bot.command(name='shards')
+@commands.is_owner()
+async def shards(ctx):
+    """Show latency, guild count and event throughput for each shard in this process"""
+    lines = [
+        f"shard {stats['shard_id']}: latency={stats['latency_ms']}ms guilds={stats['guilds']} "
+        f"events={stats['events']} ({stats['events_per_min']}/min)"
+        for stats in bot.shard_stats.snapshot(bot)
+    ]
+    await ctx.send('\n'.join(lines))
+
 @bot.command(name='reload')
 @commands.is_owner()
 async def reload(ctx):
-    """Reload the bot's commands"""
-    await load_cogs()
-    await ctx.send('Commands reloaded!')
+    """Reload the cogs whose files changed"""
+    result = await bot.cog_registry.reload_changed()
+    synced = await bot.cog_registry.sync_tree()
+    changes = ', '.join(f'{kind}: {len(names)}' for kind, names in result.items())
+    await ctx.send(f'Commands reloaded! ({changes}; {"synced" if synced else "tree unchanged"})')
 
 if __name__ == '__main__':
     # Get token from environment variable
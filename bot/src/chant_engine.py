@@ -0,0 +1,175 @@
+import asyncio
+import re
+import time
+from typing import Callable, NamedTuple
+
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Each line must be answered within this many seconds or the ritual fades
+DEFAULT_LINE_TIMEOUT = 60.0
+
+
+def normalize(text: str) -> tuple[str, ...]:
+    """Case-, punctuation- and spacing-insensitive form of a chant line."""
+    return tuple(_WORD.findall(text.casefold()))
+
+
+class Chant(NamedTuple):
+    key: str
+    title: str
+    lines: tuple[str, ...]
+    # normalize() of every line, computed once when the chant is defined
+    tokens: tuple[tuple[str, ...], ...]
+    rewards: tuple[tuple[str, int], ...]
+    # Shortest raw message that can normalize to each line; casefold() expands a character to at most three
+    min_chars: tuple[int, ...]
+    line_timeout: float = DEFAULT_LINE_TIMEOUT
+
+
+def compile_chant(key: str, title: str, lines: list[str], rewards: dict[str, int], line_timeout: float = DEFAULT_LINE_TIMEOUT) -> Chant:
+    tokens = tuple(normalize(line) for line in lines)
+    if not tokens or not all(tokens):
+        raise ValueError(f"Chant {key!r} needs at least one line and no empty lines")
+    min_chars = tuple(-(-sum(map(len, line_tokens)) // 3) for line_tokens in tokens)
+    return Chant(key, title, tuple(lines), tokens, tuple(rewards.items()), min_chars, line_timeout)
+
+
+CHANTS = {
+    chant.key: chant
+    for chant in (
+        compile_chant(
+            "moonrise",
+            "Moonrise Chant",
+            [
+                "Silver lantern, rise and climb,",
+                "light the circle, mark the time.",
+                "Hand to hand the coven stands,",
+                "moonlight gathered in our hands.",
+            ],
+            {"Moonlit Dew": 1},
+        ),
+        compile_chant(
+            "hearth",
+            "Hearth Blessing",
+            [
+                "Ember glow and kettle song,",
+                "keep this hearth both warm and strong.",
+                "What we share is never less,",
+                "bound by oak and blessedness.",
+                "So we speak and so it be,",
+                "hearth and coven, one and free.",
+            ],
+            {"Hearth Ash": 1, "Dried Sage": 2},
+        ),
+    )
+}
+
+
+class Ritual:
+    """One chant being recited in one channel."""
+
+    __slots__ = ("channel_id", "chant", "position", "last_member_id", "participants", "started_at", "timer")
+
+    def __init__(self, channel_id: int, chant: Chant):
+        self.channel_id = channel_id
+        self.chant = chant
+        self.position = 0
+        self.last_member_id: int | None = None
+        # member id -> lines recited, in the order members joined in
+        self.participants: dict[int, int] = {}
+        self.started_at = time.monotonic()
+        self.timer: asyncio.TimerHandle | None = None
+
+    @property
+    def expected(self) -> tuple[str, ...]:
+        return self.chant.tokens[self.position]
+
+    @property
+    def min_chars(self) -> int:
+        return self.chant.min_chars[self.position]
+
+    @property
+    def next_line(self) -> str:
+        return self.chant.lines[self.position]
+
+
+class ChantOutcome(NamedTuple):
+    # "advanced", "completed" or "wrong_turn"
+    kind: str
+    ritual: Ritual
+
+
+class RitualError(Exception):
+    pass
+
+
+class ChantEngine:
+    """Active rituals keyed by channel id.
+
+    handle() is a dict lookup plus a tuple comparison against the precompiled next line, so messages in
+    channels without a ritual cost almost nothing. Each ritual has one timer on the event loop, rescheduled
+    on every recited line, instead of a task polling for stale rituals.
+    """
+
+    def __init__(self, on_timeout: Callable[[Ritual], None] | None = None, loop: asyncio.AbstractEventLoop | None = None):
+        self.rituals: dict[int, Ritual] = {}
+        self.on_timeout = on_timeout
+        self._loop = loop
+        self.completed = 0
+        self.timed_out = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop or asyncio.get_running_loop()
+
+    def start(self, channel_id: int, chant_key: str) -> Ritual:
+        if channel_id in self.rituals:
+            raise RitualError("A ritual is already in progress here")
+        chant = CHANTS.get(chant_key)
+        if chant is None:
+            raise RitualError(f"Unknown chant: {chant_key}")
+        ritual = self.rituals[channel_id] = Ritual(channel_id, chant)
+        self._schedule(ritual)
+        return ritual
+
+    def cancel(self, channel_id: int) -> Ritual | None:
+        ritual = self.rituals.pop(channel_id, None)
+        if ritual is not None and ritual.timer is not None:
+            ritual.timer.cancel()
+        return ritual
+
+    def handle(self, channel_id: int, member_id: int, content: str) -> ChantOutcome | None:
+        """Feed one message; None unless it is the next line of the ritual in that channel."""
+        ritual = self.rituals.get(channel_id)
+        if ritual is None or len(content) < ritual.min_chars:
+            return None
+        if normalize(content) != ritual.expected:
+            return None
+        # Lines pass from member to member; nobody recites two in a row
+        if member_id == ritual.last_member_id:
+            return ChantOutcome("wrong_turn", ritual)
+
+        ritual.position += 1
+        ritual.last_member_id = member_id
+        ritual.participants[member_id] = ritual.participants.get(member_id, 0) + 1
+        if ritual.position == len(ritual.chant.tokens):
+            self.cancel(channel_id)
+            self.completed += 1
+            return ChantOutcome("completed", ritual)
+        self._schedule(ritual)
+        return ChantOutcome("advanced", ritual)
+
+    def _schedule(self, ritual: Ritual) -> None:
+        if ritual.timer is not None:
+            ritual.timer.cancel()
+        ritual.timer = self.loop.call_later(ritual.chant.line_timeout, self._expire, ritual)
+
+    def _expire(self, ritual: Ritual) -> None:
+        # A newer ritual may have started in the channel since this timer was set
+        if self.rituals.get(ritual.channel_id) is not ritual:
+            return
+        del self.rituals[ritual.channel_id]
+        self.timed_out += 1
+        if self.on_timeout is not None:
+            self.on_timeout(ritual)
@@ -0,0 +1,135 @@
+import hashlib
+import importlib
+import json
+import os
+import pkgutil
+import time
+
+from discord.ext import commands
+
+
+COMMAND_SYNC_STATE = os.getenv('COMMAND_SYNC_STATE') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.command_tree_hash.json')
+
+
+def _file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CogRegistry:
+    """Loads the cogs package once and afterwards only touches extensions whose files changed.
+
+    Also remembers a hash of the application command tree per application, so the tree is pushed to
+    Discord only when the command set actually differs from what was last synced.
+    """
+
+    def __init__(self, bot: commands.Bot, package: str = 'cogs', skip_tests: bool = False, state_path: str = COMMAND_SYNC_STATE):
+        self.bot = bot
+        self.package = package
+        self.skip_tests = skip_tests
+        self.state_path = state_path
+        # extension name -> (mtime_ns, size, sha256) of the file it was loaded from
+        self._fingerprints: dict[str, tuple[int, int, str]] = {}
+        self.sync_calls = 0
+        self.syncs_skipped = 0
+
+    def discover(self) -> dict[str, str]:
+        """Extension name -> source file for every cog module on disk."""
+        try:
+            cogs_pkg = importlib.import_module(self.package)
+        except ModuleNotFoundError:
+            return {}
+        found = {}
+        for module_info in pkgutil.iter_modules(cogs_pkg.__path__):
+            # Skip test files in production mode
+            if self.skip_tests and module_info.name.startswith('test_'):
+                continue
+            found[f'{self.package}.{module_info.name}'] = os.path.join(module_info.module_finder.path, f'{module_info.name}.py')
+        return found
+
+    def _changed(self, name: str, path: str) -> tuple[int, int, str] | None:
+        """New fingerprint if the file differs from what was loaded, else None. Content is only hashed when the stat changed."""
+        stat = os.stat(path)
+        previous = self._fingerprints.get(name)
+        if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+            return None
+        digest = _file_digest(path)
+        if previous is not None and previous[2] == digest:
+            # Touched but not edited; remember the new stat so the next check stays cheap
+            self._fingerprints[name] = (stat.st_mtime_ns, stat.st_size, digest)
+            return None
+        return stat.st_mtime_ns, stat.st_size, digest
+
+    async def load_all(self) -> list[str]:
+        """Load every cog that is not loaded yet. Safe to call again; loaded extensions are left alone."""
+        loaded = []
+        for name, path in self.discover().items():
+            if name in self.bot.extensions:
+                continue
+            stat = os.stat(path)
+            await self.bot.load_extension(name)
+            self._fingerprints[name] = (stat.st_mtime_ns, stat.st_size, _file_digest(path))
+            loaded.append(name)
+            print(f'Loaded cog: {name}')
+        return loaded
+
+    async def reload_changed(self) -> dict[str, list[str]]:
+        """Reload edited cogs, load new ones and unload the ones whose files are gone."""
+        # New cog files must be visible to the import system, not just to the directory listing
+        importlib.invalidate_caches()
+        found = self.discover()
+        result = {'loaded': [], 'reloaded': [], 'unloaded': []}
+        for name, path in found.items():
+            if name not in self.bot.extensions:
+                continue
+            fingerprint = self._changed(name, path)
+            if fingerprint is not None:
+                await self.bot.reload_extension(name)
+                self._fingerprints[name] = fingerprint
+                result['reloaded'].append(name)
+                print(f'Reloaded cog: {name}')
+        for name in list(self._fingerprints):
+            if name not in found:
+                if name in self.bot.extensions:
+                    await self.bot.unload_extension(name)
+                del self._fingerprints[name]
+                result['unloaded'].append(name)
+                print(f'Unloaded cog: {name}')
+        result['loaded'] = await self.load_all()
+        return result
+
+    def tree_hash(self) -> str:
+        tree = self.bot.tree
+        payload = sorted((command.to_dict(tree) for command in tree.get_commands()), key=lambda c: (c.get('type', 1), c['name']))
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _load_state(self) -> dict[str, str]:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: dict[str, str]) -> None:
+        try:
+            with open(self.state_path, 'w') as f:
+                json.dump(state, f)
+        except OSError as e:
+            print(f'Could not save command tree hash: {e}')
+
+    async def sync_tree(self, force: bool = False) -> bool:
+        """Push the command tree to Discord if it changed since the last sync. Returns whether it synced."""
+        digest = self.tree_hash()
+        state = self._load_state()
+        app_key = str(self.bot.application_id)
+        if not force and state.get(app_key) == digest:
+            self.syncs_skipped += 1
+            print(f'Command tree unchanged, skipped sync ({self.syncs_skipped} skipped, {self.sync_calls} synced)')
+            return False
+        started = time.perf_counter()
+        await self.bot.tree.sync()
+        self.sync_calls += 1
+        state[app_key] = digest
+        self._save_state(state)
+        print(f'Synced command tree in {time.perf_counter() - started:.2f}s ({self.sync_calls} synced, {self.syncs_skipped} skipped)')
+        return True
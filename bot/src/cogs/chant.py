@@ -0,0 +1,91 @@
+import asyncio
+
+import discord
+from discord.ext import commands
+
+from chant_engine import CHANTS, ChantEngine, Ritual, RitualError
+
+
+class Chant(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.engine = ChantEngine(on_timeout=self._on_timeout)
+        # Keep references to fire-and-forget sends so they are not garbage collected mid-flight
+        self._background: set[asyncio.Task] = set()
+        self.bot.chant_engine = self.engine
+        # Let the gateway pre-filter pass unprefixed messages in channels with a ritual
+        message_filter = getattr(self.bot, "message_filter", None)
+        if message_filter is not None:
+            message_filter.rituals = self.engine.rituals
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _on_timeout(self, ritual: Ritual) -> None:
+        channel = self.bot.get_channel(ritual.channel_id)
+        if channel is not None:
+            self._spawn(channel.send(f"The {ritual.chant.title} fades into silence. No line came in time."))
+
+    async def _complete(self, message: discord.Message, ritual: Ritual) -> None:
+        chant = ritual.chant
+        items = [{"item_name": item_name, "quantity": quantity} for item_name, quantity in chant.rewards]
+        try:
+            # One call for the whole coven, made only once the last line is spoken
+            summary = await self.bot.api.grant_items(items=items, player_ids=list(ritual.participants))
+        except Exception as e:
+            await message.channel.send(f"The {chant.title} is complete, but the rewards could not be granted: {e}")
+            return
+        rewards = ", ".join(f"{quantity}x {item_name}" for item_name, quantity in chant.rewards)
+        await message.channel.send(
+            f"The {chant.title} is complete! {summary['player_count']} of {len(ritual.participants)} voices "
+            f"received {rewards}."
+        )
+
+    @commands.hybrid_command(name="chant", description="Begin a chant ritual in this channel")
+    async def chant(self, ctx: commands.Context, chant_key: str = "moonrise"):
+        try:
+            ritual = self.engine.start(ctx.channel.id, chant_key)
+        except RitualError as e:
+            await ctx.reply(str(e))
+            return
+        chant = ritual.chant
+        await ctx.reply(
+            f"**{chant.title}** begins. Take turns reciting each line; no one may speak two in a row. "
+            f"Each line must come within {chant.line_timeout:.0f}s.\nFirst line: *{ritual.next_line}*"
+        )
+
+    @commands.hybrid_command(name="chants", description="List the chants that can be performed")
+    async def chants(self, ctx: commands.Context):
+        await ctx.reply("\n".join(f"`{chant.key}`: {chant.title} ({len(chant.lines)} lines)" for chant in CHANTS.values()))
+
+    @commands.hybrid_command(name="end_chant", description="Abandon the chant ritual in this channel")
+    async def end_chant(self, ctx: commands.Context):
+        ritual = self.engine.cancel(ctx.channel.id)
+        await ctx.reply(f"The {ritual.chant.title} was abandoned." if ritual else "No ritual is in progress here.")
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.author.bot:
+            return
+        outcome = self.engine.handle(message.channel.id, message.author.id, message.content)
+        if outcome is None:
+            return
+        if outcome.kind == "wrong_turn":
+            await message.reply("Let another voice carry the next line.")
+        elif outcome.kind == "advanced":
+            await message.add_reaction("\N{SPARKLES}")
+        else:
+            await self._complete(message, outcome.ritual)
+
+    async def cog_unload(self):
+        for channel_id in list(self.engine.rituals):
+            self.engine.cancel(channel_id)
+        message_filter = getattr(self.bot, "message_filter", None)
+        if message_filter is not None and message_filter.rituals is self.engine.rituals:
+            message_filter.rituals = {}
+
+
+async def setup(bot):
+    await bot.add_cog(Chant(bot))
@@ -1,10 +1,16 @@
-import os
+import asyncio
 import datetime
+import json
+import os
+from types import MappingProxyType
+
 import discord
 import ephem
 from discord.ext import commands, tasks
 from discord import app_commands
 
+from phase_calendar import PhaseCalendar
+
 
 PHASE_IMAGE_MAP = {
     "new": "new_moon.png",
@@ -17,6 +23,18 @@ PHASE_IMAGE_MAP = {
     "waning_crescent": "waning_crescent.png",
 }
 
+AVATAR_MAX_ATTEMPTS = 5
+AVATAR_BACKOFF_SECONDS = 30.0
+AVATAR_MAX_BACKOFF_SECONDS = 600.0
+# After a failed update, try again within this long instead of waiting for the next phase boundary
+AVATAR_RETRY_SECONDS = 1800.0
+# Wake just after a boundary so the calendar already reports the new phase
+TRANSITION_SLACK = datetime.timedelta(seconds=1)
+
+
+# Shared by every caller; the first lookup builds the calendar, later ones are a binary search
+phase_calendar = PhaseCalendar()
+
 
 def get_current_moon_phase_key(now: ephem.Date | None = None) -> str:
     """Return one of 8 phase keys matching available images.
@@ -24,82 +42,93 @@ def get_current_moon_phase_key(now: ephem.Date | None = None) -> str:
     Keys: new, waxing_crescent, first_quarter, waxing_gibbous,
           full, waning_gibbous, third_quarter, waning_crescent
     """
-    if now is None:
-        now = ephem.now()
-
-    # Compute nearest principal phase times
-    prev_new = ephem.previous_new_moon(now)
-    next_new = ephem.next_new_moon(now)
-    prev_first = ephem.previous_first_quarter_moon(now)
-    next_first = ephem.next_first_quarter_moon(now)
-    prev_full = ephem.previous_full_moon(now)
-    next_full = ephem.next_full_moon(now)
-    prev_last = ephem.previous_last_quarter_moon(now)
-    next_last = ephem.next_last_quarter_moon(now)
-
-    # If we are close to a principal phase, snap to it
-    tolerance_days = 0.75  # ~18 hours
-    distances = {
-        "new": abs(now - prev_new) if prev_new < now else abs(next_new - now),
-        "first_quarter": abs(now - prev_first) if prev_first < now else abs(next_first - now),
-        "full": abs(now - prev_full) if prev_full < now else abs(next_full - now),
-        "third_quarter": abs(now - prev_last) if prev_last < now else abs(next_last - now),
-    }
-    nearest_key = min(distances, key=distances.get)
-    if distances[nearest_key] <= tolerance_days:
-        return nearest_key
-
-    # Otherwise determine waxing/waning interval
-    if prev_new < now < next_first:
-        return "waxing_crescent"
-    if prev_first < now < next_full:
-        return "waxing_gibbous"
-    if prev_full < now < next_last:
-        return "waning_gibbous"
-    if prev_last < now < next_new:
-        return "waning_crescent"
-
-    # Fallback using illumination and a small time delta to infer waxing/waning
-    moon_now = ephem.Moon(now)
-    illum_now = float(moon_now.phase)  # percent illuminated [0..100]
-    moon_future = ephem.Moon(now + 0.5)  # 12 hours later
-    illum_future = float(moon_future.phase)
-    if illum_now < 1.0:
-        return "new"
-    if illum_now > 99.0:
-        return "full"
-    if illum_future > illum_now:
-        # Waxing
-        return "waxing_gibbous" if illum_now > 50.0 else "waxing_crescent"
-    else:
-        # Waning
-        return "waning_gibbous" if illum_now > 50.0 else "waning_crescent"
+    return phase_calendar.phase_key(now)
+
+
+def load_phase_images(pfp_dir: str) -> MappingProxyType:
+    """Read every phase image once; missing files are left out and reported when that phase comes up."""
+    images = {}
+    for phase_key, image_name in PHASE_IMAGE_MAP.items():
+        image_path = os.path.join(pfp_dir, image_name)
+        if os.path.isfile(image_path):
+            with open(image_path, "rb") as f:
+                images[phase_key] = f.read()
+    return MappingProxyType(images)
+
+
+def ephem_to_datetime(instant: float) -> datetime.datetime:
+    return ephem.Date(instant).datetime().replace(tzinfo=datetime.timezone.utc)
+
 
 class Moon(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self._pfp_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pfp"))
+        self._state_path = os.getenv("MOON_AVATAR_STATE") or os.path.join(self._pfp_dir, ".avatar_state.json")
+        self._images: MappingProxyType = MappingProxyType({})
+        # phase key -> Discord avatar hash of the last upload of that phase's image
+        self._uploaded: dict[str, str] = {}
         self.bot.moon_phase = get_current_moon_phase_key()
 
-    async def update_moon_avatar(self) -> tuple[str, str]:
-        """Compute current moon phase and update bot avatar.
+    def _load_state(self) -> dict[str, str]:
+        try:
+            with open(self._state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-        Returns (phase_key, image_name) on success. Raises on failure.
+    def _save_state(self) -> None:
+        try:
+            with open(self._state_path, "w") as f:
+                json.dump(self._uploaded, f)
+        except OSError as e:
+            print(f"[Moon] Could not save avatar state: {e}")
+
+    def avatar_is_current(self, phase_key: str) -> bool:
+        avatar = self.bot.user.avatar
+        return avatar is not None and self._uploaded.get(phase_key) == avatar.key
+
+    async def _edit_avatar(self, image_bytes: bytes) -> None:
+        # Avatar changes have a tight, separate rate limit; wait it out rather than hammering the endpoint
+        delay = AVATAR_BACKOFF_SECONDS
+        for attempt in range(AVATAR_MAX_ATTEMPTS):
+            try:
+                await self.bot.user.edit(avatar=image_bytes)
+                return
+            except discord.RateLimited as e:
+                last_error, wait = e, e.retry_after
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                last_error, wait = e, delay
+            if attempt == AVATAR_MAX_ATTEMPTS - 1:
+                raise last_error
+            print(f"[Moon] Avatar update rate limited, retrying in {wait:.0f}s")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, AVATAR_MAX_BACKOFF_SECONDS)
+
+    async def update_moon_avatar(self, force: bool = False) -> tuple[str, str, bool]:
+        """Compute current moon phase and update bot avatar if it shows another phase.
+
+        Returns (phase_key, image_name, uploaded) on success. Raises on failure.
         """
         phase_key = get_current_moon_phase_key()
         image_name = PHASE_IMAGE_MAP[phase_key]
-        image_path = os.path.join(self._pfp_dir, image_name)
-
-        if not os.path.isfile(image_path):
-            raise FileNotFoundError(f"Moon avatar image not found: {image_path}")
+        self.bot.moon_phase = phase_key
 
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
+        # The avatar belongs to the whole bot; with several shard processes only the primary one uploads
+        if not force and (not getattr(self.bot, "is_primary_shard", True) or self.avatar_is_current(phase_key)):
+            return phase_key, image_name, False
 
-        self.bot.moon_phase = phase_key
+        image_bytes = self._images.get(phase_key)
+        if image_bytes is None:
+            raise FileNotFoundError(f"Moon avatar image not found: {os.path.join(self._pfp_dir, image_name)}")
 
-        await self.bot.user.edit(avatar=image_bytes)
-        return phase_key, image_name
+        await self._edit_avatar(image_bytes)
+        if self.bot.user.avatar is not None:
+            self._uploaded[phase_key] = self.bot.user.avatar.key
+            self._save_state()
+        return phase_key, image_name, True
 
     @commands.hybrid_command(name="update_moon", description="Update bot avatar to current moon phase")
     async def update_moon(self, ctx: commands.Context):
@@ -110,7 +139,7 @@ class Moon(commands.Cog):
             return
 
         try:
-            phase_key, image_name = await self.update_moon_avatar()
+            phase_key, image_name, _ = await self.update_moon_avatar(force=True)
             message = f"Updated avatar to phase: {phase_key} (image: {image_name})"
             if getattr(ctx, "interaction", None) is not None:
                 await ctx.reply(message, ephemeral=True)
@@ -123,20 +152,27 @@ class Moon(commands.Cog):
             else:
                 await ctx.reply(error_message)
 
-    @tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=datetime.timezone.utc))
+    @tasks.loop()
     async def daily_update(self):
+        # Runs at each phase boundary from the calendar; a retry after a failure comes sooner
+        wake_at = ephem_to_datetime(phase_calendar.next_transition())
         try:
-            phase_key, image_name = await self.update_moon_avatar()
-            print(f"[Daily] Updated bot avatar to phase: {phase_key} -> {image_name}")
+            phase_key, image_name, uploaded = await self.update_moon_avatar()
+            if uploaded:
+                print(f"[Moon] Updated bot avatar to phase: {phase_key} -> {image_name}")
         except Exception as e:
-            print(f"[Daily] Failed to update moon avatar: {e}")
+            print(f"[Moon] Failed to update moon avatar: {e}")
+            wake_at = min(wake_at, discord.utils.utcnow() + datetime.timedelta(seconds=AVATAR_RETRY_SECONDS))
+        await discord.utils.sleep_until(wake_at + TRANSITION_SLACK)
 
     @daily_update.before_loop
     async def before_daily_update(self):
         await self.bot.wait_until_ready()
 
     async def cog_load(self):
-        # Start daily scheduled task when cog loads
+        self._images = await asyncio.to_thread(load_phase_images, self._pfp_dir)
+        self._uploaded = await asyncio.to_thread(self._load_state)
+        # Start the phase-boundary task when cog loads
         if not self.daily_update.is_running():
             self.daily_update.start()
 
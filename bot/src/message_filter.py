@@ -0,0 +1,57 @@
+import discord
+
+
+class MessageFilter:
+    """Decides in constant time whether a gateway message is worth dispatching at all.
+
+    Only two things in the bot read plain messages: the prefix command parser and the chant listener. A
+    message is dropped before any listener or the command parser sees it when its author is a bot, or when
+    it has no command prefix and cannot be the next line of a ritual in its channel (there is none, or the
+    message is too short to normalize to the expected line). Cogs that need every message, or that use
+    ``wait_for('message')`` on unprefixed messages, have to be allowed through here first.
+    """
+
+    def __init__(self, prefixes: tuple[str, ...] | None):
+        # None when the prefix is dynamic and every message has to reach the command parser
+        self.prefixes = prefixes[0] if prefixes and len(prefixes) == 1 else prefixes
+        # Active rituals by channel id; the chant cog points this at its engine's dict when it loads
+        self.rituals: dict = {}
+        # Plain counters rather than a Counter keep the per-message cost down
+        self.bot_authors = self.commands = self.no_ritual = self.cannot_match = self.ritual_lines = 0
+
+    @classmethod
+    def for_bot(cls, bot) -> "MessageFilter":
+        prefix = bot.command_prefix
+        if isinstance(prefix, str):
+            return cls((prefix,))
+        if isinstance(prefix, (list, tuple)):
+            return cls(tuple(prefix))
+        return cls(None)
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {
+            'bot_author': self.bot_authors,
+            'command': self.commands,
+            'no_ritual': self.no_ritual,
+            'cannot_match': self.cannot_match,
+            'ritual': self.ritual_lines,
+        }
+
+    def should_dispatch(self, message: discord.Message) -> bool:
+        if message.author.bot:
+            self.bot_authors += 1
+            return False
+        content = message.content
+        if self.prefixes is None or content.startswith(self.prefixes):
+            self.commands += 1
+            return True
+        ritual = self.rituals.get(message.channel.id)
+        if ritual is None:
+            self.no_ritual += 1
+            return False
+        if len(content) < ritual.min_chars:
+            self.cannot_match += 1
+            return False
+        self.ritual_lines += 1
+        return True
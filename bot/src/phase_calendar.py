@@ -0,0 +1,114 @@
+from array import array
+from bisect import bisect_right
+
+import ephem
+
+
+# Principal phases in the order they occur, with the ephem search that finds the next one of each
+PRINCIPAL_PHASES = ("new", "first_quarter", "full", "third_quarter")
+# The phase between each principal phase and the one after it
+INTERMEDIATE_PHASES = ("waxing_crescent", "waxing_gibbous", "waning_gibbous", "waning_crescent")
+NEXT_PHASE_SEARCHES = (ephem.next_new_moon, ephem.next_first_quarter_moon, ephem.next_full_moon, ephem.next_last_quarter_moon)
+PREVIOUS_PHASE_SEARCHES = (ephem.previous_new_moon, ephem.previous_first_quarter_moon, ephem.previous_full_moon, ephem.previous_last_quarter_moon)
+
+SNAP_TOLERANCE_DAYS = 0.75  # ~18 hours
+DEFAULT_WINDOW_DAYS = 2 * 365.25
+# A lunation is ~29.5 days, so a month of margin guarantees a previous and next instant of every phase
+_MARGIN_DAYS = 31.0
+
+
+def classify_phase(now: float, previous: dict[str, float], upcoming: dict[str, float]) -> str:
+    """Map the surrounding principal phase instants to one of the 8 phase keys.
+
+    Shared by the ephem-search and calendar lookups so both classify identically. The API's moon module
+    classifies with the same rule, so /moon/now and ritual bonuses match the avatar.
+    """
+    # If we are close to a principal phase, snap to it
+    distances = {key: min(now - previous[key], upcoming[key] - now) for key in PRINCIPAL_PHASES}
+    nearest_key = min(distances, key=distances.get)
+    if distances[nearest_key] <= SNAP_TOLERANCE_DAYS:
+        return nearest_key
+
+    # Otherwise we are between the most recent principal phase and the one after it
+    latest_key = max(previous, key=previous.get)
+    return INTERMEDIATE_PHASES[PRINCIPAL_PHASES.index(latest_key)]
+
+
+def compute_phase_key(now: float) -> str:
+    """Reference implementation: eight ephem root-finding searches per call."""
+    previous = {key: search(now) for key, search in zip(PRINCIPAL_PHASES, PREVIOUS_PHASE_SEARCHES)}
+    upcoming = {key: search(now) for key, search in zip(PRINCIPAL_PHASES, NEXT_PHASE_SEARCHES)}
+    return classify_phase(now, previous, upcoming)
+
+
+class PhaseCalendar:
+    """Principal moon phase instants precomputed for a window around the current time.
+
+    The instants live in one sorted array of ephem dates (days as floats) with a parallel array of phase
+    indexes, so a lookup is a binary search plus a look at the four entries either side instead of eight
+    ephem searches. The calendar is rebuilt around the requested time when it falls outside the window.
+    """
+
+    def __init__(self, window_days: float = DEFAULT_WINDOW_DAYS):
+        self.window_days = window_days
+        self.builds = 0
+        self._times = array("d")
+        self._phases = array("b")
+        self._start = self._end = 0.0
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def _build(self, center: float) -> None:
+        start, end = center - self.window_days, center + self.window_days
+        instants = []
+        for index, search in enumerate(NEXT_PHASE_SEARCHES):
+            instant = float(search(start - _MARGIN_DAYS))
+            while instant <= end + _MARGIN_DAYS:
+                instants.append((instant, index))
+                instant = float(search(instant + 1.0))
+        instants.sort()
+        self._times = array("d", (instant for instant, _ in instants))
+        self._phases = array("b", (index for _, index in instants))
+        self._start, self._end = start, end
+        self.builds += 1
+
+    def _surrounding(self, now: float) -> tuple[dict[str, float], dict[str, float], int]:
+        if not self._start <= now < self._end:
+            self._build(now)
+        times, phases = self._times, self._phases
+        position = bisect_right(times, now)
+        # Phases strictly alternate, so the four entries on each side hold one of every kind
+        previous = {PRINCIPAL_PHASES[phases[i]]: times[i] for i in range(position - 4, position)}
+        upcoming = {PRINCIPAL_PHASES[phases[i]]: times[i] for i in range(position, position + 4)}
+        return previous, upcoming, position
+
+    def phase_key(self, now: float | None = None) -> str:
+        """Same keys as compute_phase_key, from the precomputed instants."""
+        now = float(ephem.now() if now is None else now)
+        previous, upcoming, _ = self._surrounding(now)
+        return classify_phase(now, previous, upcoming)
+
+    def upcoming_phases(self, now: float | None = None, count: int = 4) -> list[tuple[str, float]]:
+        """The next ``count`` principal phases after ``now`` as (phase key, ephem date) pairs."""
+        now = float(ephem.now() if now is None else now)
+        _, _, position = self._surrounding(now)
+        if position + count > len(self._times):
+            self._build(now)
+            position = bisect_right(self._times, now)
+        return [(PRINCIPAL_PHASES[self._phases[i]], self._times[i]) for i in range(position, position + count)]
+
+    def next_transition(self, now: float | None = None) -> float:
+        """Earliest instant after ``now`` at which phase_key can change.
+
+        Keys only change at a principal phase or at the snap tolerance either side of one, so sleeping
+        until this instant and re-checking never misses a change.
+        """
+        now = float(ephem.now() if now is None else now)
+        _, _, position = self._surrounding(now)
+        candidates = []
+        for i in range(position - 1, position + 2):
+            for offset in (-SNAP_TOLERANCE_DAYS, 0.0, SNAP_TOLERANCE_DAYS):
+                if self._times[i] + offset > now:
+                    candidates.append(self._times[i] + offset)
+        return min(candidates)
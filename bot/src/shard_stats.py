@@ -0,0 +1,51 @@
+import time
+from collections import Counter
+
+import discord
+
+
+def shard_for_event(args: tuple, shard_count: int) -> int:
+    """Shard that delivered an event, from its first argument. DMs and guild-less events arrive on shard 0."""
+    if not args:
+        return 0
+    subject = args[0]
+    shard_id = getattr(subject, 'shard_id', None)
+    if isinstance(shard_id, int):
+        return shard_id
+    guild_id = getattr(subject, 'guild_id', None)
+    if guild_id is None:
+        guild = getattr(subject, 'guild', None)
+        guild_id = getattr(guild, 'id', None)
+    if not isinstance(guild_id, int):
+        return 0
+    return (guild_id >> 22) % shard_count
+
+
+class ShardStats:
+    """Per-shard gateway event counters, reported together with each shard's latency and guild count."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.events: Counter[int] = Counter()
+
+    def record(self, shard_id: int) -> None:
+        self.events[shard_id] += 1
+
+    def snapshot(self, bot: discord.Client) -> list[dict]:
+        # Only AutoShardedClient reports latencies per shard
+        if hasattr(bot, 'latencies'):
+            latencies = dict(bot.latencies)
+        else:
+            latencies = {bot.shard_id or 0: bot.latency}
+        guilds = Counter(guild.shard_id for guild in bot.guilds)
+        minutes = max(time.monotonic() - self.started, 1.0) / 60
+        return [
+            {
+                'shard_id': shard_id,
+                'latency_ms': round(latency * 1000, 1) if latency == latency else None,  # nan before the first heartbeat
+                'guilds': guilds[shard_id],
+                'events': self.events[shard_id],
+                'events_per_min': round(self.events[shard_id] / minutes, 1),
+            }
+            for shard_id, latency in sorted(latencies.items())
+        ]
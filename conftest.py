@@ -0,0 +1,76 @@
+import importlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent
+API_SRC = ROOT_DIR / "api" / "src"
+BOT_SRC = ROOT_DIR / "bot" / "src"
+
+# The API modules import each other as top-level modules (``from database import ...``), the way uvicorn runs
+# them from api/src. Register the repo-root ``api`` namespace first so ``api.src.database`` keeps resolving for
+# test_database.py once api/src is on sys.path, and point the app at a throwaway database before it is imported.
+importlib.import_module("api.src")
+sys.path.insert(0, str(API_SRC))
+sys.path.append(str(BOT_SRC))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'moonlit_test.db'}")
+# Requests that run more statements than their route's query_budget fail instead of just logging
+os.environ.setdefault("QUERY_BUDGET_ENFORCE", "1")
+
+
+@pytest.fixture
+def db_engine():
+    from sqlalchemy import create_engine
+
+    from database import Base, SYNC_DATABASE_URL
+
+    engine = create_engine(SYNC_DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def client(db_engine):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import database
+    from cache import cache
+    from routers.core import router as core_router
+    from routers.players import router as players_router
+    from routers.covens import router as covens_router
+    from routers.inventory import router as inventory_router
+    from routers.moon import router as moon_router
+    from routers.leaderboard import router as leaderboard_router
+    from routers.rituals import router as rituals_router
+    from routers.familiars import router as familiars_router
+    from routers.book_of_shadows import router as book_of_shadows_router
+    from metrics import MetricsMiddleware, metrics, router as metrics_router
+
+    app = FastAPI()
+    app.include_router(core_router)
+    app.include_router(players_router)
+    app.include_router(covens_router)
+    app.include_router(inventory_router)
+    app.include_router(moon_router)
+    app.include_router(leaderboard_router)
+    app.include_router(rituals_router)
+    app.include_router(familiars_router)
+    app.include_router(book_of_shadows_router)
+    app.include_router(metrics_router)
+    app.add_middleware(MetricsMiddleware)
+
+    with TestClient(app) as test_client:
+        # Each test starts from an empty database, so nothing cached by an earlier test may survive
+        test_client.portal.call(cache.clear)
+        metrics.reset()
+        yield test_client
+        # Pooled aiosqlite connections belong to this client's event loop
+        test_client.portal.call(database.engine.dispose)
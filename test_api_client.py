@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+
+from api_client import MoonlitAPI
+
+
+def make_api(handler, **kwargs) -> MoonlitAPI:
+    return MoonlitAPI(base_url="http://api", transport=httpx.MockTransport(handler), backoff=0.001, **kwargs)
+
+
+def test_retries_idempotent_requests():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(503 if len(calls) < 3 else 200, json={"status": "healthy"})
+
+    async def scenario():
+        api = make_api(handler)
+        assert (await api.health())["status"] == "healthy"
+        await api.aclose()
+
+    asyncio.run(scenario())
+    assert calls == ["GET", "GET", "GET"]
+
+
+def test_coalesces_and_caches_gets():
+    calls = []
+
+    async def handler(request):
+        calls.append((request.method, request.url.path))
+        await asyncio.sleep(0.01)
+        if request.method == "GET":
+            return httpx.Response(200, json={"id": 1, "name": "Luna", "coven_id": None})
+        return httpx.Response(200, json={"id": 1, "name": "Luna", "coven_id": 3})
+
+    async def scenario():
+        api = make_api(handler)
+        players = await asyncio.gather(*(api.get_player(1) for _ in range(20)))
+        assert all(player["name"] == "Luna" for player in players)
+        assert api.stats() == {"hits": 0, "misses": 1, "coalesced": 19, "cached": 1}
+
+        await api.get_player(1)
+        assert api.hits == 1
+
+        # A membership change drops the cached player
+        await api.join_coven(1, 3)
+        await api.get_player(1)
+        assert api.misses == 2
+        await api.aclose()
+
+    asyncio.run(scenario())
+    assert calls == [("GET", "/players/1"), ("POST", "/players/1/covens/3"), ("GET", "/players/1")]
+
+
+def test_coalesced_error_reaches_every_waiter():
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(404, json={"detail": "Player not found"})
+
+    async def scenario():
+        api = make_api(handler)
+        results = await asyncio.gather(*(api.get_player(2) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+        assert api.stats()["cached"] == 0
+        await api.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_the_first_caller_keeps_the_fetch_for_the_others():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"id": 1, "name": "Luna", "coven_id": None})
+
+    async def scenario():
+        api = make_api(handler)
+        leader = asyncio.create_task(api.get_player(1))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(api.get_player(1))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert (await follower)["name"] == "Luna"
+        assert leader.cancelled()
+        assert api.stats() == {"hits": 0, "misses": 1, "coalesced": 1, "cached": 1}
+        await api.aclose()
+
+    asyncio.run(scenario())
+    assert calls == ["/players/1"]
@@ -0,0 +1,46 @@
+import asyncio
+
+from chant_engine import CHANTS, ChantEngine, compile_chant, normalize
+
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert normalize("  Silver lantern,   RISE and climb!") == ("silver", "lantern", "rise", "and", "climb")
+    assert normalize("Hand—to—hand...") == ("hand", "to", "hand")
+
+
+def test_ritual_turn_order_and_completion():
+    async def scenario():
+        engine = ChantEngine()
+        ritual = engine.start(1, "moonrise")
+        lines = CHANTS["moonrise"].lines
+
+        assert engine.handle(2, 10, lines[0]) is None
+        assert engine.handle(1, 10, "something else entirely") is None
+        assert engine.handle(1, 10, lines[0].upper()).kind == "advanced"
+        assert engine.handle(1, 10, lines[1]).kind == "wrong_turn"
+        assert engine.handle(1, 11, lines[1]).kind == "advanced"
+        assert engine.handle(1, 10, lines[2]).kind == "advanced"
+        outcome = engine.handle(1, 12, lines[3])
+        assert outcome.kind == "completed" and outcome.ritual is ritual
+        assert ritual.participants == {10: 2, 11: 1, 12: 1}
+        assert 1 not in engine.rituals and engine.completed == 1
+
+    asyncio.run(scenario())
+
+
+def test_ritual_times_out_without_polling(monkeypatch):
+    expired = []
+    monkeypatch.setitem(CHANTS, "quick", compile_chant("quick", "Quick", ["one", "two"], {"Dust": 1}, line_timeout=0.05))
+
+    async def scenario():
+        engine = ChantEngine(on_timeout=expired.append)
+        ritual = engine.start(1, "quick")
+        await asyncio.sleep(0.03)
+        engine.handle(1, 10, "One.")
+        # The timer restarted on the recited line, so the ritual is still alive past the first deadline
+        await asyncio.sleep(0.03)
+        assert 1 in engine.rituals
+        await asyncio.sleep(0.05)
+        assert expired == [ritual] and engine.rituals == {} and engine.timed_out == 1
+
+    asyncio.run(scenario())
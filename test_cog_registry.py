@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+
+import discord
+from discord.ext import commands
+
+from cog_registry import CogRegistry
+
+
+COG_SOURCE = '''from discord.ext import commands
+
+
+class {name}(commands.Cog):
+    @commands.hybrid_command(name="{command}", description="test")
+    async def {command}(self, ctx):
+        pass
+
+
+async def setup(bot):
+    await bot.add_cog({name}())
+'''
+
+
+def write_cog(package_dir, module, name, command):
+    path = package_dir / f"{module}.py"
+    path.write_text(COG_SOURCE.format(name=name, command=command))
+    return path
+
+
+def test_loads_once_reloads_changed_and_syncs_only_on_change(tmp_path, monkeypatch):
+    package_dir = tmp_path / "registry_cogs"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    write_cog(package_dir, "alpha", "Alpha", "alpha")
+    beta = write_cog(package_dir, "beta", "Beta", "beta")
+    write_cog(package_dir, "test_gamma", "Gamma", "gamma")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    async def scenario():
+        bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+        syncs = []
+
+        async def fake_sync(*args, **kwargs):
+            syncs.append(1)
+            return []
+
+        monkeypatch.setattr(bot.tree, "sync", fake_sync)
+        registry = CogRegistry(bot, package="registry_cogs", skip_tests=True, state_path=str(tmp_path / "state.json"))
+
+        assert await registry.load_all() == ["registry_cogs.alpha", "registry_cogs.beta"]
+        assert await registry.load_all() == []
+        assert await registry.sync_tree() is True
+        assert await registry.sync_tree() is False
+
+        # Touched without edits: nothing reloads
+        os.utime(beta, ns=(0, 0))
+        assert await registry.reload_changed() == {"loaded": [], "reloaded": [], "unloaded": []}
+
+        write_cog(package_dir, "beta", "Beta", "beta_renamed")
+        write_cog(package_dir, "delta", "Delta", "delta")
+        (package_dir / "alpha.py").unlink()
+        result = await registry.reload_changed()
+        assert result == {"loaded": ["registry_cogs.delta"], "reloaded": ["registry_cogs.beta"], "unloaded": ["registry_cogs.alpha"]}
+        assert sorted(c.name for c in bot.tree.get_commands()) == ["beta_renamed", "delta"]
+        assert await registry.sync_tree() is True
+
+        # A fresh process with the same commands finds the persisted hash and skips the sync
+        fresh = CogRegistry(bot, package="registry_cogs", state_path=str(tmp_path / "state.json"))
+        assert await fresh.sync_tree() is False
+        assert len(syncs) == 2
+        await bot.close()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        for module in [m for m in sys.modules if m.startswith("registry_cogs")]:
+            del sys.modules[module]
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from chant_engine import CHANTS, Ritual
+from message_filter import MessageFilter
+
+
+def message(content, channel_id=1, bot=False):
+    return SimpleNamespace(content=content, author=SimpleNamespace(bot=bot), channel=SimpleNamespace(id=channel_id))
+
+
+def test_rejects_irrelevant_messages():
+    rituals = {1: Ritual(1, CHANTS["moonrise"])}
+    message_filter = MessageFilter(("!",))
+    message_filter.rituals = rituals
+
+    assert message_filter.should_dispatch(message("!ping", channel_id=2))
+    assert not message_filter.should_dispatch(message("!ping", bot=True))
+    assert not message_filter.should_dispatch(message("hello there", channel_id=2))
+    assert not message_filter.should_dispatch(message("ok"))
+    assert message_filter.should_dispatch(message("Silver lantern, rise and climb"))
+    assert message_filter.counts == {"command": 1, "bot_author": 1, "no_ritual": 1, "cannot_match": 1, "ritual": 1}
+
+
+def test_length_bound_never_rejects_a_match():
+    # casefold() can expand characters, so the bound must hold for the shortest raw spelling
+    for chant in CHANTS.values():
+        for line, min_chars in zip(chant.lines, chant.min_chars):
+            assert len(line.replace(" ", "").replace(",", "").replace(".", "")) >= min_chars
+
+
+def test_dynamic_prefix_lets_everything_through():
+    bot = SimpleNamespace(command_prefix=lambda bot, message: "!")
+    message_filter = MessageFilter.for_bot(bot)
+    assert message_filter.should_dispatch(message("hello", channel_id=2))
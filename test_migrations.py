@@ -0,0 +1,85 @@
+import sys
+import threading
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+
+def test_upgrade_runs_once_under_the_lock(tmp_path):
+    import migrations
+
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    assert migrations.database_revisions(url) == frozenset()
+
+    # Workers starting together: one migrates, the others wait on the lock and find the database current
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(migrations.upgrade(url))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False, False, True]
+    assert migrations.database_revisions(url) == migrations.head_revisions()
+
+    assert migrations.main(["check", "--url", url]) == 0
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE alembic_version SET version_num = 'b52e94d1f0c6'"))
+    engine.dispose()
+    assert migrations.main(["check", "--url", url]) == 1
+
+
+def test_workers_check_the_revision_without_alembic(monkeypatch, db_engine):
+    import asyncio
+    import importlib
+    import subprocess
+
+    from fastapi import FastAPI
+
+    api = importlib.import_module("api.src.api")
+
+    # The test schema is unstamped, so a worker that may not migrate reports itself as behind
+    monkeypatch.setattr(api, "MIGRATE_ON_STARTUP", False)
+    app = FastAPI()
+
+    async def startup():
+        async with api.lifespan(app):
+            pass
+        await api.engine.dispose()
+
+    asyncio.run(startup())
+    assert app.state.migration_error.startswith("Database is at no revision, head is ")
+    assert app.state.migrated_on_startup is False
+    assert app.state.startup_seconds < 1
+
+    probe = "import sys; import api; print('alembic' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=Path(__file__).parent / "api" / "src", capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_duplicate_unlocks_are_logged_before_they_are_removed(tmp_path, caplog):
+    import logging
+
+    from alembic import command
+
+    import migrations
+
+    url = f"sqlite:///{tmp_path / 'duplicates.db'}"
+    config = migrations.alembic_config(url)
+    command.upgrade(config, "b52e94d1f0c6")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO players (id, name) VALUES (1, 'Luna'), (2, 'Nyx')"))
+        conn.execute(text(
+            "INSERT INTO book_of_shadows_entries (id, player_id, knowledge_key, unlocked_at) VALUES "
+            "(1, 1, 'herbs', '2026-01-01'), (2, 1, 'herbs', '2026-01-02'), (3, 1, 'herbs', '2026-01-03'), "
+            "(4, 1, 'stars', '2026-01-01'), (5, 2, 'stars', '2026-01-01')"
+        ))
+
+    with caplog.at_level(logging.WARNING, logger="alembic"):
+        command.upgrade(config, "c3a7d5e82f19")
+    assert "Player 1 unlocked 'herbs' 3 times; keeping entry 1, removing the rest" in caplog.messages
+    assert "Removed 2 duplicate book_of_shadows_entries rows for 1 players" in caplog.messages
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM book_of_shadows_entries ORDER BY id")).scalars().all() == [1, 4, 5]
+    engine.dispose()
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from cogs import moon
+from cogs.moon import Moon, PHASE_IMAGE_MAP, load_phase_images
+
+
+class FakeUser:
+    def __init__(self, failures=0):
+        self.avatar = None
+        self.uploads = []
+        self.failures = failures
+
+    async def edit(self, avatar):
+        if self.failures:
+            self.failures -= 1
+            raise discord.RateLimited(0.0)
+        self.uploads.append(avatar)
+        self.avatar = SimpleNamespace(key=f"hash{len(self.uploads)}")
+
+
+def make_cog(tmp_path, monkeypatch, user):
+    for image_name in PHASE_IMAGE_MAP.values():
+        (tmp_path / image_name).write_bytes(image_name.encode())
+    monkeypatch.setenv("MOON_AVATAR_STATE", str(tmp_path / "state.json"))
+    cog = Moon(SimpleNamespace(user=user))
+    cog._images = load_phase_images(str(tmp_path))
+    cog._uploaded = cog._load_state()
+    return cog
+
+
+def test_uploads_only_when_phase_changes(tmp_path, monkeypatch):
+    user = FakeUser()
+    cog = make_cog(tmp_path, monkeypatch, user)
+    phase = {"key": "full"}
+    monkeypatch.setattr(moon, "get_current_moon_phase_key", lambda now=None: phase["key"])
+
+    async def scenario():
+        assert (await cog.update_moon_avatar())[2] is True
+        assert (await cog.update_moon_avatar())[2] is False
+        phase["key"] = "waning_gibbous"
+        assert (await cog.update_moon_avatar())[2] is True
+        assert (await cog.update_moon_avatar(force=True))[2] is True
+
+    asyncio.run(scenario())
+    assert user.uploads == [b"full_moon.png", b"waning_gibbous.png", b"waning_gibbous.png"]
+    assert cog.bot.moon_phase == "waning_gibbous"
+
+    # A restarted cog remembers what the current avatar shows
+    restarted = make_cog(tmp_path, monkeypatch, user)
+    assert asyncio.run(restarted.update_moon_avatar())[2] is False
+
+
+def test_backs_off_when_rate_limited(tmp_path, monkeypatch):
+    user = FakeUser(failures=2)
+    cog = make_cog(tmp_path, monkeypatch, user)
+    monkeypatch.setattr(moon, "get_current_moon_phase_key", lambda now=None: "new")
+    assert asyncio.run(cog.update_moon_avatar())[2] is True
+    assert user.uploads == [b"new_moon.png"]
+    assert isinstance(cog._images, moon.MappingProxyType) and len(cog._images) == 8
+
+
+def test_gives_up_with_the_rate_limit_error(tmp_path, monkeypatch):
+    user = FakeUser(failures=moon.AVATAR_MAX_ATTEMPTS)
+    cog = make_cog(tmp_path, monkeypatch, user)
+    monkeypatch.setattr(moon, "get_current_moon_phase_key", lambda now=None: "new")
+    with pytest.raises(discord.RateLimited):
+        asyncio.run(cog.update_moon_avatar())
+    assert user.failures == 0 and user.uploads == []
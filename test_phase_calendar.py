@@ -0,0 +1,62 @@
+import ephem
+
+from phase_calendar import NEXT_PHASE_SEARCHES, PRINCIPAL_PHASES, PhaseCalendar, compute_phase_key
+
+START = ephem.Date("2025/1/1")
+
+
+def test_matches_ephem_searches_every_hour_of_half_a_lunation():
+    calendar = PhaseCalendar()
+    for hour in range(24 * 15):
+        now = START + hour / 24
+        assert calendar.phase_key(now) == compute_phase_key(now), ephem.Date(now)
+
+
+def test_matches_ephem_searches_across_several_years():
+    # The full hourly sweep takes minutes; benchmarks/bench_phase_calendar.py --verify-years runs it
+    calendar = PhaseCalendar(window_days=365)
+    for hour in range(0, 24 * 365 * 4, 97):
+        now = START + hour / 24
+        assert calendar.phase_key(now) == compute_phase_key(now), ephem.Date(now)
+    assert calendar.builds > 1
+
+
+def test_rebuilds_lazily_outside_the_window():
+    calendar = PhaseCalendar(window_days=60)
+    calendar.phase_key(START)
+    calendar.phase_key(START + 59)
+    assert calendar.builds == 1
+    calendar.phase_key(START + 61)
+    assert calendar.builds == 2
+
+
+def test_upcoming_phases_and_transitions():
+    calendar = PhaseCalendar()
+    upcoming = calendar.upcoming_phases(START, count=8)
+    assert [instant for _, instant in upcoming] == sorted(instant for _, instant in upcoming)
+    assert upcoming[0][1] > START
+    assert {key for key, _ in upcoming} == set(PRINCIPAL_PHASES)
+    key, instant = upcoming[0]
+    assert abs(instant - NEXT_PHASE_SEARCHES[PRINCIPAL_PHASES.index(key)](START)) < 1e-6
+
+    transition = calendar.next_transition(START)
+    assert START < transition <= upcoming[0][1]
+
+
+def test_api_classifies_every_hour_of_a_year_like_the_bot():
+    import datetime as dt
+
+    import moon
+
+    calendar = PhaseCalendar()
+    start = dt.datetime(2026, 1, 1)
+    keys, mismatches = set(), []
+    for hour in range(24 * 365):
+        moment = start + dt.timedelta(hours=hour)
+        api_key, bot_key = moon.phase_at(moment)[0], calendar.phase_key(ephem.Date(moment))
+        keys.add(bot_key)
+        if api_key != bot_key:
+            mismatches.append((moment, api_key, bot_key))
+    assert not mismatches, mismatches[:5]
+    # Between principal phases the bot used to report waxing_crescent no matter where the moon was
+    assert keys == set(moon.PRINCIPAL_PHASES + moon.INTERMEDIATE_PHASES)
@@ -0,0 +1,87 @@
+import inspect
+import re
+
+import pytest
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+import test_routers
+
+# Every test in test_routers that drives the API is replayed here with its SQL recorded
+ROUTER_TESTS = [
+    func
+    for name, func in vars(test_routers).items()
+    if name.startswith("test_") and "client" in inspect.signature(func).parameters
+]
+
+# Routes that answer without a query; /health only reads pool counters. /readyz does query and is covered
+NO_DATABASE_ROUTES = {"/", "/livez", "/health", "/metrics"}
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+_routes_hit: set[tuple[str, str]] = set()
+_tests_run: set[str] = set()
+
+
+def _table_scans(plan_rows, tables: set[str]) -> list[str]:
+    """Plan lines that read a whole table. Walking an index in order (ORDER BY ... LIMIT) does not count."""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        match = _SCAN.match(detail)
+        if match is None or "USING INDEX" in detail or "USING COVERING INDEX" in detail:
+            continue
+        # Subqueries and constant rows are scanned by design; only real tables (or their aliases) matter
+        if re.sub(r"_\d+$", "", match.group(1)) in tables:
+            scans.append(detail)
+    return scans
+
+
+@pytest.mark.parametrize("router_test", ROUTER_TESTS, ids=lambda func: func.__name__)
+def test_router_queries_use_indexes(router_test, request, client, db_engine, monkeypatch):
+    import database
+
+    statements: dict[str, tuple] = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # alembic_version is not a model table and may be gone by the time plans are checked
+        if "alembic_version" in statement:
+            return
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            statements.setdefault(statement, parameters[0] if executemany else parameters)
+
+    send = client.request
+
+    def request_and_record(method, url, *args, **kwargs):
+        _routes_hit.add((method.upper(), str(url).split("?", 1)[0]))
+        return send(method, url, *args, **kwargs)
+
+    monkeypatch.setattr(client, "request", request_and_record)
+    event.listen(database.engine.sync_engine, "before_cursor_execute", record)
+    try:
+        router_test(**{name: request.getfixturevalue(name) for name in inspect.signature(router_test).parameters})
+    finally:
+        event.remove(database.engine.sync_engine, "before_cursor_execute", record)
+
+    tables = set(database.Base.metadata.tables)
+    regressions = {}
+    with db_engine.connect() as conn:
+        for statement, parameters in statements.items():
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+            scans = _table_scans(plan, tables)
+            if scans:
+                regressions[statement] = scans
+    _tests_run.add(router_test.__name__)
+    assert not regressions, "\n\n".join(f"{sql}\n  -> {scans}" for sql, scans in regressions.items())
+
+
+def test_every_route_is_plan_checked(client):
+    if len(_tests_run) < len(ROUTER_TESTS):
+        pytest.skip("needs the full run of test_router_queries_use_indexes")
+    missing = []
+    for route in client.app.routes:
+        if not isinstance(route, APIRoute) or route.path in NO_DATABASE_ROUTES:
+            continue
+        for method in route.methods:
+            if not any(m == method and route.path_regex.match(path) for m, path in _routes_hit):
+                missing.append(f"{method} {route.path}")
+    assert not missing, f"Routes no router test exercises, so their queries are never plan-checked: {missing}"
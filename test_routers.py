@@ -0,0 +1,607 @@
+import json
+
+
+def test_player_crud(client):
+    r = client.post("/players", json={"id": 123, "name": "Selene"})
+    assert r.status_code == 201
+    assert r.json() == {"id": 123, "name": "Selene", "coven_id": None}
+    assert client.post("/players", json={"id": 123}).status_code == 409
+
+    r = client.put("/players/123", json={"name": "Selene Updated"})
+    assert r.json()["name"] == "Selene Updated"
+    assert client.get("/players/123").json()["name"] == "Selene Updated"
+
+    assert client.delete("/players/123").status_code == 204
+    assert client.get("/players/123").status_code == 404
+
+
+def test_coven_membership(client):
+    coven_id = client.post("/covens", json={"name": "Moonlit"}).json()["id"]
+    assert client.post("/covens", json={"name": "Moonlit"}).status_code == 409
+    client.post("/players", json={"id": 1, "name": "Luna"})
+    client.post("/players", json={"id": 2, "name": "Nyx"})
+
+    assert client.post(f"/players/1/covens/{coven_id}").json()["coven_id"] == coven_id
+    client.post(f"/players/2/covens/{coven_id}")
+    assert [p["id"] for p in client.get(f"/covens/{coven_id}/players").json()] == [1, 2]
+    assert client.delete(f"/covens/{coven_id}").status_code == 409
+
+    assert client.get(f"/covens/{coven_id}").json()["member_count"] == 2
+
+    # Moving to another coven updates both counts; re-joining the same coven changes nothing
+    other_id = client.post("/covens", json={"name": "Nightshade"}).json()["id"]
+    client.post(f"/players/2/covens/{other_id}")
+    client.post(f"/players/2/covens/{other_id}")
+    assert client.get(f"/covens/{coven_id}").json()["member_count"] == 1
+    assert client.get(f"/covens/{other_id}").json()["member_count"] == 1
+
+    assert client.delete(f"/players/2/covens/{coven_id}").status_code == 400
+    assert client.delete(f"/players/2/covens/{other_id}").json()["coven_id"] is None
+    assert client.get(f"/covens/{other_id}").json()["member_count"] == 0
+
+    # Deleting the last member dissolves the coven
+    assert client.delete("/players/1").status_code == 204
+    assert client.get(f"/covens/{coven_id}").status_code == 404
+
+
+def test_inventory(client):
+    assert client.post("/inventory/7", json={"item_name": "Moonpetal"}).status_code == 404
+    client.post("/players", json={"id": 7, "name": "Morgana"})
+
+    assert client.post("/inventory/7", json={"item_name": "Moonpetal", "quantity": 2}).json()["quantity"] == 2
+    assert client.post("/inventory/7", json={"item_name": "Moonpetal", "quantity": 3}).json()["quantity"] == 5
+    assert client.put("/inventory/7", json={"item_name": "Moonpetal", "quantity": 1}).json()["quantity"] == 1
+    assert client.put("/inventory/7", json={"item_name": "Moonpetal", "quantity": 0}).status_code == 204
+
+    client.post("/inventory/7", json={"item_name": "Crystal Ball"})
+    assert [i["item_name"] for i in client.get("/inventory/7").json()] == ["Crystal Ball"]
+    assert client.delete("/inventory/7/Crystal Ball").status_code == 204
+    assert client.delete("/inventory/7/Crystal Ball").status_code == 404
+
+
+def test_inventory_consume(client):
+    client.post("/players", json={"id": 8, "name": "Hecate"})
+    assert client.post("/inventory/8/consume", json={"item_name": "Moonpetal"}).status_code == 404
+    client.post("/inventory/8", json={"item_name": "Moonpetal", "quantity": 3})
+
+    r = client.post("/inventory/8/consume", json={"item_name": "Moonpetal", "quantity": 2})
+    assert r.status_code == 200 and r.json()["quantity"] == 1
+    assert client.post("/inventory/8/consume", json={"item_name": "Moonpetal", "quantity": 2}).status_code == 409
+    assert client.post("/inventory/8/consume", json={"item_name": "Moonpetal"}).status_code == 204
+    assert client.get("/inventory/8").json() == []
+    assert client.post("/inventory/9/consume", json={"item_name": "Moonpetal"}).status_code == 404
+
+
+def test_inventory_batch(client):
+    client.post("/players", json={"id": 9, "name": "Circe"})
+    client.post("/inventory/9", json={"item_name": "Moonpetal", "quantity": 3})
+    client.post("/inventory/9", json={"item_name": "Nightshade", "quantity": 1})
+
+    brew = {"deltas": [
+        {"item_name": "Moonpetal", "delta": -2},
+        {"item_name": "Nightshade", "delta": -1},
+        {"item_name": "Sleeping Draught", "delta": 1},
+    ]}
+    r = client.post("/inventory/9/batch", json=brew)
+    assert r.status_code == 200
+    assert [(i["item_name"], i["quantity"]) for i in r.json()] == [("Moonpetal", 1), ("Nightshade", 0), ("Sleeping Draught", 1)]
+    assert {i["item_name"]: i["quantity"] for i in client.get("/inventory/9").json()} == {"Moonpetal": 1, "Sleeping Draught": 1}
+
+    # Not enough Nightshade left: nothing is applied
+    r = client.post("/inventory/9/batch", json=brew)
+    assert r.status_code == 409 and "Nightshade" in r.json()["detail"]
+    assert {i["item_name"]: i["quantity"] for i in client.get("/inventory/9").json()} == {"Moonpetal": 1, "Sleeping Draught": 1}
+
+    many = {"deltas": [{"item_name": f"Herb {n}", "delta": n + 1} for n in range(500)]}
+    assert len(client.post("/inventory/9/batch", json=many).json()) == 500
+    assert client.post("/inventory/10/batch", json=many).status_code == 404
+
+
+def test_inventory_grant(client):
+    coven_id = client.post("/covens", json={"name": "Festival"}).json()["id"]
+    for player_id in (11, 12, 13):
+        client.post("/players", json={"id": player_id})
+        client.post(f"/players/{player_id}/covens/{coven_id}")
+    client.post("/players", json={"id": 14})
+    client.post("/inventory/11", json={"item_name": "Lantern", "quantity": 2})
+
+    items = [{"item_name": "Lantern", "quantity": 1}, {"item_name": "Mooncake", "quantity": 3}]
+    r = client.post("/inventory/grant", json={"coven_id": coven_id, "items": items})
+    assert r.status_code == 200
+    assert r.json()["player_count"] == 3 and r.json()["results"] is None
+    assert {i["item_name"]: i["quantity"] for i in client.get("/inventory/11").json()} == {"Lantern": 3, "Mooncake": 3}
+    assert client.get("/inventory/14").json() == []
+
+    r = client.post("/inventory/grant?detail=true", json={"player_ids": [14, 99], "items": items[:1]})
+    assert r.json()["player_count"] == 1
+    assert [(i["player_id"], i["quantity"]) for i in r.json()["results"]] == [(14, 1)]
+
+    assert client.post("/inventory/grant", json={"coven_id": coven_id + 1, "items": items}).status_code == 404
+    assert client.post("/inventory/grant", json={"coven_id": coven_id, "player_ids": [11], "items": items}).status_code == 422
+
+
+def test_coven_members_pagination(client):
+    coven_id = client.post("/covens", json={"name": "Large"}).json()["id"]
+    for player_id in range(1, 8):
+        client.post("/players", json={"id": player_id, "name": f"Witch {player_id}"})
+        client.post(f"/players/{player_id}/covens/{coven_id}")
+
+    r = client.get(f"/covens/{coven_id}/players", params={"limit": 3})
+    assert [p["id"] for p in r.json()] == [1, 2, 3]
+    assert r.headers["X-Next-After-Id"] == "3"
+    r = client.get(f"/covens/{coven_id}/players", params={"limit": 3, "after_id": 6})
+    assert [p["id"] for p in r.json()] == [7]
+    assert "X-Next-After-Id" not in r.headers
+
+    r = client.get(f"/covens/{coven_id}/players", params={"stream": True, "after_id": 2})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [p["id"] for p in lines] == [3, 4, 5, 6, 7]
+    assert lines[0] == {"id": 3, "name": "Witch 3", "coven_id": coven_id}
+
+
+def test_player_and_coven_cache(client):
+    from cache import cache
+
+    client.post("/players", json={"id": 21, "name": "Vesper"})
+    coven_id = client.post("/covens", json={"name": "Ember"}).json()["id"]
+    client.get("/players/21")
+    client.get("/players/21")
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    # Writes drop exactly the entries they touch
+    assert client.put("/players/21", json={"name": "Vesper Renamed"}).status_code == 200
+    assert client.get("/players/21").json()["name"] == "Vesper Renamed"
+    assert client.get(f"/covens/{coven_id}").json()["member_count"] == 0
+    client.post(f"/players/21/covens/{coven_id}")
+    assert client.get("/players/21").json()["coven_id"] == coven_id
+    assert client.get(f"/covens/{coven_id}").json()["member_count"] == 1
+    client.put(f"/covens/{coven_id}", json={"description": "Warm hearth"})
+    assert client.get(f"/covens/{coven_id}").json()["description"] == "Warm hearth"
+
+    client.delete("/players/21")
+    assert client.get("/players/21").status_code == 404
+    assert client.get(f"/covens/{coven_id}").status_code == 404
+
+
+def test_writes_check_players_in_the_database_not_the_cache(client, db_engine):
+    from sqlalchemy import text
+
+    client.post("/players", json={"id": 22, "name": "Hex"})
+    client.post("/inventory/22", json={"item_name": "Sage", "quantity": 1})
+    assert client.get("/players/22").status_code == 200
+    # Deleted by another worker: this process's cache still holds the player
+    with db_engine.begin() as connection:
+        connection.execute(text("DELETE FROM inventory_items WHERE player_id = 22"))
+        connection.execute(text("DELETE FROM players WHERE id = 22"))
+    assert client.get("/players/22").status_code == 200
+
+    assert client.post("/familiars", json={"player_id": 22, "name": "Soot", "type": "cat"}).status_code == 404
+    assert client.post("/book-of-shadows", json={"player_id": 22, "knowledge_key": "herbs"}).status_code == 404
+    assert client.post("/rituals/22/gather").status_code == 404
+    assert client.put("/inventory/22", json={"item_name": "Sage", "quantity": 3}).status_code == 404
+    assert client.delete("/inventory/22/Sage").status_code == 404
+    assert client.post("/inventory/22/consume", json={"item_name": "Sage"}).status_code == 404
+    with db_engine.connect() as connection:
+        for table in ("familiars", "book_of_shadows_entries", "ritual_cooldowns", "inventory_items"):
+            assert connection.execute(text(f"SELECT COUNT(*) FROM {table} WHERE player_id = 22")).scalar() == 0, table
+
+
+def test_memory_cache_bounds():
+    import asyncio
+
+    from cache import MemoryCache
+
+    async def scenario():
+        backend = MemoryCache(max_entries=2, ttl_seconds=60)
+        await backend.set("a", "1")
+        await backend.set("b", "2")
+        await backend.get("a")
+        await backend.set("c", "3")
+        assert (await backend.get("b"), await backend.get("a"), len(backend)) == (None, "1", 2)
+
+        expired = MemoryCache(ttl_seconds=-1)
+        await expired.set("a", "1")
+        assert await expired.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_read_from_before_an_invalidation_is_not_cached():
+    import asyncio
+
+    from cache import MemoryCache, ReadThroughCache
+    from schemas import PlayerRead
+
+    async def scenario():
+        read_through = ReadThroughCache(MemoryCache())
+        generation = read_through.generation("player:1")
+        # A write commits and invalidates while the reader still holds the old row
+        await read_through.invalidate("player:1")
+        await read_through.set("player:1", PlayerRead(id=1, name="Old", coven_id=None), generation)
+        assert await read_through.get("player:1", PlayerRead) is None
+
+        await read_through.set("player:1", PlayerRead(id=1, name="New", coven_id=None), read_through.generation("player:1"))
+        assert (await read_through.get("player:1", PlayerRead)).name == "New"
+
+    asyncio.run(scenario())
+
+
+def test_moon_endpoints(client):
+    now = client.get("/moon/now", params={"upcoming": 5}).json()
+    assert 0.0 <= now["illumination"] <= 100.0
+    assert len(now["upcoming"]) == 5
+    assert all(previous["at"] < following["at"] for previous, following in zip(now["upcoming"], now["upcoming"][1:]))
+
+    days = client.get("/moon/range", params={"from": "2025-01-01", "to": "2025-12-31"}).json()
+    assert len(days) == 365
+    principal = [day["principal_phase"] for day in days if day["principal_phase"]]
+    assert [p["phase"] for p in principal[:4]] == ["first_quarter", "full", "third_quarter", "new"]
+    assert all(day["phase"] == day["principal_phase"]["phase"] for day in days if day["principal_phase"])
+    assert next(day for day in days if day["date"] == "2025-01-13")["illumination"] > 99.0
+
+    assert client.get("/moon/range", params={"from": "2025-02-01", "to": "2025-01-01"}).status_code == 400
+    assert client.get("/moon/range", params={"from": "2025-01-01", "to": "2030-01-01"}).status_code == 400
+
+
+def test_leaderboards_follow_every_inventory_path(client, db_engine):
+    from sqlalchemy import text
+
+    from score_triggers import COVEN_BUCKET_BITS, PLAYER_BUCKET_BITS, SCORE_SHARDS, backfill_scores
+
+    ember = client.post("/covens", json={"name": "Ember"}).json()["id"]
+    frost = client.post("/covens", json={"name": "Frost"}).json()["id"]
+    for player_id, coven_id in ((31, ember), (32, ember), (33, frost), (34, None)):
+        client.post("/players", json={"id": player_id, "name": f"Witch {player_id}"})
+        if coven_id:
+            client.post(f"/players/{player_id}/covens/{coven_id}")
+
+    client.post("/inventory/31", json={"item_name": "Sage", "quantity": 5})
+    client.post("/inventory/32", json={"item_name": "Sage", "quantity": 2})
+    client.post("/inventory/grant", json={"coven_id": frost, "items": [{"item_name": "Sage", "quantity": 7}]})
+    client.post("/inventory/34/batch", json={"deltas": [{"item_name": "Sage", "delta": 7}, {"item_name": "Dew", "delta": 1}]})
+    client.post("/inventory/34/consume", json={"item_name": "Dew"})
+    client.put("/inventory/32", json={"item_name": "Sage", "quantity": 4})
+
+    top = client.get("/leaderboard/players").json()
+    assert [(p["rank"], p["player_id"], p["score"]) for p in top] == [(1, 33, 7), (1, 34, 7), (3, 31, 5), (4, 32, 4)]
+    assert client.get("/leaderboard/players/32").json()["rank"] == 4
+    assert client.get("/leaderboard/players/99").status_code == 404
+    assert [(c["name"], c["score"]) for c in client.get("/leaderboard/covens").json()] == [("Ember", 9), ("Frost", 7)]
+
+    # Membership moves the member's score; deleting players drops theirs
+    client.delete(f"/players/31/covens/{ember}")
+    client.post(f"/players/31/covens/{frost}")
+    client.delete("/players/33")
+    client.delete("/inventory/32/Sage")
+    assert [(c["name"], c["score"]) for c in client.get("/leaderboard/covens").json()] == [("Frost", 5), ("Ember", 0)]
+    assert client.get(f"/leaderboard/covens/{frost}").json()["rank"] == 1
+    top = client.get("/leaderboard/players").json()
+    assert [(p["rank"], p["player_id"], p["score"]) for p in top] == [(1, 34, 7), (2, 31, 5)]
+    assert client.get("/leaderboard/players/32").json() == {"rank": 3, "player_id": 32, "name": "Witch 32", "score": 0}
+
+    def snapshot():
+        with db_engine.connect() as connection:
+            return [
+                # A coven whose members all drop to 0 keeps its row; a rebuild only creates rows for scores
+                sorted(connection.execute(text(f"SELECT * FROM {table} WHERE score != 0")).all())
+                for table in ("player_scores", "coven_scores")
+            ]
+
+    def assert_buckets_match_scores():
+        with db_engine.connect() as connection:
+            for buckets, count, scores, key, bits in (
+                ("player_score_buckets", "players", "player_scores", "player_id", PLAYER_BUCKET_BITS),
+                ("coven_score_buckets", "covens", "coven_scores", "coven_id", COVEN_BUCKET_BITS),
+            ):
+                counted = connection.execute(text(f"SELECT bucket, shard, {count} FROM {buckets} WHERE {count} != 0")).all()
+                expected = connection.execute(text(
+                    f"SELECT score >> {bits}, {key} % {SCORE_SHARDS}, COUNT(*) FROM {scores} GROUP BY 1, 2"
+                )).all()
+                assert sorted(counted) == sorted(expected), buckets
+
+    assert_buckets_match_scores()
+    maintained = snapshot()
+    with db_engine.begin() as connection:
+        backfill_scores(connection)
+    assert snapshot() == maintained
+    assert_buckets_match_scores()
+
+
+def test_ranks_span_score_buckets(client):
+    from score_triggers import COVEN_BUCKET_BITS, PLAYER_BUCKET_BITS
+
+    # Scores on both sides of bucket edges, ties inside a bucket, and moves between buckets in both directions
+    quantities = {51: 1, 52: 7, 53: 8, 54: 8, 55: 9, 56: 3 << PLAYER_BUCKET_BITS, 57: 1 << COVEN_BUCKET_BITS, 58: 200}
+    coven_ids = [client.post("/covens", json={"name": name}).json()["id"] for name in ("Ash", "Birch", "Cedar")]
+    for index, (player_id, quantity) in enumerate(quantities.items()):
+        client.post("/players", json={"id": player_id})
+        client.post(f"/players/{player_id}/covens/{coven_ids[index % 3]}")
+        client.post(f"/inventory/{player_id}", json={"item_name": "Sage", "quantity": quantity})
+    client.put("/inventory/58", json={"item_name": "Sage", "quantity": 2})
+    client.put("/inventory/51", json={"item_name": "Sage", "quantity": 300})
+    quantities.update({58: 2, 51: 300})
+
+    for player_id, score in quantities.items():
+        expected = 1 + sum(other > score for other in quantities.values())
+        assert client.get(f"/leaderboard/players/{player_id}").json()["rank"] == expected, player_id
+    coven_scores = {c["coven_id"]: c["score"] for c in client.get("/leaderboard/covens").json()}
+    for coven_id, score in coven_scores.items():
+        expected = 1 + sum(other > score for other in coven_scores.values())
+        assert client.get(f"/leaderboard/covens/{coven_id}").json()["rank"] == expected, coven_id
+
+
+def test_rituals_check_and_stamp_cooldowns(client, monkeypatch):
+    import datetime as dt
+
+    import rituals
+
+    now = {"at": dt.datetime(2025, 1, 13, 22, 0)}  # full moon: brewing pays double
+    monkeypatch.setattr(rituals, "utcnow", lambda: now["at"])
+    monkeypatch.setattr("routers.rituals.utcnow", lambda: now["at"])
+    client.post("/players", json={"id": 41})
+
+    r = client.post("/rituals/41/brew")
+    assert r.status_code == 200 and r.json()["moon_bonus"] is True
+    assert {i["item_name"]: i["quantity"] for i in r.json()["inventory"]} == {"Moonlit Dew": 2}
+
+    again = client.post("/rituals/41/brew")
+    assert again.status_code == 409 and 0 < int(again.headers["Retry-After"]) <= 2 * 3600 + 1
+    status = {s["ritual"]: s for s in client.get("/rituals/41").json()}
+    assert status["brew"]["available"] is False and status["gather"]["available"] is True
+
+    # The next UTC day needs no reset job; the old stamp is simply older than the boundary (still full moon)
+    now["at"] = dt.datetime(2025, 1, 14, 0, 5)
+    assert client.post("/rituals/41/brew").status_code == 200
+    assert {i["item_name"]: i["quantity"] for i in client.get("/inventory/41").json()}["Moonlit Dew"] == 4
+
+    assert client.post("/rituals/42/brew").status_code == 404
+    assert client.post("/rituals/41/levitate").status_code == 404
+    assert len(client.get("/rituals").json()) == len(rituals.RITUALS)
+
+
+def test_ritual_bonus_follows_the_phase_the_bot_shows():
+    import datetime as dt
+
+    import ephem
+    from phase_calendar import PhaseCalendar
+
+    import rituals
+
+    calendar = PhaseCalendar()
+    # Six hours after the first quarter of 2025-01-06 23:56 UTC, then two and a half days on
+    first_quarter, gibbous = dt.datetime(2025, 1, 7, 6), dt.datetime(2025, 1, 9, 12)
+    assert calendar.phase_key(ephem.Date(first_quarter)) == "first_quarter"
+    assert rituals.ritual_rewards(rituals.RITUALS["gather"], first_quarter) == ({"Dried Sage": 4, "Mugwort": 2}, True)
+    assert calendar.phase_key(ephem.Date(gibbous)) == "waxing_gibbous"
+    assert rituals.ritual_rewards(rituals.RITUALS["gather"], gibbous)[1] is False
+
+    # Across a lunation, every ritual's bonus tracks the avatar's phase
+    for hour in range(0, 24 * 30, 5):
+        moment = dt.datetime(2025, 1, 1) + dt.timedelta(hours=hour)
+        bot_key = calendar.phase_key(ephem.Date(moment))
+        for ritual in rituals.RITUALS.values():
+            assert rituals.ritual_rewards(ritual, moment)[1] is (bot_key in ritual.bonus_phases), (moment, ritual.key)
+
+
+def test_familiars_and_book_of_shadows(client):
+    client.post("/players", json={"id": 51})
+    r = client.post("/familiars", json={"player_id": 51, "name": "Soot", "type": "cat"})
+    assert r.status_code == 201
+    familiar_id = r.json()["id"]
+    assert client.put(f"/familiars/{familiar_id}", json={"name": "Cinder"}).json()["name"] == "Cinder"
+    assert [f["name"] for f in client.get("/familiars", params={"player_id": 51}).json()] == ["Cinder"]
+    assert client.post("/familiars", json={"player_id": 52, "name": "Ghost"}).status_code == 404
+
+    r = client.post("/book-of-shadows", json={"player_id": 51, "knowledge_key": "moon_water"})
+    assert r.status_code == 201 and r.json()["unlocked_at"]
+    assert client.post("/book-of-shadows", json={"player_id": 51, "knowledge_key": "moon_water"}).status_code == 409
+    assert [e["knowledge_key"] for e in client.get("/book-of-shadows", params={"player_id": 51}).json()] == ["moon_water"]
+    entry_id = client.post("/book-of-shadows", json={"player_id": 51, "knowledge_key": "salt_circle"}).json()["id"]
+    assert client.put(f"/book-of-shadows/{entry_id}", json={"knowledge_key": "moon_water"}).status_code == 409
+    assert client.put(f"/book-of-shadows/{entry_id}", json={"knowledge_key": "ward"}).json()["knowledge_key"] == "ward"
+    assert client.get(f"/book-of-shadows/{entry_id}").json()["knowledge_key"] == "ward"
+
+    assert client.delete(f"/familiars/{familiar_id}").status_code == 204
+    assert client.get(f"/familiars/{familiar_id}").status_code == 404
+    assert client.delete(f"/book-of-shadows/{r.json()['id']}").status_code == 204
+
+
+def test_player_profile_has_fixed_query_count(client):
+    from sqlalchemy import event
+
+    import database
+
+    coven_id = client.post("/covens", json={"name": "Profiles"}).json()["id"]
+    client.post("/players", json={"id": 61, "name": "Morgana"})
+    client.post(f"/players/61/covens/{coven_id}")
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def profile_queries():
+        statements.clear()
+        event.listen(database.engine.sync_engine, "before_cursor_execute", count)
+        try:
+            profile = client.get("/players/61/profile").json()
+        finally:
+            event.remove(database.engine.sync_engine, "before_cursor_execute", count)
+        return profile, len(statements)
+
+    profile, small = profile_queries()
+    assert profile["coven"]["name"] == "Profiles" and profile["inventory"] == []
+
+    for n in range(10):
+        client.post("/inventory/61", json={"item_name": f"Herb {n}"})
+        client.post("/familiars", json={"player_id": 61, "name": f"Familiar {n}"})
+        client.post("/book-of-shadows", json={"player_id": 61, "knowledge_key": f"page_{n}"})
+    profile, large = profile_queries()
+    assert (len(profile["inventory"]), len(profile["familiars"]), len(profile["book_of_shadows"])) == (10, 10, 10)
+    assert small == large == 4
+    assert client.get("/players/62/profile").status_code == 404
+
+
+def test_engine_profile_applies_pragmas_and_times_checkouts(client):
+    from sqlalchemy import text
+
+    import database
+
+    async def pragma(name):
+        async with database.engine.connect() as conn:
+            return (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+
+    assert client.portal.call(pragma, "journal_mode") == "wal"
+    assert client.portal.call(pragma, "busy_timeout") == 5000
+    assert client.portal.call(pragma, "synchronous") == 1  # NORMAL
+
+    before = database.POOL_STATS.checkouts
+    client.post("/players", json={"id": 71})
+    pool = client.get("/health").json()["pool"]
+    assert pool["checkouts"] > before
+    assert sum(pool["wait_histogram"].values()) == pool["checkouts"]
+    assert pool["size"] == 5 and pool["checked_out"] == 0
+
+
+def test_metrics_per_route(client):
+    client.post("/players", json={"id": 81, "name": "Hecate"})
+    client.get("/players/81")
+    client.get("/players/81")
+    client.get("/players/82")
+    client.post("/inventory/81", json={"item_name": "Sage"})
+
+    body = client.get("/metrics").text
+    lines = dict(line.rsplit(" ", 1) for line in body.splitlines() if not line.startswith("#"))
+    route = 'method="GET",route="/players/{player_id}"'
+    assert lines[f'moonlit_http_responses_total{{{route},status="200"}}'] == "2"
+    assert lines[f'moonlit_http_responses_total{{{route},status="404"}}'] == "1"
+    assert lines[f'moonlit_http_request_duration_seconds_count{{{route}}}'] == "3"
+    assert lines[f'moonlit_http_request_duration_seconds_bucket{{{route},le="+Inf"}}'] == "3"
+    # The first lookup reads the database, the second one is served from the cache
+    assert lines[f'moonlit_db_queries_per_request_bucket{{{route},le="0"}}'] == "1"
+    assert float(lines['moonlit_db_queries_per_request_sum{method="POST",route="/inventory/{player_id}"}']) >= 1
+    assert float(lines['moonlit_db_time_per_request_seconds_sum{method="POST",route="/inventory/{player_id}"}']) > 0
+    assert lines["moonlit_cache_hits_total"] == "1"
+    # /metrics is still being served while it renders
+    assert lines["moonlit_http_requests_in_flight"] == "1"
+
+
+def test_query_budget_and_slow_query_log(client, monkeypatch, caplog):
+    import pytest
+    from fastapi import Depends
+    from sqlalchemy import text
+
+    import database
+    from dependencies import get_db, query_budget
+
+    @client.app.get("/budget-test", dependencies=[Depends(query_budget(1))])
+    async def two_statements(db=Depends(get_db)):
+        await db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 2"))
+
+    with pytest.raises(database.QueryBudgetExceeded, match="GET /budget-test exceeded its budget of 1 statements"):
+        client.get("/budget-test")
+
+    # Outside the tests an overrun only warns
+    monkeypatch.setattr(database, "QUERY_BUDGET_ENFORCE", False)
+    monkeypatch.setattr(database, "SLOW_QUERY_MS", 0.0)
+    with caplog.at_level("WARNING", logger="moonlit.sql"):
+        assert client.get("/budget-test").status_code == 200
+        client.post("/players", json={"id": 91, "name": "Tituba"})
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("exceeded its budget" in message for message in messages)
+    assert any(
+        message.startswith("Slow query") and "in POST /players:" in message and "INSERT INTO players" in message
+        and "params=(int, str, NoneType)" in message
+        for message in messages
+    )
+
+
+def test_livez_and_readyz(client, db_engine, monkeypatch):
+    from sqlalchemy import text
+
+    from migrations import head_revisions
+    from routers import core
+
+    assert client.get("/livez").json() == {"status": "alive"}
+
+    # The test schema comes from create_all, so Alembic never stamped it
+    r = client.get("/readyz")
+    assert r.status_code == 503
+    checks = r.json()["checks"]
+    assert checks["database"]["ok"] and checks["pool"]["ok"]
+    assert checks["migrations"] == {"ok": False, "head": sorted(head_revisions()), "current": []}
+
+    with db_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        for head in head_revisions():
+            conn.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+    try:
+        # Results are cached briefly, so the stamp only shows once the cached check expires
+        assert client.get("/readyz").status_code == 503
+        client.app.state.readiness = None
+        r = client.get("/readyz")
+        assert r.status_code == 200 and r.json()["status"] == "ready"
+    finally:
+        # drop_all only knows the model tables
+        with db_engine.begin() as conn:
+            conn.execute(text("DROP TABLE alembic_version"))
+
+    client.app.state.readiness = None
+    client.app.state.migration_error = "OperationalError: boom"
+    assert client.get("/readyz").json()["checks"]["migrations"] == {"ok": False, "error": "OperationalError: boom"}
+
+    client.app.state.readiness = client.app.state.migration_error = None
+    monkeypatch.setattr(core, "READYZ_MAX_POOL_SATURATION", 0.0)
+    r = client.get("/readyz")
+    assert r.status_code == 503 and not r.json()["checks"]["pool"]["ok"]
+    assert r.json()["checks"]["database"] == {"ok": False, "error": "skipped, pool saturated"}
+
+
+def test_readyz_times_out_on_checkout_and_coalesces_probes(client, monkeypatch):
+    import asyncio
+    import time
+
+    import httpx
+
+    from routers import core
+
+    class ExhaustedPool:
+        pool = None
+
+        def connect(self):
+            return self
+
+        async def __aenter__(self):
+            await asyncio.sleep(60)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    # A checkout that never returns is cut off by the probe timeout, not the pool's
+    monkeypatch.setattr(core, "engine", ExhaustedPool())
+    monkeypatch.setattr(core, "READYZ_DB_TIMEOUT_SECONDS", 0.05)
+    started = time.perf_counter()
+    r = client.get("/readyz")
+    assert time.perf_counter() - started < 5
+    assert r.status_code == 503 and r.json()["checks"]["database"] == {"ok": False, "error": "no answer within 0.05s"}
+
+    calls = []
+
+    async def slow_check():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"ok": True}, frozenset()
+
+    monkeypatch.setattr(core, "_check_database", slow_check)
+    client.app.state.readiness = None
+
+    async def probes():
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://probe") as probe:
+            return await asyncio.gather(*(probe.get("/readyz") for _ in range(5)))
+
+    responses = client.portal.call(probes)
+    assert len(calls) == 1
+    assert len({r.json()["time"] for r in responses}) == 1
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from shard_stats import ShardStats, shard_for_event
+
+
+def test_events_are_attributed_to_their_shard():
+    guild_id = (123456789 << 22) | 42
+    assert shard_for_event((SimpleNamespace(shard_id=3),), 4) == 3
+    assert shard_for_event((SimpleNamespace(guild_id=guild_id),), 4) == 123456789 % 4
+    assert shard_for_event((SimpleNamespace(guild=SimpleNamespace(id=guild_id)),), 4) == 123456789 % 4
+    assert shard_for_event((SimpleNamespace(guild=None),), 4) == 0
+    assert shard_for_event((), 4) == 0
+
+
+def test_snapshot_reports_each_shard():
+    stats = ShardStats()
+    for shard_id in (0, 1, 1):
+        stats.record(shard_id)
+    guilds = [SimpleNamespace(shard_id=1), SimpleNamespace(shard_id=1)]
+
+    sharded = SimpleNamespace(latencies=[(1, float("nan")), (0, 0.05)], guilds=guilds)
+    assert [(s["shard_id"], s["latency_ms"], s["guilds"], s["events"]) for s in stats.snapshot(sharded)] == [
+        (0, 50.0, 0, 1),
+        (1, None, 2, 2),
+    ]
+
+    single = SimpleNamespace(shard_id=None, latency=0.02, guilds=[])
+    assert [(s["shard_id"], s["latency_ms"], s["events"]) for s in stats.snapshot(single)] == [(0, 20.0, 1)]